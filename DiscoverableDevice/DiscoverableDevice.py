@@ -1,34 +1,89 @@
+from DiscoverableDevice import __version__
 from DiscoverableDevice.Sensor import Sensor
-from DiscoverableDevice.Switch import Switch
-from DiscoverableDevice.Trigger import Trigger
 
 from DiscoverableDevice.utils.timestamp import timestamp
-from DiscoverableDevice.utils.pins import get_gpio
-from DiscoverableDevice.utils.Profile import Profile
-from DiscoverableDevice.utils.Status import blink
+from DiscoverableDevice.utils.Status import StatusLED
+from DiscoverableDevice.utils.monotonic import monotonic_ms
+from DiscoverableDevice.utils.Entities import Entities, HEARTBEAT, READ_TTL
+from DiscoverableDevice.utils.backoff import backoff_ms
+from DiscoverableDevice.utils.OfflineQueue import OfflineQueue, DROP_OLDEST
+from DiscoverableDevice.utils.discovery import (
+    build_discovery,
+    device_payload,
+    DISCOVERY_FULL,
+    DISCOVERY_COMPACT,
+    DISCOVERY_DEVICE,
+    MODES,
+    STATUS_TOPIC,
+)
+from DiscoverableDevice.utils.EventQueue import EventQueue
+from DiscoverableDevice.utils.Stats import Stats
+from DiscoverableDevice.utils.PayloadTemplate import PayloadTemplate, precision
+from DiscoverableDevice.utils.InFlight import InFlight
 
 try:
     from umqtt.simple import MQTTClient, MQTTException
 except ImportError:
-    import mip
-    mip.install("umqtt.simple")
-    print("installed umqtt.simple")
-    from umqtt.simple import MQTTClient, MQTTException
+    raise ImportError("umqtt.simple is missing, install it with mip.install('umqtt.simple')")
 
 from machine import unique_id
 
+try:
+    from micropython import schedule
+except ImportError:
+    # CPython, IRQs are already delivered in the main thread
+    schedule = None
+
+try:
+    import uselect as select
+except ImportError:
+    import select
+
+import struct
 import ubinascii
+import heapq
 import json
 import time
 
-__version__ = "0.0.1a"
+# only imported by the async run mode, see `_load_asyncio`
+asyncio = None
+make_flag = None
+
+
+def _load_asyncio():
+    """Import (u)asyncio on first use, the blocking run mode never needs it"""
+    global asyncio, make_flag
+    if asyncio is None:
+        from DiscoverableDevice.utils.aio import asyncio, make_flag
+
+
+RECEIVE_INTERVAL = 0.01  # async mode, time between polls of the mqtt socket
+CONSTANT_INTERVAL = 600  # constant entities are only republished this often
+DIAGNOSTIC_INTERVAL = 60  # how often the diagnostics entity reports
+QUEUE_SIZE = 32  # state messages held while offline
+DRAIN_RATE = 10  # queued messages replayed per second once back online
+IRQ_QUEUE_SIZE = 16  # trigger edges buffered between main loop iterations
+IRQ_LATENCY = 20  # (ms) longest the sync loop sleeps while it has triggers to watch
+INFLIGHT = 8  # QoS 1 messages which may be awaiting their PUBACK at once
+ACK_TIMEOUT = 5000  # (ms) before an unacknowledged QoS 1 message is sent again
 
+# instrumented stages of the loop (timed in us) and event counters, see utils.Stats
+STAGES = ("serialise", "publish", "check_msg", "jitter")
+COUNTERS = ("connects", "failures", "cached")
 
-RETRY_INTERVAL = 5  # time to wait on a failed MQTT interaction before retrying
-RETRY_COUNT = 10
+# connection states, see `DiscoverableDevice.service`
+DISCONNECTED = 0
+CONNECTING = 1
+SUBSCRIBING = 2
+DISCOVERING = 3
+ONLINE = 4
+STATE_NAMES = ("disconnected", "connecting", "subscribing", "discovering", "online")
 
+# status LED blink period (ms) per state, None for off
+STATUS_BLINK = (100, 250, 250, 500, None)
 
-class DiscoverableDevice(MQTTClient):
+
+class DiscoverableDevice(MQTTClient, Entities):
     """
     Base class for a device which communicates with HA via MQTT
 
@@ -48,7 +103,38 @@ class DiscoverableDevice(MQTTClient):
         location:
             device location, defaults None, and will be unreported
         interval:
-            report interval, defaults to 5s
+            default report interval, defaults to 5s. Entities can set their own
+        heartbeat:
+            readings which haven't crossed their signature "deadband" or
+            "deadband_rel" are only republished after this many seconds.
+            Set to 0 to publish every reading
+        queue_size:
+            number of state messages to hold while the broker is unreachable
+        queue_policy:
+            what to do when that queue is full, see utils.OfflineQueue
+        drain_rate:
+            maximum messages per second to replay from the queue on reconnect
+        discovery_mode:
+            DISCOVERY_FULL (default), DISCOVERY_COMPACT or DISCOVERY_DEVICE.
+            The latter needs Home Assistant 2024.11 or later
+        diagnostics:
+            also report the loop instrumentation (see `stats`) to HA, as
+            diagnostic entities
+        templates:
+            serialise states through a template compiled per state topic from
+            the entity signatures (see utils.PayloadTemplate), rather than
+            json.dumps. Floats are rounded to their signature "value_mod"
+        inflight:
+            QoS 1 messages which may await their PUBACK at once. Discovery
+            configs and trigger events go out at QoS 1, without waiting on
+            each ack. 0 sends everything at QoS 0
+        qos:
+            QoS of the other state messages, 1 needs `inflight`
+        read_ttl:
+            default `Sensor.ttl` (ms): readings this recent are reused by the
+            periodic loop, republishing and command echoes rather than read
+            again. Entities whose state just changed (a command other than
+            the last one they handled, a trigger edge) are always read
     """
 
     def __init__(
@@ -62,6 +148,16 @@ class DiscoverableDevice(MQTTClient):
         discovery_prefix: str = "homeassistant",
         location: str | None = None,
         interval: int = 5,
+        heartbeat: int = HEARTBEAT,
+        queue_size: int = QUEUE_SIZE,
+        queue_policy: str = DROP_OLDEST,
+        drain_rate: float = DRAIN_RATE,
+        discovery_mode: str = DISCOVERY_FULL,
+        diagnostics: bool = False,
+        templates: bool = True,
+        inflight: int = INFLIGHT,
+        qos: int = 0,
+        read_ttl: int = READ_TTL,
     ):
         self._uid = ubinascii.hexlify(unique_id()).decode()
 
@@ -83,16 +179,61 @@ class DiscoverableDevice(MQTTClient):
         self._discovery_prefix = discovery_prefix
         self._discovered = False
 
+        if discovery_mode not in MODES:
+            raise ValueError(f"unknown discovery mode {discovery_mode}")
+        self._discovery_mode = discovery_mode
+
         self._interval = interval
+        self._heartbeat = heartbeat
+        self._init_entities(read_ttl)
 
         # used for last will/birth detection
         self._broker_alive = True
-        self._connection_failure_count = 0
+        self._connection_failure_count = 0  # consecutive failed connection attempts
         self._read_failure_count = 0
 
-        self._sensors = {}  # sensors by NAME
-        self._command_mapping = {}  # maps topic:[switch]
-        self._irq_mapping = {}  # maps pin:switch
+        self._state = DISCONNECTED
+        self._retry_at = 0  # monotonic ms of the next connection attempt
+        self._to_discover = []  # discovery topics still to be published this connection
+        self._republish = False  # configs went out after states, resend those states
+        self._discovery = {}  # serialised discovery payloads, {topic: payload}
+        self._discovery_sent = {}  # hash of the payload last published, {topic: hash}
+        self._status = StatusLED()
+
+        self._queue = OfflineQueue(queue_size, queue_policy)
+        # whole ms between replays, sleep_ms and poll take no floats on the board
+        self._drain_interval = int(1000 / drain_rate)
+        self._last_drain = 0
+        self._first_state = None  # ticks_ms of the first state publish
+
+        if qos not in (0, 1):
+            raise ValueError(f"unsupported state qos {qos}")
+        if qos and not inflight:
+            raise ValueError("qos 1 states need an in-flight window")
+        # QoS 1 messages awaiting their PUBACK, see `publish`
+        self._inflight = InFlight(inflight) if inflight else None
+        self._awaiting_ack = False  # inside `_await_ack`, see `callback`
+        self._deferred = []  # messages received meanwhile, [(topic, msg)]
+        self._reliable = 1 if inflight else 0  # QoS of configs and trigger events
+        self._qos = qos
+        self._event_topics = set()  # trigger state topics
+
+        self._command_mapping = {}  # maps topic:[entity]
+        self._history_topic = None
+        self._irq_mapping = {}  # maps pin:trigger
+        self._events = EventQueue(IRQ_QUEUE_SIZE)  # filled by the trigger IRQs
+        self._irq_pending = {}  # coalesced events, {pin: last edge}
+        self._irq_scheduled = False
+        # bound once, so scheduling from the IRQ does not allocate
+        self._coalesce_ref = self._coalesce
+        self._schedule = []  # min-heap of [next due (monotonic ms), sensor name]
+        self._poller = None
+        self._last_tx = 0
+
+        # compiled serialisers, {state topic: PayloadTemplate}, None to always use json
+        self._templates = {} if templates else None
+
+        self._stats = Stats(STAGES, COUNTERS)
 
         ip = constant(
             name="IP",
@@ -106,29 +247,296 @@ class DiscoverableDevice(MQTTClient):
         self.add_entity(ip)
         self.add_entity(uid)
 
-        self._data = {}
+        if diagnostics:
+            self.add_entity(diagnostic(self._stats))
+
+        # async mode state, see `arun`
+        self._async = False
+        self._pending = {}  # topics waiting for the publish task
+        self._publish_flag = None
+        self._irq_flag = None
+
+        self.cb = self.callback
 
         self.initial_setup()
 
     def initial_setup(self):
         """
-        Performs some initial setup, connecting and setting the callback
+        (Re)starts the connection process, see `service`
+
+        This does not block, the connection is made by the run loop.
         """
+        self._retry_at = monotonic_ms()
+        self._set_state(DISCONNECTED)
+
+    @property
+    def state(self) -> str:
+        """Current connection state"""
+        return STATE_NAMES[self._state]
+
+    @property
+    def online(self) -> bool:
+        return self._state == ONLINE
+
+    @property
+    def connected(self) -> bool:
+        """Is there an open connection to the broker (not necessarily discovered)?"""
+        return self._state >= SUBSCRIBING
+
+    def _set_state(self, state):
+        if state != self._state:
+            print(f"connection state {STATE_NAMES[self._state]} -> {STATE_NAMES[state]}")
+        self._state = state
+
+        period = STATUS_BLINK[state]
+        if period is None:
+            self._status.off()
+        else:
+            self._status.blink(period)
+
+    def _fail(self, reason):
+        """
+        Drop the connection and schedule a retry with jittered exponential backoff
+        """
+        self._connection_failure_count += 1
+        self._stats.count("failures")
+
+        delay = backoff_ms(self.conn_fail_count)
+
+        print(f"{reason}, retrying in {delay}ms (attempt {self.conn_fail_count})")
+
         try:
-            print("Attempting to connect to MQTT Broker...", end=" ")
-            self.connect()
-        except OSError:
-            print(f"failure to connect, waiting {RETRY_INTERVAL}s and retrying.")
-            blink(RETRY_INTERVAL)
+            self.sock.close()
+        except (AttributeError, OSError):
+            pass
+        self._poller = None
+
+        self._retry_at = monotonic_ms() + delay
+        self._set_state(DISCONNECTED)
+
+    def time_to_retry(self) -> int:
+        """Time in ms until the state machine next needs servicing"""
+        if self._state == DISCONNECTED:
+            return max(0, self._retry_at - monotonic_ms())
+        if self._state == ONLINE:
+            wait = self.keepalive * 500
+            if len(self._queue) > 0:
+                wait = max(0, self._last_drain + self._drain_interval - monotonic_ms())
+            if self._inflight is not None and len(self._inflight) > 0:
+                wait = min(wait, max(0, self._inflight.next_expiry(ACK_TIMEOUT) - monotonic_ms()))
+            return wait
+        return 0
 
-            self.initial_setup()        
-        print("Success!")
+    @property
+    def queue(self):
+        """Messages waiting for the connection"""
+        return self._queue
 
-        self.cb = self.callback
+    def send_state(self, topic, payload):
+        """
+        Publish a state message, queueing it if the connection is not up
+
+        Anything already queued goes first, so ordering within a topic is kept.
+        States go out while discovery is still running, see `service`.
+        """
+        if self._state >= DISCOVERING and len(self._queue) == 0 and self.publish(topic, payload, qos=self.qos(topic)):
+            self._sent_state()
+            return
+
+        if isinstance(payload, memoryview):
+            # a template's buffer, which the next render overwrites
+            payload = bytes(payload)
+        self._queue.push(topic, payload)
+
+    def qos(self, topic) -> int:
+        """QoS for states on `topic`, trigger events are always sent reliably"""
+        if topic in self._event_topics:
+            return self._reliable
+        return self._qos
+
+    def _sent_state(self):
+        if self._first_state is None:
+            self._first_state = time.ticks_ms()
+            print(f"first state published at {self._first_state}ms")
+
+    @property
+    def first_state_ms(self):
+        """
+        ticks_ms of the first state publish, None until then
+
+        ticks start from zero at reset on the board, so this is boot to first publish.
+        """
+        return self._first_state
+
+    def drain(self):
+        """
+        Replay queued messages, at most `drain_rate` per second
+        """
+        if self._state < DISCOVERING or len(self._queue) == 0:
+            return
+
+        now = monotonic_ms()
+        if now - self._last_drain < self._drain_interval:
+            return
+        self._last_drain = now
+
+        topic, payload = self._queue.peek()
+        print(f"replaying queued message ({len(self._queue)} left)")
+        if self.publish(topic, payload, qos=self.qos(topic)):
+            self._queue.pop()
+            self._sent_state()
+
+    def service(self):
+        """
+        Advance the connection state machine by (at most) one step
+
+        disconnected -> connecting -> subscribing -> discovering -> online
+
+        Each step is short, so the caller can keep reading sensors and handling
+        IRQs in between. Any failure drops back to disconnected, with the next
+        attempt delayed by an exponential backoff.
+
+        States are published from discovering onwards, one discovery config
+        goes out per step in between them. Once discovery completes every
+        entity is read again, for HA to pick up the newly discovered ones.
+        """
+        state = self._state
+
+        if state == DISCONNECTED:
+            if monotonic_ms() >= self._retry_at:
+                self._set_state(CONNECTING)
+
+        elif state == CONNECTING:
+            try:
+                print("Attempting to connect to MQTT Broker...")
+                self.connect()
+            except (OSError, MQTTException) as ex:
+                return self._fail(f"failure to connect ({ex})")
+
+            self._stats.count("connects")
+
+            self._poller = select.poll()
+            self._poller.register(self.sock, select.POLLIN)
+            self._last_tx = monotonic_ms()
+
+            self._set_state(SUBSCRIBING)
+
+        elif state == SUBSCRIBING:
+            try:
+                print(f"subscribing to status topic {STATUS_TOPIC}")
+                self.subscribe(STATUS_TOPIC)
+
+                for topic in self._command_mapping:
+                    print("subscribing to command topic", topic)
+                    self.subscribe(topic)
+
+                if self._keeps_history():
+                    self.subscribe(self.history_topic)
+            except (OSError, MQTTException) as ex:
+                return self._fail(f"failure to subscribe ({ex})")
+
+            # retained configs survive on the broker, only resend what changed
+            self._to_discover = self.discovery_changed()
+            if self._inflight is not None:
+                # never acknowledged on the last connection, resend with DUP
+                self._inflight.expire(monotonic_ms(), ACK_TIMEOUT)
+            self._set_state(DISCOVERING)
+
+        elif state == DISCOVERING:
+            if len(self._to_discover) == 0:
+                self._discovered = True
+                self._connection_failure_count = 0
+                self._set_state(ONLINE)
+
+                if self._republish:
+                    # states sent before HA knew about their entity were dropped
+                    self._republish = False
+                    self.republish()
+                return
+
+            topic = self._to_discover.pop(0)
+            self._send_discovery(topic)
+
+    @property
+    def discovery_mode(self):
+        return self._discovery_mode
+
+    @property
+    def device_discovery_topic(self):
+        """Topic for the single config used by DISCOVERY_DEVICE"""
+        return f"{self.discovery_prefix}/device/{self.uid}/config"
+
+    @property
+    def history_topic(self) -> bytes:
+        """Command topic for history requests, see `send_history`"""
+        if self._history_topic is None:
+            self._history_topic = self.intern(f"{self.discovery_prefix}/sensor/{self.uid}/history")
+        return self._history_topic
+
+    def build_discovery(self):
+        """
+        Serialise every discovery payload once, into the discovery cache
+        """
+        self._discovery = {}
+        mode = self.discovery_mode
+
+        configs = build_discovery(
+            self._sensors.values(), self.device_payload, mode, self.device_discovery_topic
+        )
+        for topic, payload in configs:
+            self._discovery[self.intern(topic)] = payload
+
+        print(
+            f"built {len(self._discovery)} discovery configs ({mode}), "
+            f"{self.discovery_size()} bytes"
+        )
+
+    def discovery_size(self) -> int:
+        """Total bytes (topics and payloads) of a full discovery"""
+        if len(self._discovery) == 0:
+            self.build_discovery()
+
+        return sum(len(topic) + len(payload) for topic, payload in self._discovery.items())
+
+    def discovery_changed(self) -> list:
+        """
+        Discovery topics whose payload differs from the one last published
+        """
+        if len(self._discovery) == 0:
+            self.build_discovery()
+
+        return [
+            topic for topic, payload in self._discovery.items()
+            if self._discovery_sent.get(topic, None) != hash(payload)
+        ]
+
+    def _send_discovery(self, topic) -> bool:
+        payload = self._discovery[topic]
 
-        statustopic = "homeassistant/status"
-        print(f"subscribing to status topic {statustopic}")
-        self.subscribe(statustopic)
+        print(f"discovering on topic {topic}")
+        if not self.publish(topic, payload, retain=True, qos=self._reliable):
+            return False
+
+        self._discovery_sent[topic] = hash(payload)
+        self._republish = True
+        return True
+
+    def republish(self):
+        """Read and publish every entity on the next loop iteration"""
+        self._published.clear()
+        for entry in self._schedule:
+            entry[0] = 0
+
+    def rediscover(self, force: bool = False):
+        """
+        Republish changed discovery configs, or all of them with `force`
+        """
+        if force:
+            self._discovery_sent.clear()
+
+        if self.connected:
+            self._to_discover = self.discovery_changed()
+            self._set_state(DISCOVERING)
 
     def callback(self, topic, msg):
         """
@@ -136,42 +544,194 @@ class DiscoverableDevice(MQTTClient):
 
         Switch toggles from HA MQTT are either b'ON' or b'OFF', on the
         topic that was set in that switch's command_topic
+
+        Messages which arrive while a publish waits for room in the in-flight
+        window are put aside until it returns, see `handle_deferred`.
         """
-        topic = topic.decode()
+        if self._awaiting_ack:
+            self._deferred.append((topic, msg))
+            return
+
         msg = msg.decode()
 
         print(f"received msg '{msg}'\non topic '{topic}'")
 
-        if msg == "online":
+        if topic == STATUS_TOPIC and msg == "online":
             print("Broker reports that it is online")
-            if not self.broker_alive:
-                print("Broker currently offline, setting up.")
-                self.initial_setup()
-                self.discover()
+            # HA has (re)started and has no state, send everything again
+            self._published.clear()
+            self.rediscover(force=True)
 
             self._broker_alive = True
 
-        elif msg == "offline":
+        elif topic == STATUS_TOPIC and msg == "offline":
             print("Broker reports that it is going offline")
             self._broker_alive = False
+
+        elif topic == self._history_topic:
+            self._history_request(msg)
+            return
         
-        if topic not in self._command_mapping:
+        try:
+            # entities subscribed to this topic
+            entities = self._command_mapping[topic]
+        except KeyError:
             print(f"topic {topic} is not assigned to a sensor, skipping.")
             return
-        # list of sensors subscribed to this topic
-        sensornames = self._command_mapping[topic]
 
-        for name in sensornames:
-            self._sensors[name].callback(msg)
+        handled = []
+        changed = []
+        for entity in entities:
+            # an entity can return False from its callback to say it ignored `msg`
+            if entity.callback(msg) is False:
+                continue
+
+            handled.append(entity.name)
+            if self.commanded(entity, msg):
+                changed.append(entity.name)
+
+        # only those whose state just changed skip the cached reading, a burst of
+        # the same command is one hardware read
+        self.push_data(self.read_sensors(handled, fresh=changed))
+
+    def handle_deferred(self):
+        """
+        Handle the messages put aside by `callback` while waiting on a PUBACK
+
+        Handling them there would publish their states from inside that
+        publish, waiting on the window again with the outer wait's deadline
+        left to run out.
+        """
+        while len(self._deferred) > 0:
+            topic, msg = self._deferred.pop(0)
+            self.callback(topic, msg)
+
+    def _keeps_history(self) -> bool:
+        for sensor in self._sensors.values():
+            if sensor._histories:
+                return True
+        return False
+
+    def _history_request(self, msg: str):
+        """Answer `{"field": ..., "since": s, "until": s}` on the history topic"""
+        try:
+            request = json.loads(msg)
+            field = request["field"]
+            since = int(request["since"])
+            until = int(request.get("until", 0))
+        except (ValueError, KeyError, TypeError) as ex:
+            print(f"bad history request {msg} ({ex!r})")
+            return
+
+        self.send_history(field, since, until)
+
+    def send_history(self, field: str, since: int, until: int = 0) -> int:
+        """
+        Publish the kept history of `field`, from `since` to `until` seconds ago
+
+        Goes to `history_topic`/<field> as one or more packed messages (see
+        utils.History.pack), with each sample's age in ms from when the
+        request was handled. Returns the messages sent, 0 if `field` has no
+        history (see `Sensor.keep_history`).
+
+        HA won't use these, they are for a collector backfilling gaps: it
+        publishes the request to `history_topic` and reassembles the chunks.
+        """
+        for sensor in self._sensors.values():
+            history = sensor.history(field)
+            if history is not None:
+                break
+        else:
+            print(f"no history kept for {field}")
+            return 0
 
-        self.push_data(self.read_sensors(sensornames))
+        topic = self.intern(self.history_topic + b"/" + field.encode())
+
+        sent = 0
+        # QoS 0, the reply has the chunk count so a collector can ask again for gaps
+        for message in history.pack(time.ticks_ms(), since * 1000, until * 1000):
+            if not self.publish(topic, message):
+                break
+            sent += 1
+
+        return sent
 
     def irq_callback(self, pin):
-        pin = get_gpio(pin)
-        print(f"Toplevel irq_callback for pin {pin}")
-        name = self._irq_mapping[pin]
+        """
+        Called from the trigger's hard IRQ, after it has queued its event
+
+        Nothing here may allocate or touch the network. On the board the
+        event queue is coalesced via micropython.schedule, the reading and
+        publishing happen in `drain_events`.
+        """
+        if schedule is None:
+            self._coalesce(0)
+            return
+
+        if not self._irq_scheduled:
+            self._irq_scheduled = True
+            schedule(self._coalesce_ref, 0)
+
+    def _coalesce(self, _):
+        """
+        Fold queued edges into one pending event per pin (soft context)
+        """
+        self._irq_scheduled = False
+
+        event = self._events.get()
+        while event is not None:
+            self._irq_pending[event[0]] = event[1]
+            event = self._events.get()
+
+        if self._async and len(self._irq_pending) > 0:
+            self._irq_flag.set()
+
+    def _pop_irq(self) -> list:
+        """
+        Names of the triggers with pending events, removing them
+
+        A scheduled `_coalesce` can run in the middle of this (the VM runs
+        pending callbacks on backward jumps), so entries are popped one by
+        one: an edge added meanwhile is either popped here or stays pending,
+        never cleared unhandled.
+        """
+        self._coalesce(0)
+
+        names = []
+        while len(self._irq_pending) > 0:
+            pin, _ = self._irq_pending.popitem()
+            name = self._irq_mapping[pin].name
+            if name not in names:
+                names.append(name)
+
+        return names
 
-        self.push_data(self.read_sensors([name]))
+    def drain_events(self):
+        """
+        Read and publish every trigger that has fired since the last call
+        """
+        if len(self._events) == 0 and len(self._irq_pending) == 0:
+            return
+
+        names = self._pop_irq()
+        print(f"draining irq for {names}")
+        # an edge is a change of state, so the cached reading is out of date
+        self.push_data(self.read_sensors(names, fresh=True))
+
+    @property
+    def irq_dropped(self) -> int:
+        """Trigger edges lost to a full event queue"""
+        return self._events.dropped
+
+    @property
+    def irq_bounced(self) -> int:
+        """Trigger edges ignored by the debounce"""
+        return sum(trigger.bounced for trigger in self._irq_mapping.values())
+
+    @property
+    def stats(self):
+        """Loop instrumentation, see utils.Stats"""
+        return self._stats
 
     @property
     def wlan(self):
@@ -188,32 +748,24 @@ class DiscoverableDevice(MQTTClient):
     @property
     def device_payload(self):
         """Device payload for nicer looking interface in HA"""
-        payload = {}
-        # not the right way to do it, but something about pylance hates a direct setup
-        payload["identifiers"] = [self.uid]
-        payload["name"] = self.name
-        payload["sw_version"] = __version__
-        payload["model"] = self.name
-        payload["manufacturer"] = "ljbeal"
-
-        if self.location is not None:
-            payload["suggested_area"] = self.location
-
-        return payload
+        return device_payload(self.uid, self.name, self.location)
 
     def discover(self):
         """
         Iterate over all sensors and switches, sending their discovery payload to their discovery address
-        """
-        for sensor in self.sensors:
-            print(f"discovering for sensor {sensor}")
-            sensor.discover(self, self.device_payload)
 
-        for topic in self._command_mapping:
-            print("subscribing to command topic", topic)
-            self.subscribe(topic)
+        Blocking, the run loops discover through `service` instead. This
+        steps the same state machine until it is online, subscribing before
+        any config is in flight (umqtt's subscribe reads until its SUBACK
+        and drops whatever PUBACKs arrive meanwhile), so a `run` afterwards
+        does not send the configs again.
+        """
+        if not self.connected:
+            print("not connected, cannot discover")
+            return
 
-        self._discovered = True
+        while self.connected and not self.online:
+            self.service()
 
     @property
     def discovered(self):
@@ -231,6 +783,10 @@ class DiscoverableDevice(MQTTClient):
     @location.setter
     def location(self, location):
         self._location = location
+        # device payload has changed, so has every discovery payload
+        self._discovery = {}
+        if self.discovered:
+            self.rediscover()
 
     @property
     def uid(self):
@@ -244,7 +800,7 @@ class DiscoverableDevice(MQTTClient):
     @property
     def switches(self):
         """Returns just switches"""
-        return [s for s in self.sensors if isinstance(s, Switch)]
+        return [s for s in self.sensors if s._command_topic_b is not None]
 
     @property
     def discovery_prefix(self):
@@ -254,171 +810,767 @@ class DiscoverableDevice(MQTTClient):
         if self.discovered:
             raise RuntimeError("Cannot add entity after discovery")
 
+        self._register(entity)
         name = entity.name
-        if name in self.sensors:
-            raise ValueError(
-                f"Sensor {name} already exists! Delete it or choose a different name."
-            )
 
-        entity._discovery_prefix = self.discovery_prefix
-        entity._parent_uid = self.uid
+        self._stats.add_sensor(name)
+        if self._templates:
+            # recompiled with this entity's fields on next use
+            self._templates.pop(entity._state_topic_b, None)
+        # due immediately
+        heapq.heappush(self._schedule, [0, name])
 
-        self._sensors[name] = entity
-
-        if isinstance(entity, Trigger):
+        if hasattr(entity, "set_queue"):
+            # a Trigger
             # set irq callback
             print(f"setting irq callback for {entity}")
+            entity.set_queue(self._events)
             entity.set_callback(self.irq_callback)
-            self._irq_mapping[entity.gpio_pin] = entity.name
+            self._irq_mapping[entity.gpio_pin] = entity
+            self._event_topics.add(entity._state_topic_b)
 
-        if not hasattr(entity, "command_topic"):
+        if entity._command_topic_b is None:
             return
 
-        command_topics = [entity.command_topic]
+        command_topics = [entity._command_topic_b]
 
-        for topic in command_topics:            
+        for topic in command_topics:
             try:
-                if entity.name not in self._command_mapping[topic]:
-                    self._command_mapping[topic].append(entity.name)
+                if entity not in self._command_mapping[topic]:
+                    self._command_mapping[topic].append(entity)
             except KeyError:
-                self._command_mapping[topic] = [entity.name]
+                self._command_mapping[topic] = [entity]
 
     def delete(self):
         """
         Deletes all sensors
         """
-        for sensor in self.sensors:
-            topic = sensor.discovery_topic
+        if len(self._discovery) == 0:
+            self.build_discovery()
+
+        for topic in self._discovery:
+            self.publish(topic, "", retain=True)
 
-            self.publish(topic, "")
+        self._discovery_sent.clear()
 
     @property
     def data(self):
-        return self._data
+        """Latest reading of every field, merged from the entities' own data"""
+        output = {}
+        for sensor in self._sensors.values():
+            output.update(sensor.data)
+        return output
 
     @property
     def interval(self):
         return self._interval
 
-    def read_sensors(self, selection: list | None = None):
-        """
-        Read all sensor data and send to broker.
-
-        Note that this will call `discover` if not already called.
+    def _select(self, selection: list | None):
+        """Entities for a list of names, or all of them for None"""
+        if selection is None:
+            return self._sensors.values()
+        return [self._sensors[name] for name in selection]
 
-        This will "freeze" the class in place, blocking further additions.
+    def read_sensors(self, selection: list | None = None, fresh: bool | list = False):
+        """
+        Read sensor data, returning the payloads to send to the broker.
+
+        Args:
+            selection:
+                names of the sensors to read, defaults to all of them
+            fresh:
+                read the hardware even where a reading is younger than the
+                entity's `ttl`: True for every entity, or a list of the
+                names of those whose state has just changed
+
+        Split-phase sensors (see `Sensor.start`) have their conversions started
+        first, the plain sensors are read while those run, then the results are
+        collected in deadline order. A cycle then takes about as long as the
+        slowest conversion rather than the sum of them.
+
+        This runs regardless of the connection state.
         """
-        if not self.discovered:
-            self.discover()
-
         self._read_failure_count = 0
 
         # data to send, {topic: {payload}}
         topics = {}
+        merged = []  # topics whose payload is our own copy, see `_collect`
+
+        pending = self._start_sensors(topics, merged, self._select(selection), fresh)
 
-        for sensor in self.sensors:
-            if selection is not None and sensor.name not in selection:
+        for deadline, sensor in pending:
+            wait = time.ticks_diff(deadline, time.ticks_ms())
+            if wait > 0:
+                time.sleep_ms(wait)
+
+            self._collect(topics, sensor, self._timed_collect(sensor), merged)
+
+        return topics
+
+    def _start_sensors(self, topics, merged, sensors, fresh: bool | list = False) -> list:
+        """
+        Start the split-phase sensors in `sensors`, reading the rest straight into `topics`
+
+        Sensors with a reading younger than their `ttl` reuse it, unless `fresh`.
+        Returns the started sensors as [(deadline, sensor)], soonest first.
+        """
+        pending = []
+
+        for sensor in sensors:
+            if self._reuse(topics, merged, sensor, fresh):
                 continue
 
             try:
-                val = sensor._read(force=True)
+                t0 = time.ticks_us()
+                deadline = sensor._start()
+                if deadline is None:
+                    val = sensor._read(force=True, fresh=True)
+                    self._stats.read(sensor.name, time.ticks_diff(time.ticks_us(), t0))
+                    self._collect(topics, sensor, val, merged)
+                else:
+                    pending.append((deadline, sensor))
             except NotImplementedError:
                 continue
 
-            if val is None:
+        now = time.ticks_ms()
+        pending.sort(key=lambda item: time.ticks_diff(item[0], now))
+
+        return pending
+
+    def _reuse(self, topics, merged, sensor, fresh) -> bool:
+        """Collect `sensor`'s cached reading into `topics`, False if it has to be read"""
+        if fresh is True or (fresh and sensor.name in fresh):
+            return False
+
+        cached = sensor._cached()
+        if cached is None:
+            return False
+
+        self._stats.count("cached")
+        self._collect(topics, sensor, cached, merged)
+        return True
+
+    async def aread_sensors(
+        self, selection: list | None = None, queue: bool = False, filtered: bool = False, fresh: bool | list = False
+    ):
+        """
+        Async version of `read_sensors`, yielding to other tasks between sensors
+
+        Sensors implementing `aread` are awaited, split-phase sensors are
+        started up front and collected once their conversions are done.
+        With `queue`, readings are handed to the publish task before awaiting
+        anything slow, so it does not hold back the others.
+        `filtered` is passed on to `_queue_publish`, `fresh` is as for `read_sensors`.
+        """
+        _load_asyncio()
+        topics = {}
+        merged = []
+
+        sensors = self._select(selection)
+        # split-phase sensors are started up front, then collected at the end
+        pending = self._start_sensors(
+            topics, merged, [sensor for sensor in sensors if not hasattr(sensor, "aread")], fresh
+        )
+
+        for sensor in sensors:
+            if not hasattr(sensor, "aread"):
+                continue
+
+            if self._reuse(topics, merged, sensor, fresh):
                 continue
-            # need access for rgb_state_topic, etc.
-            topic = sensor.state_topic
-            # update data entity
-            self._data.update(val)
+
+            if queue:
+                self._queue_publish(topics, filtered)
+                topics = {}
+                merged = []
 
             try:
-                topics[topic].update(val)
-            except KeyError:
-                topics[topic] = val
+                t0 = time.ticks_us()
+                val = await sensor._aread(force=True, fresh=True)
+                self._stats.read(sensor.name, time.ticks_diff(time.ticks_us(), t0))
+            except NotImplementedError:
+                continue
+
+            self._collect(topics, sensor, val, merged)
+            await asyncio.sleep(0)
+
+        for deadline, sensor in pending:
+            wait = time.ticks_diff(deadline, time.ticks_ms())
+            if wait > 0:
+                if queue:
+                    self._queue_publish(topics, filtered)
+                    topics = {}
+                    merged = []
+
+                await asyncio.sleep(wait / 1000)
+
+            self._collect(topics, sensor, self._timed_collect(sensor), merged)
+
+        if queue:
+            self._queue_publish(topics, filtered)
 
         return topics
 
-    def push_data(self, topics):
+    def _timed_collect(self, sensor):
+        """
+        Second half of a split-phase read, timed as the sensor's read time
+
+        The conversion itself runs in the background, so isn't counted.
+        """
+        t0 = time.ticks_us()
+        val = sensor._collect()
+        self._stats.read(sensor.name, time.ticks_diff(time.ticks_us(), t0))
+        return val
+
+    def _collect(self, topics, sensor, val, merged):
+        """
+        Merge reading `val` from `sensor` into the `topics` payload dict
+
+        A topic read from a single sensor uses that sensor's data as its
+        payload, without a copy. Only once a second sensor joins the topic is
+        a new dict made (and its topic noted in the `merged` list), so that
+        merging never alters sensor.data.
+        """
+        if val is None:
+            return
+        # need access for rgb_state_topic, etc.
+        topic = sensor._state_topic_b
+
+        try:
+            payload = topics[topic]
+        except KeyError:
+            topics[topic] = val
+            return
+
+        if topic not in merged:
+            payload = dict(payload)
+            topics[topic] = payload
+            merged.append(topic)
+
+        payload.update(val)
+
+    def pop_due(self) -> list:
+        """
+        Pop the names of all sensors whose deadline has passed, rescheduling them
+        """
+        now = monotonic_ms()
+        due = []
+
+        while len(self._schedule) > 0 and self._schedule[0][0] <= now:
+            entry = heapq.heappop(self._schedule)
+            name = entry[1]
+            due.append(name)
+
+            interval = self._sensors[name].interval * 1000
+            entry[0] += interval
+            if entry[0] <= now:
+                # fell behind (or first read), don't try to catch up
+                entry[0] = now + interval
+
+            heapq.heappush(self._schedule, entry)
+
+        return due
+
+    def time_to_next(self) -> int:
+        """Time in ms until the next sensor is due"""
+        if len(self._schedule) == 0:
+            return self.interval * 1000
+
+        return max(0, self._schedule[0][0] - monotonic_ms())
+
+    def _wait_msg(self, timeout: int):
+        """
+        Block for up to `timeout` ms waiting on an incoming message, then handle it
+        """
+        self._stats.sample_heap()
+        t0 = time.ticks_us()
+
+        if self._poller is None:
+            # not connected, nothing to wait on
+            time.sleep_ms(timeout)
+            self._stats.add("jitter", max(0, time.ticks_diff(time.ticks_us(), t0) - timeout * 1000))
+            return
+
+        if len(self._poller.poll(timeout)) == 0:
+            # timed out, so this is how late the loop woke up
+            self._stats.add("jitter", max(0, time.ticks_diff(time.ticks_us(), t0) - timeout * 1000))
+            return
+
+        self._check_msg()
+
+    def _check_msg(self):
+        """`check_msg`, timed, also taking in PUBACKs"""
+        t0 = time.ticks_us()
+        if self.check_msg() == 0x40:
+            # umqtt.simple leaves anything but a PUBLISH undecoded
+            self._on_puback()
+        self._stats.add("check_msg", time.ticks_diff(time.ticks_us(), t0))
+
+    def _on_puback(self):
+        self.sock.read(1)  # remaining length, always 2
+        pid = self.sock.read(2)
+        pid = pid[0] << 8 | pid[1]
+
+        if self._inflight is None or not self._inflight.ack(pid):
+            print(f"PUBACK for unknown packet id {pid}")
+
+    def _keepalive(self):
+        """Ping the broker if nothing has been sent for half of the keepalive"""
+        if self.connected and monotonic_ms() - self._last_tx > self.keepalive * 500:
+            self.ping()
+            self._last_tx = monotonic_ms()
+
+    @property
+    def heartbeat(self):
+        return self._heartbeat
+
+    def changed(self, topics: dict) -> dict:
+        """
+        Filter `topics` down to those worth publishing
+
+        A topic is kept if any field has crossed its deadband since it was last
+        published, or if the topic has been silent for longer than `heartbeat`.
+        See `Entities.topic_changed`.
+        """
+        now = monotonic_ms()
+        output = {}
+
+        for topic, payload in topics.items():
+            if self.topic_changed(topic, payload, self.heartbeat, now):
+                output[topic] = payload
+
+        return output
+
+    def push_data(self, topics, filtered: bool = False):
+        """
+        Publish `topics`. With `filtered`, unchanged topics are skipped (see `changed`)
+        """
+        if filtered:
+            topics = self.changed(topics)
+
         for topic, payload in topics.items():
+            payload = self.complete(topic, payload)
             print(timestamp(), payload)
-            self.publish(topic, json.dumps(payload))
+
+            t0 = time.ticks_us()
+            msg = self.serialise(topic, payload)
+            t1 = time.ticks_us()
+            self.send_state(topic, msg)
+
+            self._stats.add("serialise", time.ticks_diff(t1, t0))
+            self._stats.add("publish", time.ticks_diff(time.ticks_us(), t1))
+
+            self.mark_published(topic, payload, monotonic_ms())
+
+    def template(self, topic):
+        """
+        The PayloadTemplate for state `topic`, compiled on first use
+
+        Fields are every state field (see `Sensor.fields`) of the entities
+        publishing on the topic, in the order they were added. A field
+        several entities share (e.g. the temperature of a BME280 and a
+        BME680) is taken once, with the precision of the first.
+        """
+        try:
+            return self._templates[topic]
+        except KeyError:
+            pass
+
+        fields = []
+        names = []
+        for sensor in self._sensors.values():
+            if sensor._state_topic_b is not topic:
+                continue
+
+            for field, data in sensor.fields():
+                if field in names:
+                    continue
+                names.append(field)
+                fields.append((field, precision(data.get("value_mod", None))))
+
+        template = PayloadTemplate(fields)
+        self._templates[topic] = template
+
+        return template
+
+    def serialise(self, topic, payload: dict):
+        """
+        Serialise a state `payload`, through the topic's template where it has every key
+
+        Returns a memoryview into the template's buffer, valid until the next
+        state on this topic, or a str from json.dumps.
+        """
+        if self._templates is not None:
+            template = self.template(topic)
+            if template.covers(payload):
+                return template.render(payload)
+
+        return json.dumps(payload)
+
+    def bring_up(self):
+        """
+        Step the connection as far as it goes without waiting on a backoff
+
+        Called before the first reading, so that it can be published straight
+        away rather than queued. Stops at discovering (or on a failure).
+        """
+        while self._state < DISCOVERING and self.time_to_retry() == 0:
+            self.service()
 
     def run(self, once=False, dry_run=False):
-        print(f"running with interval {self.interval}")
-        last_read = 0
+        print(f"running with default interval {self.interval}")
+
+        self.bring_up()
 
         while True:
-            if self.broker_alive and time.time() >= last_read + self.interval:
-                topics = self.read_sensors()
-                last_read = time.time()
+            self.service()
+            self.drain()
+            self.resend()
+            self.handle_deferred()
+            self.drain_events()
+
+            if self.broker_alive:
+                due = self.pop_due()
 
-                if not dry_run:
-                    self.push_data(topics)
+                if len(due) > 0:
+                    topics = self.read_sensors(due)
+
+                    if not dry_run:
+                        self.push_data(topics, filtered=True)
+
+            # sleep on the socket until either a message arrives, a sensor is due,
+            # or the connection needs attention
+            timeout = self.time_to_retry()
+            if once:
+                timeout = 0
+            elif self.broker_alive:
+                timeout = min(self.time_to_next(), timeout)
+
+            if len(self._irq_mapping) > 0:
+                timeout = min(IRQ_LATENCY, timeout)
 
             try:
-                self.check_msg()
-            except MQTTException:
-                print("MQTTException, reconnecting")
-                self.initial_setup()
-                self.discover()
-            except OSError:
-                print("OSError, reconnecting")
-                self.initial_setup()
-                self.discover()
-
-            time.sleep(0.05)
+                self._wait_msg(timeout)
+                self._keepalive()
+            except MQTTException as ex:
+                self._fail(f"MQTTException {ex}")
+            except OSError as ex:
+                self._fail(f"OSError {ex}")
 
             if once:
                 return
 
-    def publish(self, *args, **kwargs):
+    def run_async(self):
+        """
+        Run the device using asyncio, see `arun`
+        """
+        _load_asyncio()
+        asyncio.run(self.arun())
+
+    async def arun(self):
+        """
+        Run the device as a set of cooperative tasks:
+
+        - connection: steps the connection state machine, see `service`
+        - receive: polls the mqtt socket, handling commands as they arrive
+        - acquire: reads all sensors every `interval`
+        - irq: reads triggers that have fired
+        - publish: sends whatever the other tasks have queued
+
+        A slow sensor (one that implements `aread`) then only delays its own
+        reading, commands from HA are still handled within RECEIVE_INTERVAL.
+        """
+        _load_asyncio()
+        print(f"running async with interval {self.interval}")
+        self._async = True
+        self._publish_flag = make_flag()
+        self._irq_flag = make_flag()
+
+        self.bring_up()
+
+        await asyncio.gather(
+            self._connection_task(),
+            self._receive_task(),
+            self._acquire_task(),
+            self._irq_task(),
+            self._publish_task(),
+        )
+
+    def _queue_publish(self, topics, filtered: bool = False):
+        """
+        Hand `topics` over to the publish task, dropping unchanged ones if `filtered`
+        """
+        if filtered:
+            topics = self.changed(topics)
+
+        for topic, payload in topics.items():
+            try:
+                # a copy, the pending payload may be a sensor's own data
+                pending = dict(self._pending[topic])
+                pending.update(payload)
+                self._pending[topic] = pending
+            except KeyError:
+                self._pending[topic] = payload
+
+        if len(self._pending) > 0:
+            self._publish_flag.set()
+
+    async def _connection_task(self):
+        while True:
+            self.service()
+            self.drain()
+            self.resend()
+
+            await asyncio.sleep(self.time_to_retry() / 1000)
+
+    async def _receive_task(self):
+        while True:
+            self._stats.sample_heap()
+            if self.connected:
+                try:
+                    self._check_msg()
+                    self._keepalive()
+                    self.handle_deferred()
+                except MQTTException as ex:
+                    self._fail(f"MQTTException {ex}")
+                except OSError as ex:
+                    self._fail(f"OSError {ex}")
+
+            await asyncio.sleep(RECEIVE_INTERVAL)
+
+    async def _acquire_task(self):
+        while True:
+            if self.broker_alive:
+                due = self.pop_due()
+
+                if len(due) > 0:
+                    await self.aread_sensors(due, queue=True, filtered=True)
+
+                wait = self.time_to_next()
+                t0 = time.ticks_us()
+                await asyncio.sleep(wait / 1000)
+                self._stats.add("jitter", max(0, time.ticks_diff(time.ticks_us(), t0) - wait * 1000))
+            else:
+                await asyncio.sleep(self.interval)
+
+    async def _irq_task(self):
+        while True:
+            await self._irq_flag.wait()
+            # cleared before popping, so an edge coalesced from here on sets it again
+            self._irq_flag.clear()
+
+            names = self._pop_irq()
+            if len(names) == 0:
+                continue
+
+            print(f"draining irq for {names}")
+            await self.aread_sensors(names, queue=True, fresh=True)
+
+    async def _publish_task(self):
+        while True:
+            await self._publish_flag.wait()
+            self._publish_flag.clear()
+
+            topics = self._pending
+            self._pending = {}
+
+            self.push_data(topics)
+
+    def publish(self, topic, msg, retain=False, qos=0) -> bool:
+        """
+        Publish a message, returning True on success
+
+        Never blocks on a dead connection, a failure hands over to the
+        state machine to reconnect.
+
+        With the in-flight window, QoS 1 does not wait for the PUBACK: the
+        message is held until its ack arrives (see `_check_msg`), and sent
+        again by `resend` if it takes longer than ACK_TIMEOUT. Only a full
+        window waits, for the oldest ack.
+        """
+        if not self.connected:
+            print("not connected, dropping message")
+            return False
+
+        if qos == 1 and self._inflight is not None:
+            return self._publish_windowed(topic, msg, retain)
+
         try:
-            super().publish(*args, **kwargs)
-            self._connection_failure_count = 0
-        except OSError:
-            print(
-                f"failed to publish {self.conn_fail_count} times, retrying in {RETRY_INTERVAL}s"
-            )
-            self._connection_failure_count += 1
-
-            if self.conn_fail_count > RETRY_COUNT:
-                print(
-                    f"connection has failed {RETRY_COUNT} times, assuming the broker is dead"
-                )
-                self._broker_alive = False
-                return
+            super().publish(topic, msg, retain, qos)
+            self._last_tx = monotonic_ms()
+        except OSError as ex:
+            self._fail(f"failed to publish ({ex})")
+            return False
+
+        return True
+
+    def _publish_windowed(self, topic, msg, retain) -> bool:
+        if self._inflight.full and not self._await_ack():
+            return False
+
+        if isinstance(msg, memoryview):
+            # kept for retransmission, the template buffer is reused
+            msg = bytes(msg)
+
+        self.pid = self.pid % 0xFFFF + 1
+        while self._inflight.holds(self.pid):
+            self.pid = self.pid % 0xFFFF + 1
+
+        try:
+            self._send_publish(topic, msg, retain, self.pid)
+        except OSError as ex:
+            self._fail(f"failed to publish ({ex})")
+            return False
+
+        self._last_tx = monotonic_ms()
+        self._inflight.add(self.pid, topic, msg, retain, self._last_tx)
+        return True
+
+    def _send_publish(self, topic, msg, retain, pid, dup=False):
+        """Write a QoS 1 PUBLISH, as umqtt.simple would but without waiting for the ack"""
+        pkt = bytearray(b"\x32\0\0\0\0")
+        pkt[0] |= dup << 3 | retain
+        sz = 2 + len(topic) + 2 + len(msg)
+        i = 1
+        while sz > 0x7F:
+            pkt[i] = (sz & 0x7F) | 0x80
+            sz >>= 7
+            i += 1
+        pkt[i] = sz
+
+        self.sock.write(pkt, i + 1)
+        self._send_str(topic)
+        struct.pack_into("!H", pkt, 0, pid)
+        self.sock.write(pkt, 2)
+        self.sock.write(msg)
+
+    def _await_ack(self) -> bool:
+        """
+        Wait for a slot in the full in-flight window, up to the oldest message's timeout
+
+        A broker which stops acknowledging is treated as a dead connection,
+        what is in flight goes again after reconnecting. Anything but a
+        PUBACK received meanwhile is deferred, see `callback`.
+        """
+        deadline = self._inflight.next_expiry(ACK_TIMEOUT)
+
+        self._awaiting_ack = True
+        try:
+            while self._inflight.full:
+                remaining = deadline - monotonic_ms()
+                if remaining <= 0:
+                    self._fail("no PUBACK with the in-flight window full")
+                    return False
+
+                if len(self._poller.poll(remaining)) > 0:
+                    self._check_msg()
+        except (OSError, MQTTException) as ex:
+            self._fail(f"failed waiting for PUBACK ({ex})")
+            return False
+        finally:
+            self._awaiting_ack = False
+
+        return True
+
+    def resend(self):
+        """
+        Retransmit (with DUP set) QoS 1 messages whose PUBACK is overdue
+        """
+        if self._inflight is None or self._state < DISCOVERING or len(self._inflight) == 0:
+            return
+
+        now = monotonic_ms()
+        for i in self._inflight.expired(now, ACK_TIMEOUT):
+            pid, topic, msg, retain = self._inflight.entry(i)
+            print(f"no PUBACK for packet {pid}, resending")
 
-            blink(RETRY_INTERVAL)
-            self.publish(*args, **kwargs)
+            try:
+                self._send_publish(topic, msg, retain, pid, dup=True)
+            except OSError as ex:
+                return self._fail(f"failed to resend ({ex})")
+
+            self._inflight.resent(i, now)
+            self._last_tx = now
+
+    @property
+    def inflight(self):
+        """QoS 1 messages awaiting their PUBACK, see utils.InFlight"""
+        return self._inflight
 
 
 class constant(Sensor):
-    def __init__(self, name, value, unit=None, icon=None):
+
+    __slots__ = ("unit", "icon", "value", "_signature")
+
+    extra_discovery_fields = {"entity_category": "diagnostic"}
+
+    def __init__(self, name, value, unit=None, icon=None, interval=CONSTANT_INTERVAL):
         self.unit = unit
         self.icon = icon
         self.value = value
+        self._signature = {name: {"icon": icon, "unit": unit}}
 
-        super().__init__(name)
+        super().__init__(name, interval=interval)
 
     @property
     def signature(self):
-        return {self.name: {"icon": self.icon, "unit": self.unit}}
+        return self._signature
 
     @property
     def value_template(self):
         return "{{ " + f"value_json.{self.name}" + " }}"
 
-    @property
-    def extra_discovery_fields(self):
-        output = {"entity_category": "diagnostic"}
-        if self.unit is not None:
-            output["unit"] = unit
+    def read(self):
+        return {self.name: self.value}
 
-        return output
+
+class diagnostic(Sensor):
+    """
+    Reports the device's own instrumentation (see utils.Stats) to HA
+
+    Times are means in ms, except the loop jitter which is the p95.
+    """
+
+    __slots__ = ("_stats",)
+
+    _MS = {"icon": "mdi:timer-outline", "unit": "ms", "value_mod": "round(2)"}
+    signature = {
+        "diag_slowest_sensor": {"icon": "mdi:snail"},
+        "diag_slowest_read": _MS,
+        "diag_serialise": _MS,
+        "diag_publish": _MS,
+        "diag_check_msg": _MS,
+        "diag_loop_jitter": _MS,
+        "diag_mem_free": {"icon": "mdi:memory", "unit": "B"},
+        "diag_connects": {"icon": "mdi:lan-connect"},
+        "diag_failures": {"icon": "mdi:lan-disconnect"},
+        "diag_cached_reads": {"icon": "mdi:cached"},
+    }
+
+    extra_discovery_fields = {"entity_category": "diagnostic"}
+
+    def __init__(self, stats, name="diagnostics", interval=DIAGNOSTIC_INTERVAL):
+        self._stats = stats
+
+        super().__init__(name, interval=interval)
 
     def read(self):
-        return {self.name: self.value}
+        stats = self._stats
+        timings = stats.timings
+        slowest, slowest_us = stats.slowest()
+
+        return {
+            "diag_slowest_sensor": slowest,
+            "diag_slowest_read": slowest_us / 1000,
+            "diag_serialise": timings["serialise"].mean / 1000,
+            "diag_publish": timings["publish"].mean / 1000,
+            "diag_check_msg": timings["check_msg"].mean / 1000,
+            "diag_loop_jitter": timings["jitter"].p95() / 1000,
+            "diag_mem_free": stats.mem_free,
+            "diag_connects": stats.counters["connects"],
+            "diag_failures": stats.counters["failures"],
+            "diag_cached_reads": stats.counters["cached"],
+        }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,450 @@
+"""
+Gateway mode: many logical devices over one MQTT connection, on CPython
+
+    gateway = Gateway(host="broker", user="", password="")
+    for i in range(100):
+        device = VirtualDevice(uid=f"host{i}", name=f"Host{i}")
+        device.add_entity(SomeSensor(...))
+        gateway.add_device(device)
+    gateway.run_forever()
+
+Each VirtualDevice has its own uid, device block, entities and discovery,
+exactly as a DiscoverableDevice would publish them. The gateway owns the
+connection (utils.AsyncMQTT), one command topic dispatch table and one read
+schedule across every entity of every device, so thousands of entities
+cost one socket, one keepalive and one task.
+"""
+
+import asyncio
+import heapq
+import json
+
+from DiscoverableDevice.utils.AsyncMQTT import AsyncMQTTClient, MQTTException, monotonic_ms, INFLIGHT
+from DiscoverableDevice.utils.Entities import Entities, HEARTBEAT, READ_TTL
+from DiscoverableDevice.utils.backoff import backoff_ms
+from DiscoverableDevice.utils.discovery import (
+    build_discovery,
+    device_payload,
+    DISCOVERY_FULL,
+    MODES,
+    STATUS_TOPIC,
+)
+
+
+class VirtualDevice(Entities):
+    """
+    One logical device behind a Gateway
+
+    Args:
+        uid:
+            unique id, takes the place of the board's machine.unique_id
+        name:
+            device name
+        location:
+            device location, defaults None, and will be unreported
+        interval:
+            default report interval, defaults to 5s. Entities can set their own
+        discovery_prefix:
+            home assistant discovery prefix, defaults to "homeassistant"
+        discovery_mode:
+            DISCOVERY_FULL (default), DISCOVERY_COMPACT or DISCOVERY_DEVICE
+    """
+
+    def __init__(
+        self,
+        uid: str,
+        name: str,
+        location: str | None = None,
+        interval: int = 5,
+        discovery_prefix: str = "homeassistant",
+        discovery_mode: str = DISCOVERY_FULL,
+    ):
+        if discovery_mode not in MODES:
+            raise ValueError(f"unknown discovery mode {discovery_mode}")
+
+        self._uid = uid
+        self._name = name
+        self._location = location
+        self._interval = interval
+        self._discovery_prefix = discovery_prefix
+        self._discovery_mode = discovery_mode
+
+        self._init_entities(READ_TTL)
+        self._gateway = None
+
+    @property
+    def uid(self):
+        return self._uid
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def location(self):
+        return self._location
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def discovery_prefix(self):
+        return self._discovery_prefix
+
+    @property
+    def discovery_mode(self):
+        return self._discovery_mode
+
+    @property
+    def device_discovery_topic(self):
+        """Topic for the single config used by DISCOVERY_DEVICE"""
+        return f"{self.discovery_prefix}/device/{self.uid}/config"
+
+    @property
+    def device_payload(self):
+        return device_payload(self.uid, self.name, self.location)
+
+    @property
+    def sensors(self):
+        return list(self._sensors.values())
+
+    def add_entity(self, entity):
+        if self._gateway is not None:
+            raise RuntimeError("Cannot add entity after the device is added to a gateway")
+
+        self._register(entity)
+
+    def build_discovery(self) -> list:
+        """Serialised discovery configs, as [(topic bytes, payload)]"""
+        configs = build_discovery(
+            self._sensors.values(), self.device_payload, self.discovery_mode, self.device_discovery_topic
+        )
+        return [(self.intern(topic), payload) for topic, payload in configs]
+
+
+class Gateway:
+    """
+    Serve many VirtualDevices over one MQTT connection
+
+    Args:
+        host:
+            mqtt broker hostname, either address or ip
+        user:
+            mqtt username
+        password:
+            mqtt password
+        port:
+            mqtt broker port
+        client_id:
+            mqtt client id, defaults to one picked by the broker
+        heartbeat:
+            readings which haven't crossed their signature "deadband" are only
+            republished after this many seconds. Set to 0 to publish every reading
+        inflight:
+            unacknowledged QoS 1 messages (the retained discovery configs)
+            allowed at once
+    """
+
+    def __init__(
+        self,
+        host: str,
+        user: str | None = None,
+        password: str | None = None,
+        port: int = 1883,
+        client_id: str = "",
+        heartbeat: int = HEARTBEAT,
+        inflight: int = INFLIGHT,
+    ):
+        self._mqtt = AsyncMQTTClient(
+            client_id, host, port=port, user=user, password=password, inflight=inflight
+        )
+        self._mqtt.set_callback(self.callback)
+        self._heartbeat = heartbeat
+
+        self._devices = {}  # by uid
+        self._command_mapping = {}  # {command topic: [(device, entity)]}
+        self._schedule = []  # min-heap of [next due (monotonic ms), sequence, device, entity]
+        self._seq = 0
+        self._urgent = []  # (device, entity) to read and publish straight away
+        self._fresh = []  # entities among those whose state changed, read past their ttl
+        self._wake = asyncio.Event()
+
+        self._discovery_sent = {}  # hash of the config last published, {topic: hash}
+        self._discovery = None  # the running `_discover` task, see `discover`
+        self._rediscover = False  # set while it runs, to have it go round again
+        self._failures = 0
+        self._published = 0
+
+    @property
+    def devices(self):
+        return list(self._devices.values())
+
+    @property
+    def entities(self) -> int:
+        return len(self._schedule)
+
+    @property
+    def published(self) -> int:
+        """State messages sent so far"""
+        return self._published
+
+    @property
+    def mqtt(self):
+        """The shared connection, see utils.AsyncMQTT"""
+        return self._mqtt
+
+    def add_device(self, device: VirtualDevice):
+        if device.uid in self._devices:
+            raise ValueError(f"Device {device.uid} already exists")
+
+        device._gateway = self
+        self._devices[device.uid] = device
+
+        for entity in device.sensors:
+            self._seq += 1
+            # due immediately
+            heapq.heappush(self._schedule, [0, self._seq, device, entity])
+
+            topic = entity._command_topic_b
+            if topic is not None:
+                self._command_mapping.setdefault(topic, []).append((device, entity))
+
+    def callback(self, topic, msg):
+        """Incoming PUBLISH, from the reader task, routed through the dispatch table"""
+        if topic == STATUS_TOPIC:
+            if msg == b"online":
+                print("Broker reports that it is online")
+                # HA has (re)started and has no state, send everything again
+                self._discovery_sent.clear()
+                self.discover()
+            return
+
+        try:
+            targets = self._command_mapping[topic]
+        except KeyError:
+            print(f"topic {topic} is not assigned to a sensor, skipping.")
+            return
+
+        msg = msg.decode()
+        for device, entity in targets:
+            if entity.callback(msg) is False:
+                continue
+
+            # a burst of commands to one entity is a single read
+            if (device, entity) not in self._urgent:
+                self._urgent.append((device, entity))
+            # which only skips the cached reading if one of them changed its state
+            if device.commanded(entity, msg) and entity not in self._fresh:
+                self._fresh.append(entity)
+        self._wake.set()
+
+    def discover(self):
+        """
+        Send the changed discovery configs in the background
+
+        Only one discovery runs at a time. Asked again while one is running
+        (HA restarting twice in quick succession), that one goes round again
+        once it is done rather than a second one overlapping it.
+        """
+        if self._discovery is not None and not self._discovery.done():
+            self._rediscover = True
+            return self._discovery
+
+        self._discovery = asyncio.ensure_future(self._discover())
+        return self._discovery
+
+    def republish(self):
+        """Read and publish every entity straight away"""
+        for device in self._devices.values():
+            device._published.clear()
+        for entry in self._schedule:
+            entry[0] = 0
+        heapq.heapify(self._schedule)
+        self._wake.set()
+
+    def run_forever(self):
+        asyncio.run(self.run())
+
+    async def run(self):
+        """
+        Keep the connection up, reconnecting with jittered exponential backoff
+
+        Each connection subscribes to every command topic in one go, sends the
+        discovery configs that changed, then serves the read schedule.
+        """
+        while True:
+            try:
+                await self._session()
+            except (OSError, MQTTException) as ex:
+                self._failures += 1
+                delay = backoff_ms(self._failures) / 1000
+
+                print(f"{ex}, retrying in {delay:.1f}s (attempt {self._failures})")
+                await asyncio.sleep(delay)
+
+    async def _session(self):
+        print("Attempting to connect to MQTT Broker...")
+        await self._mqtt.connect()
+
+        reader = asyncio.ensure_future(self._mqtt.run())
+        poller = asyncio.ensure_future(self._poll())
+        try:
+            topics = [STATUS_TOPIC] + list(self._command_mapping)
+            print(f"subscribing to {len(topics)} topics")
+            await self._mqtt.subscribe(topics)
+
+            await self.discover()
+            self._failures = 0
+
+            # the reader ends (raising) when the connection drops
+            await reader
+        finally:
+            poller.cancel()
+            reader.cancel()
+            if self._discovery is not None:
+                # one started by an HA restart may still be running, or have failed
+                self._discovery.cancel()
+                await asyncio.gather(self._discovery, return_exceptions=True)
+                self._discovery = None
+            await self._mqtt.close()
+
+    async def _discover(self):
+        """
+        Publish every discovery config that changed since it was last sent
+
+        States may have gone out before HA knew their entity, so if anything
+        was sent every entity is read and published again.
+        """
+        while True:
+            self._rediscover = False
+
+            sent = 0
+            for device in self._devices.values():
+                for topic, payload in device.build_discovery():
+                    if self._discovery_sent.get(topic, None) == hash(payload):
+                        continue
+
+                    await self._mqtt.publish(topic, payload, retain=True, qos=1)
+                    self._discovery_sent[topic] = hash(payload)
+                    sent += 1
+
+            print(f"sent {sent} discovery configs for {len(self._devices)} devices")
+            if sent > 0:
+                self.republish()
+
+            if not self._rediscover:
+                return
+
+    async def _poll(self):
+        """Read whatever is due (across every device), publish it, sleep until the next"""
+        while True:
+            # cleared before looking, so a command arriving during the awaits below wakes the next wait
+            self._wake.clear()
+
+            due = self._pop_due()
+            if len(due) > 0:
+                await self._publish(await self._read(due), filtered=True)
+
+            if len(self._urgent) > 0:
+                urgent = self._urgent
+                fresh = self._fresh
+                self._urgent = []
+                self._fresh = []
+                await self._publish(await self._read(urgent, fresh), filtered=False)
+
+            timeout = 1.0
+            if len(self._schedule) > 0:
+                timeout = max(0, self._schedule[0][0] - monotonic_ms()) / 1000
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _pop_due(self) -> list:
+        """(device, entity) of every entity whose next read is due, rescheduling them"""
+        now = monotonic_ms()
+        due = []
+        while len(self._schedule) > 0 and self._schedule[0][0] <= now:
+            entry = self._schedule[0]
+            device, entity = entry[2], entry[3]
+            due.append((device, entity))
+
+            entry[0] = now + int((entity.interval or device.interval) * 1000)
+            heapq.heapreplace(self._schedule, entry)
+
+        return due
+
+    async def _read(self, targets, fresh: list = ()) -> dict:
+        """
+        Read `targets`, merging the data into {(device, state topic): payload}
+
+        Readings younger than the entity's `ttl` are reused, unless the entity is in `fresh`.
+        """
+        topics = {}
+        for device, entity in targets:
+            try:
+                data = await entity._aread(force=True, fresh=entity in fresh)
+            except Exception as ex:
+                print(f"failed to read {device.uid}/{entity.name} ({ex!r})")
+                continue
+
+            if data is None:
+                continue
+
+            key = (device, entity._state_topic_b)
+            try:
+                topics[key].update(data)
+            except KeyError:
+                topics[key] = dict(data)
+
+        return topics
+
+    async def _publish(self, topics: dict, filtered: bool):
+        if not self._mqtt.connected:
+            return
+
+        for (device, topic), payload in topics.items():
+            now = monotonic_ms()
+            if filtered and self._heartbeat and not device.topic_changed(topic, payload, self._heartbeat, now):
+                continue
+            payload = device.complete(topic, payload)
+
+            try:
+                await self._mqtt.publish(topic, json.dumps(payload))
+            except OSError:
+                # connection lost, the reader ends the session
+                return
+            device.mark_published(topic, payload, monotonic_ms())
+            self._published += 1
+
+
+if __name__ == "__main__":
+    import sys
+
+    from DiscoverableDevice.Sensor import Sensor
+
+    class Counter(Sensor):
+        __slots__ = ("_count",)
+
+        signature = {"count": {"icon": "mdi:counter"}}
+
+        def __init__(self, name, interval=None):
+            super().__init__(name, interval=interval)
+            self._count = 0
+
+        def read(self):
+            self._count += 1
+            return {"count": self._count}
+
+    host = sys.argv[1] if len(sys.argv) > 1 else "localhost"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 1883
+
+    gateway = Gateway(host=host, port=port)
+    for i in range(10):
+        device = VirtualDevice(uid=f"gateway_demo_{i}", name=f"GatewayDemo{i}", interval=2)
+        device.add_entity(Counter("counter"))
+        gateway.add_device(device)
+
+    gateway.run_forever()
@@ -1,9 +1,48 @@
 import json
-from time import ticks_ms, ticks_diff
+
+from DiscoverableDevice.utils.Aggregate import Accumulator, aggregate_fields
+from DiscoverableDevice.utils.History import History
+from DiscoverableDevice.utils.calibration import apply as apply_calibration, compile_calibration
+from DiscoverableDevice.utils.ticks import ticks_ms, ticks_diff
+
 
 class Sensor:
+    """
+    Base class for an entity which reports readings to HA
+
+    Subclasses declare `signature` (and `extra_discovery_fields`) as class
+    attributes where they don't depend on the instance, so every instance
+    shares one copy, and should declare `__slots__` for their own attributes.
+    """
+
+    __slots__ = (
+        "_name",
+        "_data",
+        "_last_read",
+        "_read_at",
+        "_ttl",
+        "_interval",
+        "_calibration",
+        "_calibrated",
+        "_filters",
+        "_oversample",
+        "_window",
+        "_window_start",
+        "_aggregates",
+        "_histories",
+        "_parent_uid",
+        "_discovery_prefix",
+        "_base_topic",
+        "_state_topic_b",
+        "_command_topic_b",
+    )
 
-    def __init__(self, name, calibration: dict | None = None):
+    # HA platform, subclasses override this with a class attribute (or property)
+    integration = "sensor"
+
+    def __init__(
+        self, name, calibration: dict | None = None, interval: int | None = None, window: int | None = None
+    ):
 
         if " " in name:
             raise ValueError("names cannot contain spaces")
@@ -11,14 +50,191 @@ class Sensor:
         self._name = name
         self._data = {}
         self._last_read = 0
+        # polling interval in seconds, None takes the parent device interval
+        self._interval = interval
+        self._read_at = 0  # ticks_ms when `_data` was last stored
+        self._ttl = None
         
         self.calibration = calibration or {}
-        self.integration = "sensor"
+
+        self._filters = None  # {field: (stage, ...)}, see `filter`
+        self._oversample = 1
+
+        self._window = window
+        self._window_start = None
+        self._aggregates = None  # ((field, Accumulator, ((name, stat), ...)), ...), from the signature on first use
+
+        self._histories = None  # {field: History}, see `keep_history`
+
+        # topics, fixed by `_bind` when the parent adds this entity
+        self._base_topic = None
+        self._state_topic_b = None
+        self._command_topic_b = None
     
     @property
     def name(self):
         return self._name
 
+    @property
+    def interval(self):
+        """Polling interval in seconds"""
+        return self._interval
+
+    @interval.setter
+    def interval(self, interval):
+        self._interval = interval
+
+    @property
+    def ttl(self):
+        """
+        Age in ms up to which the last reading is reused rather than read again, None takes the parent's
+
+        Shared by every path that reads the entity (the periodic loop,
+        command echoes and triggers), so a burst of them costs one hardware
+        read. Only a change of state (a different command, a trigger edge)
+        forces a read inside it. Keep it below `interval`, or periodic
+        readings are skipped.
+        """
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, ttl):
+        self._ttl = ttl
+
+    def _cached(self):
+        """The last reading if it is younger than `ttl`, None when the entity has to be read"""
+        if not self._ttl or len(self._data) == 0:
+            return None
+        if ticks_diff(ticks_ms(), self._read_at) >= self._ttl:
+            return None
+        return self._data
+
+    @property
+    def calibration(self) -> dict:
+        """
+        {field: calibration} applied to each reading, see utils.calibration
+
+        Assigning compiles it straight away, so a bad spec fails here rather
+        than on a reading. Changes made to the dict in place are picked up
+        when the entity is added to a device.
+        """
+        return self._calibration
+
+    @calibration.setter
+    def calibration(self, spec: dict):
+        self._calibrated = compile_calibration(spec)
+        self._calibration = spec
+
+    @property
+    def oversample(self):
+        """Times `read()` is called per reading, every sample goes through the filters"""
+        return self._oversample
+
+    @oversample.setter
+    def oversample(self, n: int):
+        if n < 1:
+            raise ValueError("oversample must be at least 1")
+        self._oversample = n
+
+    @property
+    def window(self):
+        """
+        Aggregation window in seconds, None publishes every reading
+
+        With a window, readings (taken every `interval`) are only published
+        once per window. Signature fields with an "aggregate" entry, such as
+        `"aggregate": ("min", "max")`, are published as the mean of the
+        window's readings, with the requested utils.Aggregate.STATS as extra
+        fields named `<field>_<stat>`, which are discovered as entities of
+        their own. Other fields carry the window's last reading.
+        """
+        return self._window
+
+    @window.setter
+    def window(self, window: int | None):
+        self._window = window
+        self._window_start = None
+        self._aggregates = None
+
+    def keep_history(self, field: str, samples: int | None):
+        """
+        Keep the last `samples` published values of `field` on the device, None (or 0) stops
+
+        Each sample takes 8 bytes, allocated here. The device sends a range
+        of it back on request, see `DiscoverableDevice.send_history`.
+        """
+        if self._histories is None:
+            self._histories = {}
+
+        if not samples:
+            self._histories.pop(field, None)
+        else:
+            self._histories[field] = History(samples)
+
+    def history(self, field: str):
+        """The History of `field`, None if it isn't kept"""
+        if self._histories is None:
+            return None
+        return self._histories.get(field, None)
+
+    def fields(self) -> list:
+        """Every field of this sensor's state payload, as [(field, signature data)]"""
+        output = []
+        for field, data in self._safe_signature().items():
+            output.append((field, data))
+            if self._window is not None:
+                for name, _, extra in aggregate_fields(field, data):
+                    output.append((name, extra))
+
+        return output
+
+    def _safe_signature(self) -> dict:
+        try:
+            return self.signature
+        except NotImplementedError:
+            return {}
+
+    def filter(self, field: str, *stages):
+        """
+        Pass `field` through `stages` (see utils.Filters), in order, before calibration
+
+        For example `filter("temp", RejectOutliers(), Median(5), ExponentialAverage(0.2))`.
+        With `oversample` set, every sample goes into the first stage but
+        only the reading it produces goes through the rest, once per
+        reading. So a first Median or MovingAverage as long as the
+        oversampling reduces the samples of each reading to one value,
+        and later stages behave the same whatever the oversampling.
+        Calling it again replaces the stages of `field`, none removes them.
+        """
+        if self._filters is None:
+            self._filters = {}
+
+        if len(stages) == 0:
+            self._filters.pop(field, None)
+        else:
+            self._filters[field] = stages
+
+    def _filter(self, data, oversample: bool = False):
+        """Run `data` through the filters, an `oversample` only goes into each field's first stage"""
+        if self._filters is None or data is None:
+            return data
+
+        for field, stages in self._filters.items():
+            try:
+                value = data[field]
+            except KeyError:
+                continue
+
+            if oversample:
+                stages[0].add(value)
+                continue
+
+            for stage in stages:
+                value = stage.add(value)
+            data[field] = value
+
+        return data
+
     @property
     def parent_uid(self):
         """Parent UID, set by parent on assignment"""
@@ -31,7 +247,29 @@ class Sensor:
 
     @property
     def base_topic(self):
-        return f"{self._discovery_prefix}/{self.integration}/{self.parent_uid}"
+        if self._base_topic is None:
+            return f"{self._discovery_prefix}/{self.integration}/{self.parent_uid}"
+        return self._base_topic
+
+    def _bind(self, parent):
+        """
+        Attach to `parent`, computing this entity's topics once
+
+        The (possibly overridden) topic properties are evaluated here and kept
+        as bytes, which is what the device hands to the mqtt client.
+        """
+        self._calibrated = compile_calibration(self._calibration)
+        self._aggregates = None
+
+        self._discovery_prefix = parent.discovery_prefix
+        self._parent_uid = parent.uid
+
+        self._base_topic = None
+        self._base_topic = self.base_topic
+
+        self._state_topic_b = parent.intern(self.state_topic)
+        if hasattr(self, "command_topic"):
+            self._command_topic_b = parent.intern(self.command_topic)
 
     @property
     def state_topic(self):
@@ -46,17 +284,29 @@ class Sensor:
         return f"{self.base_topic}/{name}/config"
     
     def discover(self, mqtt, device_payload):
+        for discovery_topic, payload in self.discovery_payloads(device_payload):
+            print(f"discovering on topic {discovery_topic}")
+            mqtt.publish(discovery_topic, json.dumps(payload), retain=True)
+
+    def discovery_payloads(self, device_payload) -> list:
+        """
+        Build the discovery payloads for this sensor, as [(topic, payload dict)]
+        """
+        output = []
+
+        signature = self.signature
+        single = len(signature) == 1
+        extra = getattr(self, "extra_discovery_fields", None)
+
         # need a separate discovery for each value a sensor can return
-        for subsensor in self.signature:
-            print(f"discovering for subsensor {subsensor}")
-            signature_data = self.signature[subsensor]
+        for subsensor, signature_data in signature.items():
                         
             payload = {"unique_id": f"{self.parent_uid}_{self.name}_{subsensor}",
                        "force_update": True,
                        "device": device_payload,
                        "state_topic": self.state_topic}
 
-            if len(self.signature) == 1:
+            if single:
                 payload["name"] = subsensor
             else:
                 payload["name"] = f"{self.name}_{subsensor}"
@@ -72,10 +322,8 @@ class Sensor:
             if hasattr(self, "value_template"):
                 try:
                     vt = self.value_template
-                    print("value template set by direct property")
                 except TypeError:
                     vt = self.value_template(subsensor)
-                    print("value template set by function call")
 
             else:
                 vt = "{{ " + f"value_json.{subsensor}" 
@@ -85,56 +333,199 @@ class Sensor:
                     vt += f" | {value_mod}"
                 
                 vt += " }}"
-                print("value template set by signature extraction")
 
             try:
                 if vt is not None:
                     payload["value_template"] = vt
-                    print(f"value template set to {vt}")
             except NameError:
                 raise RuntimeError(f"No Value Template found for {subsensor}")
 
             if hasattr(self, "command_topic"):
                 payload["command_topic"] = self.command_topic
 
-            if hasattr(self, "extra_discovery_fields"):
-                for topic, value in self.extra_discovery_fields.items():
-
-                    print(f"adding extra data at {topic}: {value}")
-
-                    payload[topic] = value
+            if extra is not None:
+                payload.update(extra)
 
-            if len(self.signature) == 1:
+            if single:
                 discovery_topic = self.discovery_topic()
             else:
                 discovery_topic = self.discovery_topic(subsensor)
-            
-            print(f"discovering on topic {discovery_topic}")
-            print(f"sending payload: {json.dumps(payload)}")
-            mqtt.publish(discovery_topic, json.dumps(payload), retain=True)
+
+            output.append((discovery_topic, payload))
+
+            if self._window is not None:
+                self._aggregate_payloads(output, subsensor, signature_data, payload)
+
+        return output
     
+    def _aggregate_payloads(self, output, subsensor, signature_data, payload):
+        """Add a discovery payload to `output` for each aggregate of `subsensor`, based on its `payload`"""
+        for field, stat, extra in aggregate_fields(subsensor, signature_data):
+            aggregate = dict(payload)
+            aggregate["unique_id"] = f"{payload['unique_id']}_{stat}"
+            aggregate["name"] = f"{payload['name']}_{stat}"
+
+            vt = "{{ " + f"value_json.{field}"
+            if "value_mod" in extra:
+                vt += f" | {extra['value_mod']}"
+            aggregate["value_template"] = vt + " }}"
+
+            if stat == "count":
+                aggregate.pop("unit_of_measurement", None)
+                aggregate["icon"] = extra["icon"]
+
+            output.append((self.discovery_topic(field), aggregate))
+
     @property
     def signature(self) -> dict:
         raise NotImplementedError
         
     def read(self) -> dict:
         raise NotImplementedError
+
+    def start(self):
+        """
+        Optional first half of a split-phase read
+
+        Trigger a conversion and return the ticks_ms deadline after which
+        `collect` can fetch the result. Returning None (the default) means
+        the sensor is read in one go with `read()`.
+        """
+        return None
+
+    def collect(self) -> dict:
+        """Second half of a split-phase read, return the data converted since `start`"""
+        return self.read()
     
-    def _read(self, interval: int = 5, force: bool = False):
-        if not force and not ticks_diff(ticks_ms(), self._last_read) > interval * 1000:
+    def _due(self, interval: int | None, force: bool) -> bool:
+        if force:
+            return True
+        if interval is None:
+            interval = self.interval or 5
+        return ticks_diff(ticks_ms(), self._last_read) > interval * 1000
+
+    def _store(self, data):
+        if data is None:
             return
 
-        self._last_read = ticks_ms()
+        self._filter(data)
+        apply_calibration(self._calibrated, data)
 
-        data = self.read()
+        if self._window is not None:
+            data = self._aggregate(data)
+            if data is None:
+                return
 
-        for key, val in self.calibration.items():
-            data[key] += val
+        if self._histories:
+            now = ticks_ms()
+            for field, history in self._histories.items():
+                try:
+                    history.add(now, data[field])
+                except (KeyError, TypeError):
+                    continue
 
         self._data = data
+        self._read_at = ticks_ms()
 
         return self.data
 
+    def _aggregate(self, data):
+        """
+        Add a reading to the window, returning the aggregated data at the window's end, None before it
+
+        The first reading is published straight away, so HA has a state from boot.
+        """
+        if self._aggregates is None:
+            aggregates = []
+            for field, signature_data in self._safe_signature().items():
+                stats = aggregate_fields(field, signature_data)
+                if len(stats) > 0:
+                    aggregates.append((field, Accumulator(), tuple((name, stat) for name, stat, _ in stats)))
+            self._aggregates = tuple(aggregates)
+
+        for field, accumulator, _ in self._aggregates:
+            try:
+                accumulator.add(data[field])
+            except (KeyError, TypeError):
+                continue
+
+        now = ticks_ms()
+        if self._window_start is not None and ticks_diff(now, self._window_start) < self._window * 1000:
+            return None
+        self._window_start = now
+
+        for field, accumulator, stats in self._aggregates:
+            if accumulator.count == 0:
+                continue
+
+            data[field] = accumulator.mean
+            for name, stat in stats:
+                data[name] = accumulator.stat(stat)
+            accumulator.reset()
+
+        return data
+
+    def _read(self, interval: int | None = None, force: bool = False, fresh: bool = False):
+        """
+        Read the entity if it is due (or `force`), returning the data to publish
+
+        A reading younger than `ttl` is returned again without reading the
+        hardware, unless `fresh` (e.g. an actuator whose state just changed).
+        """
+        if not self._due(interval, force):
+            return
+
+        if not fresh:
+            cached = self._cached()
+            if cached is not None:
+                return cached
+
+        self._last_read = ticks_ms()
+
+        for _ in range(self._oversample - 1):
+            self._filter(self.read(), oversample=True)
+
+        return self._store(self.read())
+
+    def _start(self):
+        deadline = self.start()
+        if deadline is not None:
+            self._last_read = ticks_ms()
+
+        return deadline
+
+    def _collect(self):
+        return self._store(self.collect())
+
+    async def _aread(self, interval: int | None = None, force: bool = False, fresh: bool = False):
+        """
+        Async counterpart of `_read`.
+
+        Sensors which have to wait on hardware can implement `async def aread()`,
+        which is awaited here so that other tasks can run in the meantime.
+        Otherwise this falls back to the blocking `read()`.
+        """
+        if not self._due(interval, force):
+            return
+
+        if not fresh:
+            cached = self._cached()
+            if cached is not None:
+                return cached
+
+        self._last_read = ticks_ms()
+
+        for i in range(self._oversample):
+            if hasattr(self, "aread"):
+                data = await self.aread()
+            else:
+                data = self.read()
+
+            if i < self._oversample - 1:
+                self._filter(data, oversample=True)
+
+        return self._store(data)
+
     @property
     def data(self):
         return self._data
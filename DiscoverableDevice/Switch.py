@@ -2,6 +2,10 @@ from .Sensor import Sensor
 
 
 class Switch(Sensor):
+
+    __slots__ = ("_state",)
+
+    integration = "switch"
     
     def __init__(self, name):
         
@@ -12,8 +16,6 @@ class Switch(Sensor):
             self._state = False
         
         super().__init__(name)
-        
-        self.integration = "switch"
     
     @property
     def command_topic(self):
@@ -27,5 +29,9 @@ class Switch(Sensor):
         raise NotImplementedError
     
     def callback(self, msg):
-        """Implement function call to handle incoming `msg`"""
+        """
+        Implement function call to handle incoming `msg`
+
+        Return False if `msg` was ignored, so the device skips the state echo
+        """
         raise NotImplementedError
@@ -9,20 +9,39 @@ from time import ticks_ms, ticks_diff
 
 
 class Trigger(Sensor):
-    def __init__(self, name, pin):
-        super().__init__(name)
 
-        self.integration = "binary_sensor"
+    __slots__ = (
+        "_irq_callback",
+        "_events",
+        "_debounce_time",
+        "_debounce",
+        "_bounced",
+        "_queued",
+        "_gpio_pin",
+        "_pin",
+    )
+
+    integration = "binary_sensor"
+
+    # shared by the signature of every trigger
+    _SUBSENSOR = {"icon": "mdi:toggle-switch", "unit": None}
+
+    def __init__(self, name, pin, debounce: int = 500):
+        super().__init__(name)
 
         self._irq_callback = None
+        self._events = None  # EventQueue, set by the parent
         self._debounce_time = 0
-        self._debounce = 500
+        self._debounce = debounce
+        self._bounced = 0  # edges ignored by the debounce
 
         self._queued = False  # set this to true on irq, then false again after a read
 
         self._gpio_pin = pin
         self._pin = Pin(pin, Pin.IN, Pin.PULL_UP)
-        self._pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=self.irq_falling)
+        self._pin.irq(
+            trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=self.irq_falling, hard=True
+        )
 
     @property
     def pin(self):
@@ -32,26 +51,45 @@ class Trigger(Sensor):
     def gpio_pin(self) -> int:
         return self._gpio_pin
     
+    @property
+    def bounced(self) -> int:
+        """Number of edges dropped by the debounce"""
+        return self._bounced
+
     def irq_falling(self, pin):
+        """
+        Hard IRQ handler, must not allocate
+
+        Records the edge into the parent's event queue and leaves the reading
+        and publishing to the main loop.
+        """
         now = ticks_ms()
 
         if ticks_diff(now, self._debounce_time) < self._debounce:
+            self._bounced += 1
             return
 
         self._debounce_time = now
         self._queued = True
-        self._irq_callback(pin)
+
+        if self._events is not None:
+            self._events.put(self._gpio_pin, pin.value(), now)
+        if self._irq_callback is not None:
+            self._irq_callback(pin)
     
     def set_callback(self, fn):
         self._irq_callback = fn
 
+    def set_queue(self, queue):
+        self._events = queue
+
     @property
     def state_topic(self):
         return f"{self._discovery_prefix}/{self.integration}/{self.parent_uid}/{self.name}/state"
 
     @property
     def signature(self):
-        return {self.name: {"icon": "mdi:toggle-switch", "unit": None}}
+        return {self.name: Trigger._SUBSENSOR}
 
     @property
     def value_template(self):
@@ -0,0 +1,116 @@
+from array import array
+
+# statistics a signature field can ask for with "aggregate", the field itself carries the mean
+STATS = ("min", "max", "std", "count")
+
+
+class Accumulator:
+    """
+    Running count, mean, variance, min and max of the samples in a window
+
+    Welford's update keeps the mean and the sum of squared deviations, so the
+    memory is constant however many samples are added and the variance does
+    not suffer the cancellation of sum(x**2) - sum(x)**2. The floats live in
+    an array, so adding a sample does not allocate.
+    """
+
+    def __init__(self):
+        self._values = array("f", [0.0] * 4)  # mean, M2, min, max
+        self._count = 0
+
+    def add(self, value):
+        values = self._values
+        self._count += 1
+
+        if self._count == 1:
+            values[0] = value
+            values[1] = 0.0
+            values[2] = value
+            values[3] = value
+            return
+
+        delta = value - values[0]
+        values[0] += delta / self._count
+        values[1] += delta * (value - values[0])
+
+        if value < values[2]:
+            values[2] = value
+        if value > values[3]:
+            values[3] = value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        return self._values[0]
+
+    @property
+    def min(self) -> float:
+        return self._values[2]
+
+    @property
+    def max(self) -> float:
+        return self._values[3]
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation, 0 for fewer than two samples"""
+        if self._count < 2:
+            return 0.0
+        return (self._values[1] / (self._count - 1)) ** 0.5
+
+    def stat(self, name: str):
+        """One of STATS by name"""
+        if name == "count":
+            return self._count
+        if name == "min":
+            return self._values[2]
+        if name == "max":
+            return self._values[3]
+        return self.std
+
+    def reset(self):
+        self._count = 0
+
+
+def aggregate_fields(field: str, data: dict) -> list:
+    """
+    The extra fields published for signature `field`, as [(name, stat, signature data)]
+
+    Args:
+        field:
+            signature field name
+        data:
+            its signature data, whose "aggregate" lists the STATS wanted
+    """
+    output = []
+    for stat in data.get("aggregate", ()):
+        if stat not in STATS:
+            raise ValueError(f"unknown aggregate {stat} for {field}, expected one of {STATS}")
+
+        if stat == "count":
+            extra = {"icon": "mdi:counter"}
+        else:
+            # same units and rounding as the field itself
+            extra = {key: data[key] for key in ("icon", "unit", "value_mod") if key in data}
+
+        output.append((f"{field}_{stat}", stat, extra))
+
+    return output
+
+
+if __name__ == "__main__":
+    samples = [412, 415, 409, 430, 418, 411, 407, 414]
+
+    accumulator = Accumulator()
+    for sample in samples:
+        accumulator.add(sample)
+
+    mean = sum(samples) / len(samples)
+    std = (sum((s - mean) ** 2 for s in samples) / (len(samples) - 1)) ** 0.5
+
+    print(f"count {accumulator.count}, mean {accumulator.mean:.3f} ({mean:.3f}), "
+          f"std {accumulator.std:.3f} ({std:.3f}), min {accumulator.min}, max {accumulator.max}")
+    print(aggregate_fields("CO2", {"unit": "ppm", "value_mod": "round(0)", "aggregate": ("max", "count")}))
@@ -0,0 +1,316 @@
+"""
+MQTT 3.1.1 client on asyncio streams, for CPython hosts (see Gateway)
+
+The packets are the ones umqtt.simple writes, the difference is that
+nothing blocks: a reader task takes in PUBLISH, PUBACK and SUBACK as they
+arrive, QoS 1 messages wait in an in-flight window (utils.InFlight) rather
+than for their ack, and many topics go in one SUBSCRIBE.
+"""
+
+import asyncio
+import struct
+import time
+
+from DiscoverableDevice.utils.InFlight import InFlight
+
+INFLIGHT = 32  # QoS 1 messages which may await their PUBACK at once
+ACK_TIMEOUT = 5000  # (ms) before an unacknowledged QoS 1 message is sent again
+SUBSCRIBE_BATCH = 64  # topic filters per SUBSCRIBE packet
+CONNECT_TIMEOUT = 10  # (s) to wait for the CONNACK
+
+
+class MQTTException(Exception):
+    pass
+
+
+def monotonic_ms() -> int:
+    return time.monotonic_ns() // 1000000
+
+
+def _length(n: int) -> bytes:
+    """MQTT remaining length, 7 bits per byte"""
+    output = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            output.append(byte | 0x80)
+        else:
+            output.append(byte)
+            return bytes(output)
+
+
+def _string(s) -> bytes:
+    if isinstance(s, str):
+        s = s.encode()
+    return struct.pack("!H", len(s)) + s
+
+
+def _bytes(s) -> bytes:
+    if isinstance(s, str):
+        return s.encode()
+    return bytes(s)
+
+
+class AsyncMQTTClient:
+    """
+    Args:
+        client_id:
+            MQTT client id, "" lets the broker pick one
+        server:
+            broker hostname or ip
+        port:
+            broker port
+        user:
+            mqtt username
+        password:
+            mqtt password
+        keepalive:
+            seconds, a PINGREQ goes out after half of this without sending
+        inflight:
+            QoS 1 messages which may await their PUBACK at once
+
+    `cb(topic, msg)` is called with bytes for every PUBLISH received, from
+    the reader task, so it should not block.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        server: str,
+        port: int = 1883,
+        user: str | None = None,
+        password: str | None = None,
+        keepalive: int = 60,
+        inflight: int = INFLIGHT,
+    ):
+        self.client_id = client_id
+        self.server = server
+        self.port = port
+        self.user = user
+        self.pswd = password
+        self.keepalive = keepalive
+
+        self.cb = None
+        self.lw_topic = None
+        self.lw_msg = None
+        self.lw_retain = False
+
+        self.pid = 0
+        self._inflight = InFlight(inflight)
+        self._window = asyncio.Event()  # set whenever the window has room
+        self._subacks = {}  # {pid: future}
+
+        self._reader = None
+        self._writer = None
+        self._last_tx = 0
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    @property
+    def inflight(self):
+        """QoS 1 messages awaiting their PUBACK, see utils.InFlight"""
+        return self._inflight
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def set_last_will(self, topic, msg, retain=False):
+        self.lw_topic = topic
+        self.lw_msg = msg
+        self.lw_retain = retain
+
+    def _write(self, data: bytes):
+        if self._writer is None:
+            raise OSError("not connected")
+        self._writer.write(data)
+        self._last_tx = monotonic_ms()
+        self.bytes_out += len(data)
+
+    def _next_pid(self) -> int:
+        self.pid = self.pid % 0xFFFF + 1
+        while self._inflight.holds(self.pid) or self.pid in self._subacks:
+            self.pid = self.pid % 0xFFFF + 1
+        return self.pid
+
+    async def connect(self, clean_session: bool = True):
+        self._reader, self._writer = await asyncio.open_connection(self.server, self.port)
+
+        flags = clean_session << 1
+        payload = _string(self.client_id)
+        if self.lw_topic:
+            flags |= 0x4 | self.lw_retain << 5
+            payload += _string(self.lw_topic) + _string(self.lw_msg)
+        if self.user:
+            flags |= 0xC0
+            payload += _string(self.user) + _string(self.pswd)
+
+        body = b"\x00\x04MQTT\x04" + bytes([flags]) + struct.pack("!H", self.keepalive) + payload
+        self._write(b"\x10" + _length(len(body)) + body)
+
+        try:
+            resp = await asyncio.wait_for(self._reader.readexactly(4), CONNECT_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError) as ex:
+            await self.close()
+            raise OSError(f"no CONNACK ({ex!r})")
+        self.bytes_in += len(resp)
+
+        if resp[0] != 0x20 or resp[1] != 0x02:
+            await self.close()
+            raise MQTTException("unexpected reply to CONNECT")
+        if resp[3] != 0:
+            await self.close()
+            raise MQTTException(resp[3])
+
+        # anything still in flight from the last connection goes again, with DUP
+        self._inflight.expire(monotonic_ms(), ACK_TIMEOUT)
+        self._window.set()
+
+        return resp[2] & 1
+
+    async def close(self):
+        writer = self._writer
+        self._writer = None
+        self._reader = None
+        self._window.set()  # wake publishers waiting on the window, they see the close
+
+        for future in self._subacks.values():
+            if not future.done():
+                future.set_exception(OSError("connection closed"))
+        self._subacks = {}
+
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def disconnect(self):
+        if self._writer is not None:
+            self._write(b"\xe0\x00")
+        await self.close()
+
+    async def publish(self, topic, msg, retain: bool = False, qos: int = 0):
+        """
+        Send a message, returning once it is written (not acknowledged)
+
+        QoS 1 only waits when the in-flight window is full.
+        """
+        topic = _bytes(topic)
+        msg = _bytes(msg)
+
+        if qos == 0:
+            self._write(bytes([0x30 | retain]) + _length(2 + len(topic) + len(msg)) + _string(topic) + msg)
+        else:
+            while self._inflight.full:
+                if self._writer is None:
+                    raise OSError("not connected")
+                self._window.clear()
+                await self._window.wait()
+
+            pid = self._next_pid()
+            self._send_publish(topic, msg, retain, pid)
+            self._inflight.add(pid, topic, msg, retain, self._last_tx)
+
+        await self._writer.drain()
+
+    def _send_publish(self, topic, msg, retain, pid, dup=False):
+        header = 0x32 | dup << 3 | retain
+        self._write(
+            bytes([header]) + _length(4 + len(topic) + len(msg))
+            + _string(topic) + struct.pack("!H", pid) + msg
+        )
+
+    async def subscribe(self, topics: list, qos: int = 0):
+        """Subscribe to every topic in `topics`, SUBSCRIBE_BATCH per packet, waiting for the SUBACKs"""
+        futures = []
+        loop = asyncio.get_running_loop()
+
+        for i in range(0, len(topics), SUBSCRIBE_BATCH):
+            pid = self._next_pid()
+            body = struct.pack("!H", pid)
+            for topic in topics[i:i + SUBSCRIBE_BATCH]:
+                body += _string(topic) + bytes([qos])
+
+            future = loop.create_future()
+            self._subacks[pid] = future
+            futures.append(future)
+            self._write(b"\x82" + _length(len(body)) + body)
+
+        await self._writer.drain()
+        for result in await asyncio.gather(*futures):
+            if 0x80 in result:
+                raise MQTTException("subscription refused")
+
+    async def run(self):
+        """
+        Serve the connection until it drops: read packets, ping, resend overdue QoS 1
+
+        Raises OSError when the connection is lost.
+        """
+        housekeeping = asyncio.ensure_future(self._housekeeping())
+        try:
+            while True:
+                header = await self._reader.readexactly(1)
+                length = 0
+                shift = 0
+                while True:
+                    byte = (await self._reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await self._reader.readexactly(length) if length else b""
+                self.bytes_in += 1 + shift // 7 + length
+
+                self._handle(header[0], body)
+        except (asyncio.IncompleteReadError, ConnectionError) as ex:
+            raise OSError(f"connection lost ({ex!r})")
+        finally:
+            housekeeping.cancel()
+            await self.close()
+
+    def _handle(self, header: int, body: bytes):
+        kind = header & 0xF0
+
+        if kind == 0x30:
+            n = struct.unpack_from("!H", body, 0)[0]
+            topic = body[2:2 + n]
+            pos = 2 + n
+            if header & 6:
+                pid = body[pos:pos + 2]
+                pos += 2
+                self._write(b"\x40\x02" + pid)
+            if self.cb is not None:
+                self.cb(topic, body[pos:])
+
+        elif kind == 0x40:
+            if self._inflight.ack(struct.unpack("!H", body)[0]):
+                self._window.set()
+
+        elif kind == 0x90:
+            pid = struct.unpack_from("!H", body, 0)[0]
+            future = self._subacks.pop(pid, None)
+            if future is not None and not future.done():
+                future.set_result(body[2:])
+
+    async def _housekeeping(self):
+        while self._writer is not None:
+            await asyncio.sleep(1)
+            if self._writer is None:
+                return
+            now = monotonic_ms()
+
+            for i in self._inflight.expired(now, ACK_TIMEOUT):
+                pid, topic, msg, retain = self._inflight.entry(i)
+                self._send_publish(topic, msg, retain, pid, dup=True)
+                self._inflight.resent(i, now)
+
+            if self.keepalive and now - self._last_tx > self.keepalive * 500:
+                self._write(b"\xc0\x00")
@@ -0,0 +1,144 @@
+"""
+Entity bookkeeping, without any networking
+
+Shared by DiscoverableDevice and the CPython Gateway's VirtualDevice, so the
+two keep registering entities and deciding what to publish the same way.
+"""
+
+from DiscoverableDevice.utils.deadband import crossed
+
+HEARTBEAT = 300  # maximum time a state topic may go without being published
+READ_TTL = 500  # (ms) a reading this recent is reused rather than read again, see Sensor.ttl
+
+
+class Entities:
+    """
+    Mixin holding a device's entities and what was last published on each state topic
+
+    The device calls `_init_entities` from its own __init__, and provides
+    the `interval`, `uid` and `discovery_prefix` its entities bind to.
+    Times are passed in as `now` (monotonic ms), as the board and the
+    Gateway keep different clocks.
+    """
+
+    def _init_entities(self, read_ttl: int = READ_TTL):
+        self._read_ttl = read_ttl
+
+        self._sensors = {}  # sensors by NAME
+        self._topic_entities = {}  # entities by state topic, {topic: [entity]}
+        self._topics = {}  # every topic in use, so equal topics share one bytes object
+        self._deadbands = {}  # {field: (absolute, relative)}
+        # last published values, {topic: [monotonic ms, {field: value}]}
+        self._published = {}
+        self._commands = {}  # last command each entity handled, {name: msg}
+
+    def intern(self, topic) -> bytes:
+        """
+        Return `topic` as bytes, reusing the existing object for a topic already in use
+        """
+        if isinstance(topic, str):
+            topic = topic.encode()
+
+        try:
+            return self._topics[topic]
+        except KeyError:
+            self._topics[topic] = topic
+            return topic
+
+    def _register(self, entity):
+        """
+        Bind `entity` and index it by name and state topic
+
+        Entities without their own interval or ttl get the device's.
+        """
+        name = entity.name
+        if name in self._sensors:
+            raise ValueError(
+                f"Sensor {name} already exists! Delete it or choose a different name."
+            )
+
+        entity._bind(self)
+
+        if entity.interval is None:
+            entity.interval = self.interval
+        if entity.ttl is None:
+            entity.ttl = self._read_ttl
+
+        try:
+            signature = entity.signature
+        except NotImplementedError:
+            signature = {}
+
+        for field, data in signature.items():
+            absolute = data.get("deadband", 0)
+            relative = data.get("deadband_rel", 0)
+            if absolute or relative:
+                self._deadbands[field] = (absolute, relative)
+
+        self._sensors[name] = entity
+        self._topic_entities.setdefault(entity._state_topic_b, []).append(entity)
+
+    def commanded(self, entity, msg) -> bool:
+        """
+        Note that `entity` handled command `msg`, returning True if that changed its state
+
+        HA commands set a state ("ON", a brightness), so repeating the last
+        one changes nothing and the entity's cached reading still holds.
+        """
+        if self._commands.get(entity.name, None) == msg:
+            return False
+
+        self._commands[entity.name] = msg
+        return True
+
+    def topic_changed(self, topic, payload: dict, heartbeat: int, now: int) -> bool:
+        """
+        Is `payload` worth publishing on `topic`?
+
+        It is if any field has crossed its deadband since the topic was last
+        published, or if the topic has been silent for `heartbeat` s or more.
+        """
+        try:
+            last_time, last = self._published[topic]
+        except KeyError:
+            return True
+
+        if now - last_time >= heartbeat * 1000:
+            return True
+
+        for field, val in payload.items():
+            if field not in last:
+                return True
+            if crossed(last[field], val, *self._deadbands.get(field, (0, 0))):
+                return True
+
+        return False
+
+    def complete(self, topic, payload: dict) -> dict:
+        """
+        `payload` with the last reading of every other entity on state `topic` added
+
+        HA evaluates the value_template of every entity on a state topic for
+        each message on it, so a message missing an entity's field fails
+        its template. Entities read on their own interval would otherwise
+        publish only their own fields on the shared topic.
+        """
+        entities = self._topic_entities.get(topic, None)
+        if entities is None or len(entities) < 2:
+            return payload
+
+        output = {}
+        for entity in entities:
+            output.update(entity.data)
+        output.update(payload)
+
+        return output
+
+    def mark_published(self, topic, payload: dict, now: int):
+        """Remember `payload` as the last one published on `topic`, for `topic_changed`"""
+        try:
+            entry = self._published[topic]
+            entry[0] = now
+            entry[1].update(payload)
+        except KeyError:
+            self._published[topic] = [now, dict(payload)]
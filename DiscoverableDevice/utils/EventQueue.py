@@ -0,0 +1,76 @@
+from array import array
+
+
+class EventQueue:
+    """
+    Preallocated single producer, single consumer ring buffer of pin events
+
+    `put` is safe to call from a hard IRQ: it does not allocate and only
+    moves the head, while `get` (main loop) only moves the tail.
+
+    Args:
+        size:
+            number of slots, holds at most size - 1 events
+    """
+
+    def __init__(self, size: int = 16):
+        self._size = size
+
+        self._pins = array("B", [0] * size)
+        self._edges = array("B", [0] * size)
+        self._ticks = array("L", [0] * size)
+
+        self._head = 0  # next slot to write, producer only
+        self._tail = 0  # next slot to read, consumer only
+
+        self._dropped = 0  # events lost because the buffer was full
+
+    def __len__(self):
+        return (self._head - self._tail) % self._size
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def put(self, pin: int, edge: int, ticks: int) -> bool:
+        head = self._head
+        nxt = (head + 1) % self._size
+
+        if nxt == self._tail:
+            self._dropped += 1
+            return False
+
+        self._pins[head] = pin
+        self._edges[head] = edge
+        self._ticks[head] = ticks
+        # publish the slot only once it is fully written
+        self._head = nxt
+
+        return True
+
+    def get(self):
+        """Oldest event as (pin, edge, ticks), or None if empty"""
+        tail = self._tail
+        if tail == self._head:
+            return None
+
+        output = (self._pins[tail], self._edges[tail], self._ticks[tail])
+        self._tail = (tail + 1) % self._size
+
+        return output
+
+
+if __name__ == "__main__":
+    q = EventQueue(4)
+    for i in range(5):
+        q.put(7, i % 2, i)
+
+    print(len(q), q.dropped)
+    event = q.get()
+    while event is not None:
+        print(event)
+        event = q.get()
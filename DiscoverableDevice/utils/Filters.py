@@ -0,0 +1,196 @@
+from array import array
+
+
+class MovingAverage:
+    """
+    Mean of the last `n` values
+
+    Args:
+        n:
+            window length
+    """
+
+    def __init__(self, n: int = 8):
+        self._values = array("f", [0.0] * n)
+        self._i = 0
+        self._count = 0
+        self._sum = 0.0
+
+    def add(self, value) -> float:
+        i = self._i
+        if self._count == len(self._values):
+            self._sum -= self._values[i]
+        else:
+            self._count += 1
+
+        self._values[i] = value
+        self._sum += self._values[i]  # as stored, single precision
+        self._i = (i + 1) % len(self._values)
+
+        if self._i == 0:
+            # resum once per lap, so rounding errors in the running sum can't build up
+            self._sum = sum(self._values)
+
+        return self._sum / self._count
+
+    def reset(self):
+        self._i = 0
+        self._count = 0
+        self._sum = 0.0
+
+
+class Median:
+    """
+    Median of the last `n` values, robust against single spikes
+
+    Sorting is an insertion sort into a preallocated scratch array, so the
+    cost is bounded by n**2 and nothing is allocated.
+
+    Args:
+        n:
+            window length, odd lengths have a true middle value
+    """
+
+    def __init__(self, n: int = 5):
+        self._values = array("f", [0.0] * n)
+        self._scratch = array("f", [0.0] * n)
+        self._i = 0
+        self._count = 0
+
+    def add(self, value) -> float:
+        self._values[self._i] = value
+        self._i = (self._i + 1) % len(self._values)
+        if self._count < len(self._values):
+            self._count += 1
+
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return _median(self._values, self._scratch, self._count)
+
+    def reset(self):
+        self._i = 0
+        self._count = 0
+
+
+class ExponentialAverage:
+    """
+    Exponentially weighted moving average of the values
+
+    Args:
+        alpha:
+            weight of each new value, between 0 (never moves) and 1 (no smoothing)
+    """
+
+    def __init__(self, alpha: float = 0.25):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+
+        self._alpha = alpha
+        self._value = None
+
+    def add(self, value) -> float:
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self._alpha * (value - self._value)
+
+        return self._value
+
+    def reset(self):
+        self._value = None
+
+
+class RejectOutliers:
+    """
+    Hampel filter: values too far from the median of the recent ones are replaced by that median
+
+    "Too far" is `k` scaled median absolute deviations, or `minimum`
+    whichever is larger (a steady signal has a deviation of zero). Rejected
+    values still enter the window, so a genuine step is followed once it
+    makes up half the window.
+
+    Args:
+        n:
+            window length
+        k:
+            threshold, in (scaled) median absolute deviations
+        minimum:
+            smallest absolute threshold
+    """
+
+    MAD_SCALE = 1.4826  # makes the MAD an estimate of the standard deviation for normal noise
+
+    def __init__(self, n: int = 7, k: float = 3.0, minimum: float = 0.0):
+        self._values = array("f", [0.0] * n)
+        self._scratch = array("f", [0.0] * n)
+        self._deviations = array("f", [0.0] * n)
+        self._i = 0
+        self._count = 0
+
+        self._k = k * self.MAD_SCALE
+        self._minimum = minimum
+        self._rejected = 0
+
+    @property
+    def rejected(self) -> int:
+        """Values replaced so far"""
+        return self._rejected
+
+    def add(self, value) -> float:
+        output = value
+
+        if self._count >= 3:
+            median = _median(self._values, self._scratch, self._count)
+            for i in range(self._count):
+                self._deviations[i] = abs(self._values[i] - median)
+            mad = _median(self._deviations, self._scratch, self._count)
+
+            if abs(value - median) > max(self._k * mad, self._minimum):
+                self._rejected += 1
+                output = median
+
+        self._values[self._i] = value
+        self._i = (self._i + 1) % len(self._values)
+        if self._count < len(self._values):
+            self._count += 1
+
+        return output
+
+    def reset(self):
+        self._i = 0
+        self._count = 0
+
+
+def _median(values, scratch, count: int) -> float:
+    """Median of the first `count` of `values`, sorted in `scratch`"""
+    if count == 0:
+        return 0.0
+
+    for i in range(count):
+        value = values[i]
+        j = i - 1
+        while j >= 0 and scratch[j] > value:
+            scratch[j + 1] = scratch[j]
+            j -= 1
+        scratch[j + 1] = value
+
+    middle = count // 2
+    if count % 2:
+        return scratch[middle]
+    return (scratch[middle - 1] + scratch[middle]) / 2
+
+
+if __name__ == "__main__":
+    samples = [20.0, 20.2, 19.9, 35.0, 20.1, 20.0, 19.8, 20.3]
+
+    average = MovingAverage(4)
+    median = Median(5)
+    smooth = ExponentialAverage(0.25)
+    hampel = RejectOutliers(5, minimum=0.5)
+
+    for sample in samples:
+        print(f"{sample:5.1f} -> mean {average.add(sample):5.2f}  median {median.add(sample):5.2f}"
+              f"  ewma {smooth.add(sample):5.2f}  hampel {hampel.add(sample):5.2f}")
+    print(f"rejected {hampel.rejected}")  # the 35.0 spike
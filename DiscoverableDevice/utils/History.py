@@ -0,0 +1,130 @@
+from array import array
+import struct
+
+from DiscoverableDevice.utils.ticks import ticks_diff
+
+CHUNK = 64  # samples per message, 8 bytes each after the header
+
+# packed reply: a header, then (age in ms, value) pairs, little endian
+HEADER = "<HHH"  # chunk index, chunk count, samples in this chunk
+PAIR = "<If"
+HEADER_SIZE = struct.calcsize(HEADER)
+PAIR_SIZE = struct.calcsize(PAIR)
+
+
+class History:
+    """
+    Ring buffer of the last `size` (ticks_ms, value) samples of one field
+
+    Storage is a pair of arrays allocated up front, 8 bytes per sample, so
+    the memory budget is fixed and adding a sample does not allocate.
+    Ticks (30 bits, on CPython too, see utils.ticks) are kept as they come,
+    ages are worked out with ticks_diff when the history is read, which is
+    good for about 6 days.
+
+    Args:
+        size:
+            samples kept, the oldest is dropped for each new one once full
+    """
+
+    def __init__(self, size: int):
+        self._ticks = array("I", [0] * size)
+        self._values = array("f", [0.0] * size)
+        self._i = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size(self) -> int:
+        return len(self._values)
+
+    def add(self, ticks: int, value):
+        self._ticks[self._i] = ticks
+        self._values[self._i] = value
+        self._i = (self._i + 1) % len(self._values)
+        if self._count < len(self._values):
+            self._count += 1
+
+    def clear(self):
+        self._i = 0
+        self._count = 0
+
+    def _oldest(self) -> int:
+        return (self._i - self._count) % len(self._values)
+
+    def select(self, now: int, since: int, until: int = 0) -> tuple:
+        """
+        Find the samples between `since` and `until` ms before `now`, as (first index, count)
+
+        Samples are in time order, so the ones in range are contiguous.
+        """
+        size = len(self._values)
+        first = None
+        count = 0
+
+        j = self._oldest()
+        for _ in range(self._count):
+            age = ticks_diff(now, self._ticks[j])
+            if until <= age <= since:
+                if first is None:
+                    first = j
+                count += 1
+            elif first is not None:
+                break
+            j = (j + 1) % size
+
+        return first or 0, count
+
+    def pack(self, now: int, since: int, until: int = 0, chunk: int = CHUNK):
+        """
+        Yield the samples between `since` and `until` ms before `now`, packed into messages
+
+        Each message is HEADER followed by up to `chunk` PAIRs of the
+        sample's age in ms (relative to `now`) and its value, oldest first.
+        There is always at least one message, an empty range is a single
+        chunk of no samples. Messages are memoryviews into one buffer,
+        only valid until the next is yielded.
+        """
+        first, count = self.select(now, since, until)
+        chunks = max(1, (count + chunk - 1) // chunk)
+
+        buf = bytearray(HEADER_SIZE + PAIR_SIZE * min(count, chunk))
+        view = memoryview(buf)
+        size = len(self._values)
+
+        j = first
+        for index in range(chunks):
+            n = min(chunk, count - index * chunk)
+            struct.pack_into(HEADER, buf, 0, index, chunks, n)
+
+            pos = HEADER_SIZE
+            for _ in range(n):
+                struct.pack_into(PAIR, buf, pos, ticks_diff(now, self._ticks[j]), self._values[j])
+                pos += PAIR_SIZE
+                j = (j + 1) % size
+
+            yield view[:pos]
+
+
+def unpack(message) -> tuple:
+    """Decode one message from `History.pack`, as (chunk index, chunk count, [(age ms, value)])"""
+    index, chunks, n = struct.unpack_from(HEADER, message, 0)
+    samples = [struct.unpack_from(PAIR, message, HEADER_SIZE + i * PAIR_SIZE) for i in range(n)]
+
+    return index, chunks, samples
+
+
+if __name__ == "__main__":
+    history = History(100)
+    for t in range(0, 150_000, 1000):
+        history.add(t, 20 + (t // 1000) % 7 / 4)
+
+    now = 150_000
+    print(f"{len(history)} of {history.size} samples kept, {8 * history.size} bytes")
+
+    # the last minute, apart from the most recent 10 s
+    for message in history.pack(now, since=60_000, until=10_000, chunk=16):
+        index, chunks, samples = unpack(message)
+        print(f"chunk {index + 1}/{chunks}, {len(message)} bytes, {samples[0]} .. {samples[-1]}")
@@ -0,0 +1,131 @@
+class InFlight:
+    """
+    Fixed size window of QoS 1 messages waiting for their PUBACK
+
+    Each slot keeps what is needed to retransmit: packet id, topic, payload,
+    retain flag, and when it was last sent. Storage is allocated once up
+    front, like utils.OfflineQueue.
+
+    Args:
+        size:
+            maximum number of unacknowledged messages
+    """
+
+    def __init__(self, size: int = 8):
+        if size < 1:
+            raise ValueError("in-flight window needs at least one slot")
+
+        self._size = size
+
+        self._pids = [0] * size  # 0 marks a free slot, packet ids start at 1
+        self._topics = [None] * size
+        self._payloads = [None] * size
+        self._retain = [False] * size
+        self._sent = [0] * size  # monotonic ms of the last transmission
+        self._count = 0
+
+        self._acked = 0
+        self._retransmits = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def full(self) -> bool:
+        return self._count == self._size
+
+    @property
+    def acked(self):
+        """Messages acknowledged by the broker"""
+        return self._acked
+
+    @property
+    def retransmits(self):
+        """Messages sent again (with DUP) after their PUBACK timed out"""
+        return self._retransmits
+
+    def add(self, pid: int, topic, payload, retain: bool, now: int):
+        if self.full:
+            raise IndexError("in-flight window is full")
+
+        i = self._pids.index(0)
+        self._pids[i] = pid
+        self._topics[i] = topic
+        self._payloads[i] = payload
+        self._retain[i] = retain
+        self._sent[i] = now
+        self._count += 1
+
+    def holds(self, pid: int) -> bool:
+        return pid != 0 and pid in self._pids
+
+    def ack(self, pid: int) -> bool:
+        """Release the message with packet id `pid`, False if it is not in flight"""
+        if pid == 0:
+            return False
+
+        try:
+            i = self._pids.index(pid)
+        except ValueError:
+            return False
+
+        self._pids[i] = 0
+        self._topics[i] = None
+        self._payloads[i] = None
+        self._count -= 1
+        self._acked += 1
+
+        return True
+
+    def next_expiry(self, timeout: int) -> int | None:
+        """Monotonic ms at which the oldest message times out, None when empty"""
+        oldest = None
+        for i in range(self._size):
+            if self._pids[i] != 0 and (oldest is None or self._sent[i] < oldest):
+                oldest = self._sent[i]
+
+        if oldest is None:
+            return None
+        return oldest + timeout
+
+    def expired(self, now: int, timeout: int) -> list:
+        """Slots whose PUBACK is overdue"""
+        return [
+            i for i in range(self._size)
+            if self._pids[i] != 0 and now - self._sent[i] >= timeout
+        ]
+
+    def entry(self, i: int):
+        """(pid, topic, payload, retain) of slot `i`"""
+        return self._pids[i], self._topics[i], self._payloads[i], self._retain[i]
+
+    def resent(self, i: int, now: int):
+        self._sent[i] = now
+        self._retransmits += 1
+
+    def expire(self, now: int, timeout: int):
+        """
+        Mark every message overdue at `now`, e.g. to resend them all after a reconnect
+
+        They are backdated by `timeout` rather than to 0, which shortly after
+        boot would be less than `timeout` ago.
+        """
+        for i in range(self._size):
+            self._sent[i] = now - timeout
+
+
+if __name__ == "__main__":
+    window = InFlight(2)
+    window.add(1, b"a", b"1", False, now=0)
+    window.add(2, b"b", b"2", True, now=100)
+    print(window.full, window.next_expiry(1000))  # True 1000
+
+    print(window.ack(1), window.ack(1), len(window))  # True False 1
+    print([window.entry(i) for i in window.expired(now=1200, timeout=1000)])
+
+    window.expire(now=1300, timeout=1000)
+    print(window.expired(now=1300, timeout=1000))  # every slot in flight
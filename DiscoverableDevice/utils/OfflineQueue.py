@@ -0,0 +1,128 @@
+import json
+
+DROP_OLDEST = "drop_oldest"  # when full, the oldest message makes way
+LATEST_PER_TOPIC = "latest"  # a newer message is merged into a queued one on the same topic
+
+
+class OfflineQueue:
+    """
+    Fixed size ring buffer of (topic, payload) messages waiting for a connection
+
+    Storage is allocated once up front, pushing and popping never grows it.
+
+    Args:
+        size:
+            maximum number of queued messages
+        policy:
+            DROP_OLDEST or LATEST_PER_TOPIC
+
+    Under LATEST_PER_TOPIC, JSON object payloads on the same topic are
+    merged field by field, the newer value of a field winning. Every
+    sensor of a device shares its state topic, so replacing the payload
+    outright would drop the other sensors' readings. Anything else is
+    replaced.
+    """
+
+    def __init__(self, size: int = 32, policy: str = DROP_OLDEST):
+        if policy not in (DROP_OLDEST, LATEST_PER_TOPIC):
+            raise ValueError(f"unknown overflow policy {policy}")
+
+        self._size = size
+        self._policy = policy
+
+        self._topics = [None] * size
+        self._payloads = [None] * size
+        self._head = 0  # index of the oldest message
+        self._count = 0
+
+        self._dropped = 0
+        self._replaced = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @property
+    def dropped(self):
+        """Messages lost to overflow"""
+        return self._dropped
+
+    @property
+    def replaced(self):
+        """Messages merged into (or replacing) a queued one on the same topic"""
+        return self._replaced
+
+    def push(self, topic, payload):
+        if self._policy == LATEST_PER_TOPIC:
+            for i in range(self._count):
+                idx = (self._head + i) % self._size
+                if self._topics[idx] == topic:
+                    self._payloads[idx] = _merge(self._payloads[idx], payload)
+                    self._replaced += 1
+                    return
+
+        if self._count == self._size:
+            self.pop()
+            self._dropped += 1
+
+        idx = (self._head + self._count) % self._size
+        self._topics[idx] = topic
+        self._payloads[idx] = payload
+        self._count += 1
+
+    def peek(self):
+        """Oldest message as (topic, payload), without removing it"""
+        if self._count == 0:
+            raise IndexError("peek from empty queue")
+
+        return self._topics[self._head], self._payloads[self._head]
+
+    def pop(self):
+        """Remove and return the oldest message as (topic, payload)"""
+        output = self.peek()
+
+        self._topics[self._head] = None
+        self._payloads[self._head] = None
+        self._head = (self._head + 1) % self._size
+        self._count -= 1
+
+        return output
+
+    def clear(self):
+        while self._count > 0:
+            self.pop()
+
+
+def _merge(old, new):
+    """`new` with the fields of `old` it doesn't have, where both are JSON objects"""
+    try:
+        merged = json.loads(old)
+        fields = json.loads(new)
+    except (TypeError, ValueError):
+        return new
+
+    if not isinstance(merged, dict) or not isinstance(fields, dict):
+        return new
+
+    merged.update(fields)
+    return json.dumps(merged)
+
+
+if __name__ == "__main__":
+    q = OfflineQueue(3)
+    for i in range(5):
+        q.push("a", i)
+    print(len(q), q.dropped, [q.pop() for _ in range(len(q))])
+
+    q = OfflineQueue(3, LATEST_PER_TOPIC)
+    for i in range(5):
+        q.push("a", i)
+        q.push("b", i)
+    print(len(q), q.replaced, [q.pop() for _ in range(len(q))])
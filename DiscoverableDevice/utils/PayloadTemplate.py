@@ -0,0 +1,177 @@
+import json
+
+NUMBER_SPACE = 24  # bytes reserved per value, enough for any float or 64 bit int
+LIMIT = 1e15  # larger floats are left to json, their digits are not meaningful anyway
+
+
+def precision(value_mod) -> int | None:
+    """Decimal places from a signature "value_mod" such as "round(2)", None otherwise"""
+    if value_mod is None:
+        return None
+
+    value_mod = value_mod.replace(" ", "")
+    if not value_mod.startswith("round(") or not value_mod.endswith(")"):
+        return None
+
+    try:
+        return int(value_mod[6:-1] or 0)
+    except ValueError:
+        return None
+
+
+class PayloadTemplate:
+    """
+    JSON serialiser for a state topic whose fields are known up front
+
+    The key text of every field is encoded once, and payloads are formatted
+    into one reused bytearray. Numbers are written digit by digit, floats with
+    a fixed number of decimals taken from the signature's value_mod, so that
+    rendering does not build any intermediate strings.
+
+    Args:
+        fields:
+            [(name, decimal places or None)], in output order, each name once
+    """
+
+    def __init__(self, fields: list):
+        self._names = [name for name, _ in fields]
+        if len(set(self._names)) != len(self._names):
+            # `covers` counts matching names, it would never match
+            raise ValueError(f"template fields repeat a name: {self._names}")
+        self._scales = [None if places is None else 10 ** places for _, places in fields]
+        self._places = [places for _, places in fields]
+
+        # b',"name":' for most fields, b'{"name":' for whichever comes first
+        self._keys = [(b"," + json.dumps(name).encode() + b":") for name in self._names]
+        self._first_keys = [b"{" + key[1:] for key in self._keys]
+
+        size = 2 + sum(len(key) for key in self._keys) + NUMBER_SPACE * len(fields)
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+
+    @property
+    def fields(self) -> list:
+        return self._names
+
+    def covers(self, payload: dict) -> bool:
+        """Can `payload` be rendered? (every key is a field of this template)"""
+        count = 0
+        for name in self._names:
+            if name in payload:
+                count += 1
+
+        return count == len(payload)
+
+    def render(self, payload: dict):
+        """
+        Serialise `payload` (which this template `covers`), returning a memoryview
+
+        The view is only valid until the next call, copy it to keep it.
+        """
+        pos = 0
+        first = True
+
+        for i in range(len(self._names)):
+            try:
+                value = payload[self._names[i]]
+            except KeyError:
+                continue
+
+            if first:
+                key = self._first_keys[i]
+                first = False
+            else:
+                key = self._keys[i]
+
+            pos = self._reserve(pos, len(key) + NUMBER_SPACE)
+            self._view[pos:pos + len(key)] = key
+            pos += len(key)
+
+            pos = self._value(pos, value, self._scales[i], self._places[i])
+
+        if first:
+            self._buf[pos] = 0x7B
+            pos += 1
+        pos = self._reserve(pos, 1)
+        self._buf[pos] = 0x7D  # }
+
+        return self._view[:pos + 1]
+
+    def _reserve(self, pos: int, n: int) -> int:
+        """Make room for `n` more bytes, only allocates when the buffer has to grow"""
+        if pos + n > len(self._buf):
+            buf = bytearray(2 * (pos + n))
+            view = memoryview(buf)
+            view[:pos] = self._view[:pos]
+            self._buf = buf
+            self._view = view
+
+        return pos
+
+    def _value(self, pos, value, scale, places) -> int:
+        if value is True:
+            return self._bytes(pos, b"true")
+        if value is False:
+            return self._bytes(pos, b"false")
+        if value is None:
+            return self._bytes(pos, b"null")
+
+        if isinstance(value, int):
+            return self._int(pos, value)
+
+        if isinstance(value, float) and scale is not None and -LIMIT < value < LIMIT:
+            # fixed point, rounded to `places` decimals (NaN and inf fail the range check)
+            n = round(value * scale)
+            if n < 0:
+                self._buf[pos] = 0x2D  # -
+                pos += 1
+                n = -n
+            pos = self._int(pos, n // scale)
+            if places > 0:
+                self._buf[pos] = 0x2E  # .
+                pos = self._digits(pos + 1, n % scale, places)
+            return pos
+
+        # anything else (strings, unrounded floats) the slow way
+        return self._bytes(pos, json.dumps(value).encode())
+
+    def _bytes(self, pos, data) -> int:
+        pos = self._reserve(pos, len(data))
+        self._view[pos:pos + len(data)] = data
+        return pos + len(data)
+
+    def _int(self, pos, n) -> int:
+        if n < 0:
+            self._buf[pos] = 0x2D
+            pos += 1
+            n = -n
+
+        width = 1
+        limit = 10
+        while n >= limit:
+            width += 1
+            limit *= 10
+
+        return self._digits(pos, n, width)
+
+    def _digits(self, pos, n, width) -> int:
+        """Write `n` as exactly `width` digits, zero padded"""
+        pos = self._reserve(pos, width)
+        end = pos + width
+        i = end - 1
+        while i >= pos:
+            self._buf[i] = 0x30 + n % 10
+            n //= 10
+            i -= 1
+
+        return end
+
+
+if __name__ == "__main__":
+    template = PayloadTemplate([("temperature", 2), ("humidity", 1), ("count", None), ("state", None)])
+
+    payload = {"temperature": -3.14159, "humidity": 55.55, "count": 12, "state": "ON"}
+    print(bytes(template.render(payload)))
+    print(json.loads(bytes(template.render(payload))))
+    print(bytes(template.render({"humidity": 0.04})))  # a subset of the fields
+    print(template.covers({"humidity": 1.0, "other": 2}))  # False
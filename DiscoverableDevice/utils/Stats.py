@@ -0,0 +1,206 @@
+from array import array
+import gc
+
+
+class EWMA:
+    """
+    Integer exponentially weighted moving average, with an alpha of 1 / 2**shift
+
+    Kept as a scaled integer, so adding a sample does not allocate.
+
+    Args:
+        shift:
+            smoothing, 3 weighs each new sample by 1/8
+    """
+
+    def __init__(self, shift: int = 3):
+        self._shift = shift
+        self._acc = 0  # average << shift
+        self._count = 0
+        self._max = 0
+
+    def add(self, value: int):
+        if self._count == 0:
+            self._acc = value << self._shift
+        else:
+            self._acc += value - (self._acc >> self._shift)
+
+        self._count += 1
+        if value > self._max:
+            self._max = value
+
+    @property
+    def value(self) -> int:
+        return self._acc >> self._shift
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def max(self) -> int:
+        return self._max
+
+
+class Histogram:
+    """
+    Sample counts in fixed power of two buckets
+
+    Bucket 0 holds values below 2**shift, bucket i values below 2**(shift + i),
+    and the last bucket everything above.
+
+    Args:
+        buckets:
+            number of buckets
+        shift:
+            log2 of the upper bound of the first bucket
+    """
+
+    def __init__(self, buckets: int = 16, shift: int = 4):
+        self._shift = shift
+        self._counts = array("L", [0] * buckets)
+
+    @property
+    def counts(self):
+        return self._counts
+
+    def add(self, value: int):
+        value >>= self._shift
+        i = 0
+        last = len(self._counts) - 1
+        while value > 0 and i < last:
+            value >>= 1
+            i += 1
+
+        self._counts[i] += 1
+
+    def bound(self, i: int) -> int:
+        """Upper bound of bucket `i`"""
+        return 1 << (self._shift + i)
+
+    def percentile(self, fraction: float) -> int:
+        """Upper bound of the bucket holding the `fraction` quantile, 0 if empty"""
+        total = sum(self._counts)
+        if total == 0:
+            return 0
+
+        target = fraction * total
+        seen = 0
+        for i, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return self.bound(i)
+
+        return self.bound(len(self._counts) - 1)
+
+    def clear(self):
+        for i in range(len(self._counts)):
+            self._counts[i] = 0
+
+
+class Timing:
+    """EWMA and histogram of one stage, in us"""
+
+    def __init__(self):
+        self.ewma = EWMA()
+        self.histogram = Histogram()
+
+    def add(self, us: int):
+        self.ewma.add(us)
+        self.histogram.add(us)
+
+    @property
+    def mean(self) -> int:
+        return self.ewma.value
+
+    @property
+    def max(self) -> int:
+        return self.ewma.max
+
+    @property
+    def count(self) -> int:
+        return self.ewma.count
+
+    def p95(self) -> int:
+        return self.histogram.percentile(0.95)
+
+
+class Stats:
+    """
+    Bounded-size instrumentation for the device loop
+
+    Stage timings (us) are kept as `Timing`s, per-sensor read times as one
+    `EWMA` each, events as plain counters. Everything is created when the
+    stage or sensor is registered, so recording allocates nothing.
+    """
+
+    def __init__(self, stages=(), counters=()):
+        self.timings = {stage: Timing() for stage in stages}
+        self.reads = {}  # per sensor read time, {name: EWMA}
+        self.counters = {name: 0 for name in counters}
+
+        self._mem_free = 0
+        self._mem_free_min = 0
+
+    def add_sensor(self, name: str):
+        self.reads[name] = EWMA()
+
+    def add(self, stage: str, us: int):
+        self.timings[stage].add(us)
+
+    def read(self, name: str, us: int):
+        self.reads[name].add(us)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def sample_heap(self):
+        """
+        Track the free heap, and its low water mark
+
+        Only MicroPython reports the free heap, elsewhere this does nothing.
+        There is no count of GC runs, MicroPython doesn't expose one and
+        guessing from the free heap misses any collection followed by new
+        allocations before the next sample.
+        """
+        try:
+            free = gc.mem_free()
+        except AttributeError:
+            return
+
+        if free < self._mem_free_min or self._mem_free_min == 0:
+            self._mem_free_min = free
+        self._mem_free = free
+
+    @property
+    def mem_free(self) -> int:
+        return self._mem_free
+
+    @property
+    def mem_free_min(self) -> int:
+        return self._mem_free_min
+
+    def slowest(self):
+        """(name, mean us) of the sensor with the longest average read, or (None, 0)"""
+        name = None
+        slowest = 0
+        for sensor, ewma in self.reads.items():
+            if ewma.count > 0 and (name is None or ewma.value > slowest):
+                name = sensor
+                slowest = ewma.value
+
+        return name, slowest
+
+
+if __name__ == "__main__":
+    timing = Timing()
+    for us in (100, 120, 110, 5000, 105):
+        timing.add(us)
+    print(timing.mean, timing.max, timing.p95())  # mean pulled up by the outlier, max 5000
+
+    stats = Stats(stages=("publish",), counters=("connects",))
+    stats.add_sensor("BME280")
+    stats.read("BME280", 12000)
+    stats.count("connects")
+    stats.sample_heap()
+    print(stats.slowest(), stats.counters)
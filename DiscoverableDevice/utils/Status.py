@@ -1,5 +1,5 @@
 from time import ticks_ms, ticks_diff
-from machine import Pin
+from machine import Pin, Timer
 
 
 def blink(length, interval: float = 0.5):
@@ -16,5 +16,60 @@ def blink(length, interval: float = 0.5):
     led.off()
 
 
+class StatusLED:
+    """
+    Status LED driven by a hardware timer, so blinking never blocks the caller
+
+    Args:
+        pin:
+            LED pin, defaults to the onboard LED
+    """
+
+    def __init__(self, pin="LED"):
+        self._led = Pin(pin, Pin.OUT)
+        self._timer = Timer()
+        self._period = None
+        # bound once here, so the timer callback does not allocate
+        self._toggle = self.toggle
+
+    @property
+    def led(self):
+        return self._led
+
+    @property
+    def period(self):
+        return self._period
+
+    def toggle(self, timer=None):
+        self._led.toggle()
+
+    def blink(self, period: int):
+        """Toggle the LED every `period` ms until told otherwise"""
+        if period == self._period:
+            return
+
+        self._period = period
+        self._timer.init(period=period, mode=Timer.PERIODIC, callback=self._toggle)
+
+    def on(self):
+        self.stop()
+        self._led.on()
+
+    def off(self):
+        self.stop()
+        self._led.off()
+
+    def stop(self):
+        self._timer.deinit()
+        self._period = None
+
+
 if __name__ == "__main__":
+    import time
+
     blink(10)
+
+    status = StatusLED()
+    status.blink(100)
+    time.sleep(5)
+    status.off()
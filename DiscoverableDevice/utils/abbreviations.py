@@ -0,0 +1,78 @@
+"""
+Home Assistant's abbreviated MQTT discovery keys
+
+Only the keys this package (and its examples) actually send are listed,
+anything else is passed through unchanged.
+"""
+
+ABBREVIATIONS = {
+    "availability_topic": "avty_t",
+    "brightness_command_topic": "bri_cmd_t",
+    "brightness_scale": "bri_scl",
+    "brightness_state_topic": "bri_stat_t",
+    "brightness_value_template": "bri_val_tpl",
+    "command_topic": "cmd_t",
+    "components": "cmps",
+    "device": "dev",
+    "device_class": "dev_cla",
+    "effect_list": "fx_list",
+    "entity_category": "ent_cat",
+    "force_update": "frc_upd",
+    "icon": "ic",
+    "json_attributes_topic": "json_attr_t",
+    "object_id": "obj_id",
+    "on_command_type": "on_cmd_type",
+    "origin": "o",
+    "payload_off": "pl_off",
+    "payload_on": "pl_on",
+    "platform": "p",
+    "rgb_command_topic": "rgb_cmd_t",
+    "rgb_state_topic": "rgb_stat_t",
+    "rgb_value_template": "rgb_val_tpl",
+    "state_class": "stat_cla",
+    "state_topic": "stat_t",
+    "state_value_template": "stat_val_tpl",
+    "suggested_display_precision": "sug_dsp_prc",
+    "unique_id": "uniq_id",
+    "unit_of_measurement": "unit_of_meas",
+    "value_template": "val_tpl",
+}
+
+DEVICE_ABBREVIATIONS = {
+    "connections": "cns",
+    "hw_version": "hw",
+    "identifiers": "ids",
+    "manufacturer": "mf",
+    "model": "mdl",
+    "suggested_area": "sa",
+    "support_url": "url",
+    "sw_version": "sw",
+}
+
+
+def abbreviate(payload: dict, abbreviations: dict = ABBREVIATIONS) -> dict:
+    """
+    Return a copy of discovery `payload` with its keys abbreviated
+
+    A "device" entry is abbreviated with DEVICE_ABBREVIATIONS.
+    """
+    output = {}
+    for key, value in payload.items():
+        if key == "device" and isinstance(value, dict):
+            value = abbreviate(value, DEVICE_ABBREVIATIONS)
+
+        output[abbreviations.get(key, key)] = value
+
+    return output
+
+
+if __name__ == "__main__":
+    print(
+        abbreviate(
+            {
+                "unique_id": "abc_temp",
+                "state_topic": "homeassistant/sensor/abc/state",
+                "device": {"identifiers": ["abc"], "sw_version": "0.0.1a"},
+            }
+        )
+    )
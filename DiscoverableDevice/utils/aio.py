@@ -0,0 +1,20 @@
+"""
+asyncio shim, picks uasyncio on the board and asyncio on CPython
+"""
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+def make_flag():
+    """
+    Returns a flag that can be set from an IRQ and awaited by a task.
+
+    uasyncio provides ThreadSafeFlag for this, CPython falls back to an Event.
+    """
+    try:
+        return asyncio.ThreadSafeFlag()
+    except AttributeError:
+        return asyncio.Event()
@@ -0,0 +1,20 @@
+import random
+
+BACKOFF_MIN = 1  # first reconnect delay (s), doubled on each consecutive failure
+BACKOFF_MAX = 300  # cap on the reconnect delay (s)
+
+
+def backoff_ms(failures: int) -> int:
+    """
+    Delay in ms before reconnecting after `failures` consecutive failed attempts
+
+    Exponential, with "equal jitter": somewhere between half and all of the
+    backoff, so a fleet knocked off together doesn't reconnect together.
+    """
+    backoff = min(BACKOFF_MAX, BACKOFF_MIN * 2 ** (failures - 1))
+
+    return int(backoff * 500 * (1 + random.random()))
+
+
+if __name__ == "__main__":
+    print([backoff_ms(n) for n in range(1, 12)])
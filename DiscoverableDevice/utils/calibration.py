@@ -0,0 +1,108 @@
+"""
+Per-field calibration, compiled once from a spec and applied in one pass over a reading
+
+A spec maps field names to one of:
+
+    2.5                                     offset, raw + 2.5
+    {"offset": 2.5, "gain": 1.02}           linear, raw * gain + offset
+    {"poly": [c0, c1, c2, ...]}             polynomial, c0 + c1 * raw + c2 * raw**2 ...
+    {"table": [(raw, ref), ...]}            piecewise linear through measured pairs,
+                                            extended along the end segments
+
+Compiling turns each into a (field, kind, coefficients) tuple so applying it
+is a loop over a short tuple, without looking the field's spec up or
+working out what kind it is on every reading.
+"""
+
+OFFSET = 0
+LINEAR = 1
+POLY = 2
+TABLE = 3
+
+
+def compile_calibration(spec: dict) -> tuple:
+    """
+    Check `spec` and compile it for `apply`
+
+    Args:
+        spec:
+            {field: calibration}, see the module docstring
+    """
+    output = []
+    for field, cal in spec.items():
+        if isinstance(cal, (int, float)):
+            output.append((field, OFFSET, cal))
+            continue
+
+        if not isinstance(cal, dict):
+            raise ValueError(f"calibration of {field} must be a number or a dict, not {cal}")
+
+        if "poly" in cal:
+            coefficients = tuple(cal["poly"])
+            if len(coefficients) == 0:
+                raise ValueError(f"calibration polynomial of {field} has no coefficients")
+            # highest order first, for Horner's method
+            output.append((field, POLY, coefficients[::-1]))
+
+        elif "table" in cal:
+            points = sorted(cal["table"])
+            if len(points) < 2:
+                raise ValueError(f"calibration table of {field} needs at least two points")
+            xs = tuple(float(x) for x, _ in points)
+            ys = tuple(float(y) for _, y in points)
+            for i in range(1, len(xs)):
+                if xs[i] == xs[i - 1]:
+                    raise ValueError(f"calibration table of {field} repeats the raw value {xs[i]}")
+            output.append((field, TABLE, (xs, ys)))
+
+        else:
+            unknown = [key for key in cal if key not in ("offset", "gain")]
+            if len(unknown) > 0:
+                raise ValueError(f"unknown calibration keys for {field}: {unknown}")
+            output.append((field, LINEAR, (cal.get("gain", 1), cal.get("offset", 0))))
+
+    return tuple(output)
+
+
+def apply(compiled: tuple, data: dict) -> dict:
+    """
+    Calibrate `data` in place with the output of `compile_calibration`
+
+    Fields missing from `data`, or which aren't numbers, are left as they are.
+    """
+    for field, kind, coefficients in compiled:
+        try:
+            raw = data[field]
+        except KeyError:
+            continue
+
+        try:
+            if kind == OFFSET:
+                data[field] = raw + coefficients
+            elif kind == LINEAR:
+                data[field] = raw * coefficients[0] + coefficients[1]
+            elif kind == POLY:
+                value = 0
+                for c in coefficients:
+                    value = value * raw + c
+                data[field] = value
+            else:
+                data[field] = _interpolate(coefficients[0], coefficients[1], raw)
+        except TypeError:
+            continue
+
+    return data
+
+
+def _interpolate(xs, ys, x):
+    # binary search for the segment holding x, the end segments extend outwards
+    lo = 0
+    hi = len(xs) - 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if x < xs[mid]:
+            hi = mid
+        else:
+            lo = mid
+
+    return ys[lo] + (x - xs[lo]) * (ys[hi] - ys[lo]) / (xs[hi] - xs[lo])
@@ -0,0 +1,36 @@
+def crossed(old, new, absolute: float = 0, relative: float = 0) -> bool:
+    """
+    Has a field moved far enough from its last published value to be worth sending?
+
+    Args:
+        old:
+            last published value
+        new:
+            current value
+        absolute:
+            absolute deadband, changes of at most this are ignored
+        relative:
+            relative deadband as a fraction of `old`, e.g. 0.01 for 1%
+
+    Non numeric values (states like "ON"/"OFF") are reported on any change.
+    """
+    if old == new:
+        return False
+
+    numeric = (int, float)
+    if not isinstance(old, numeric) or not isinstance(new, numeric):
+        return True
+    if isinstance(old, bool) or isinstance(new, bool):
+        return True
+
+    band = max(absolute, relative * abs(old))
+
+    return abs(new - old) > band
+
+
+if __name__ == "__main__":
+    print(crossed(20.0, 20.05, absolute=0.1))  # False
+    print(crossed(20.0, 20.2, absolute=0.1))  # True
+    print(crossed(1000, 1005, relative=0.01))  # False
+    print(crossed(1000, 1020, relative=0.01))  # True
+    print(crossed("OFF", "ON"))  # True
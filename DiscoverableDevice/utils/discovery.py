@@ -0,0 +1,82 @@
+"""
+Discovery payloads for a device and its entities, without any networking
+
+Shared by DiscoverableDevice and the CPython Gateway's VirtualDevice.
+"""
+
+import json
+
+from DiscoverableDevice import __version__
+from DiscoverableDevice.utils.abbreviations import abbreviate, DEVICE_ABBREVIATIONS
+
+# discovery modes
+DISCOVERY_FULL = "full"  # one config per entity, long keys, full device block on each
+DISCOVERY_COMPACT = "compact"  # abbreviated keys, full device block only on the first
+DISCOVERY_DEVICE = "device"  # a single device-level config holding every component
+
+MODES = (DISCOVERY_FULL, DISCOVERY_COMPACT, DISCOVERY_DEVICE)
+
+STATUS_TOPIC = b"homeassistant/status"  # HA birth/last will
+
+
+def device_payload(uid: str, name: str, location: str | None = None) -> dict:
+    """Device block of the discovery configs, for nicer looking interface in HA"""
+    payload = {}
+    payload["identifiers"] = [uid]
+    payload["name"] = name
+    payload["sw_version"] = __version__
+    payload["model"] = name
+    payload["manufacturer"] = "ljbeal"
+
+    if location is not None:
+        payload["suggested_area"] = location
+
+    return payload
+
+
+def build_discovery(entities, device: dict, mode: str, device_topic: str) -> list:
+    """
+    Serialise the discovery configs of `entities`, as [(topic, payload str)]
+
+    Args:
+        entities:
+            bound entities of one device
+        device:
+            the device block, see `device_payload`
+        mode:
+            one of MODES
+        device_topic:
+            topic of the single config used by DISCOVERY_DEVICE
+    """
+    output = []
+
+    if mode == DISCOVERY_DEVICE:
+        components = {}
+        for entity in entities:
+            for topic, payload in entity.discovery_payloads(None):
+                del payload["device"]
+                payload["platform"] = entity.integration
+                components[payload["unique_id"]] = abbreviate(payload)
+
+        payload = {
+            "dev": abbreviate(device, DEVICE_ABBREVIATIONS),
+            "o": {"name": "DiscoverableDevice", "sw": __version__},
+            "cmps": components,
+        }
+        output.append((device_topic, json.dumps(payload)))
+
+        return output
+
+    # in compact mode, entities after the first refer to the device by id
+    device_ref = {"identifiers": device["identifiers"]}
+
+    for entity in entities:
+        for topic, payload in entity.discovery_payloads(device):
+            if mode == DISCOVERY_COMPACT:
+                if len(output) > 0:
+                    payload["device"] = device_ref
+                payload = abbreviate(payload)
+
+            output.append((topic, json.dumps(payload)))
+
+    return output
@@ -0,0 +1,31 @@
+"""
+Boot time helpers, call `prefer_frozen` first thing in main.py
+
+MicroPython searches sys.path in order, and for each entry imports a .py
+before an .mpy of the same name. On the Pico the default path is
+['', '.frozen', '/lib'], so a copy of a module on the filesystem shadows the
+frozen one, and a stray .py shadows its precompiled .mpy. Deploy the output
+of tools/build_mpy.py (no .py sources) and freeze what you can.
+"""
+
+import sys
+
+
+def prefer_frozen():
+    """Move frozen modules to the front of the search path"""
+    if ".frozen" in sys.path:
+        sys.path.remove(".frozen")
+        sys.path.insert(0, ".frozen")
+
+
+def prefer_lib():
+    """Search /lib (where tools/build_mpy.py output is deployed) before the root"""
+    if "/lib" in sys.path:
+        sys.path.remove("/lib")
+        sys.path.insert(1 if sys.path[0] == ".frozen" else 0, "/lib")
+
+
+if __name__ == "__main__":
+    prefer_frozen()
+    prefer_lib()
+    print(sys.path)
@@ -0,0 +1,30 @@
+from time import ticks_ms, ticks_diff
+
+
+_last = ticks_ms()
+_elapsed = 0
+
+
+def monotonic_ms() -> int:
+    """
+    Milliseconds since boot, which unlike ticks_ms does not wrap around
+
+    ticks_ms wraps after ~12 days on the Pico, this accumulates the differences
+    instead. Needs to be called at least once per half ticks period (the run
+    loop does this every iteration).
+    """
+    global _last, _elapsed
+
+    now = ticks_ms()
+    _elapsed += ticks_diff(now, _last)
+    _last = now
+
+    return _elapsed
+
+
+if __name__ == "__main__":
+    from time import sleep
+
+    t0 = monotonic_ms()
+    sleep(1)
+    print(monotonic_ms() - t0)
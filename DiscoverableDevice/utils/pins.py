@@ -1,4 +1,4 @@
-def get_gpio(pin: Pin) -> int:
+def get_gpio(pin: "Pin") -> int:
     return int(str(pin).split("GPIO")[-1].split(",")[0])
 
 
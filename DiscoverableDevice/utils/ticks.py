@@ -0,0 +1,27 @@
+"""
+time.ticks_ms and ticks_diff, with stand-ins on CPython (the Gateway)
+
+The stand-ins wrap at 2**30 like MicroPython's, so tick values fit the
+array("I") storage used on the board and compare the same way.
+"""
+
+import time
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF = TICKS_PERIOD // 2
+
+
+def _ticks_ms() -> int:
+    return (time.monotonic_ns() // 1000000) & TICKS_MAX
+
+
+def _ticks_diff(end: int, start: int) -> int:
+    return ((end - start + TICKS_HALF) & TICKS_MAX) - TICKS_HALF
+
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    ticks_ms = _ticks_ms
+    ticks_diff = _ticks_diff
@@ -1,5 +1,8 @@
 from DiscoverableDevice.Sensor import Sensor
-from sensors.bh1750 import BH1750 as BH1750
+
+from time import ticks_ms, ticks_add
+
+CONVERSION_TIME = 180  # ms, for the high resolution modes
 
 
 class BH1750_MQTT(Sensor):
@@ -7,19 +10,28 @@ class BH1750_MQTT(Sensor):
     Sensor class for a BH1750
     """
 
+    __slots__ = ("sensor",)
+
+    signature = {"lightlevel": {"icon": "mdi:weather-sunny", "unit": "lx"}}
+
     def __init__(self, i2c, *args, **kwargs):
+        # the driver is only imported when a sensor is actually made
+        from sensors.bh1750 import BH1750
+
         self.sensor = BH1750(i2c)
 
         super().__init__("BH1750", *args, **kwargs)
 
-    @property
-    def signature(self):
-        return {"lightlevel": {"icon": "mdi:weather-sunny", "unit": "lx"}}
-
     def read(self):
-        val = self.sensor.luminance(BH1750_I2C.ONCE_HIRES_1)
+        return {"lightlevel": self.sensor.luminance(self.sensor.ONCE_HIRES_1)}
+
+    def start(self):
+        """Start a one-shot high resolution measurement"""
+        self.sensor.set_mode(self.sensor.ONCE_HIRES_1)
+
+        return ticks_add(ticks_ms(), CONVERSION_TIME)
 
-        if "lightlevel" in calibration:
-            val += calibration["lightlevel"]
+    def collect(self):
+        data = self.sensor.bus.readfrom(self.sensor.addr, 2)
 
-        return {"lightlevel": val}
\ No newline at end of file
+        return {"lightlevel": (data[0] << 8 | data[1]) / 1.2}
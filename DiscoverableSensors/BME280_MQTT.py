@@ -1,5 +1,4 @@
 from DiscoverableDevice.Sensor import Sensor
-from sensors.bme280 import BME280_I2C
 
 
 class BME280_MQTT(Sensor):
@@ -7,31 +6,33 @@ class BME280_MQTT(Sensor):
     Sensor class for a BME280
     """
 
+    __slots__ = ("sensor",)
+
+    signature = {
+        "temperature": {
+            "icon": "mdi:thermometer",
+            "unit": "C",
+            "value_mod": "round(2)"
+        },
+        "humidity": {
+            "icon": "mdi:water-percent",
+            "unit": "%",
+            "value_mod": "round(2)"
+        },
+        "pressure": {
+            "icon": "mdi:weight", 
+            "unit": "hPa", 
+            "value_mod": "round(2)"
+        },
+    }
+
     def __init__(self, i2c, *args, **kwargs):
+        from sensors.bme280 import BME280_I2C
+
         self.sensor = BME280_I2C(i2c=i2c)
 
         super().__init__("BME280", *args, **kwargs)
 
-    @property
-    def signature(self):
-        return {
-            "temperature": {
-                "icon": "mdi:thermometer",
-                "unit": "C",
-                "value_mod": "round(2)"
-            },
-            "humidity": {
-                "icon": "mdi:water-percent",
-                "unit": "%",
-                "value_mod": "round(2)"
-            },
-            "pressure": {
-                "icon": "mdi:weight", 
-                "unit": "hPa", 
-                "value_mod": "round(2)"
-            },
-        }
-
     def read(self):
         return self.sensor.data
         
@@ -1,5 +1,4 @@
 from DiscoverableDevice.Sensor import Sensor
-from sensors.bme680 import BME680_I2C
 
 
 class BME680_MQTT(Sensor):
@@ -7,33 +6,29 @@ class BME680_MQTT(Sensor):
     Sensor class for a BME680
     """
 
+    __slots__ = ("sensor",)
+
+    signature = {
+        "temperature": {
+            "icon": "mdi:thermometer",
+            "unit": "C",
+            "value_mod": "round(2)",
+        },
+        "humidity": {
+            "icon": "mdi:water-percent",
+            "unit": "%",
+            "value_mod": "round(2)",
+        },
+        "pressure": {"icon": "mdi:weight", "unit": "hPa", "value_mod": "round(2)"},
+        "gas_ohms": {"icon": "mdi:omega", "unit": "ohms", "value_mod": "round(2)"},
+    }
+
     def __init__(self, i2c, *args, **kwargs):
+        from sensors.bme680 import BME680_I2C
+
         self.sensor = BME680_I2C(i2c=i2c)
 
         super().__init__("BME680", *args, **kwargs)
 
-    @property
-    def signature(self):
-        return {
-            "temperature": {
-                "icon": "mdi:thermometer",
-                "unit": "C",
-                "value_mod": "round(2)",
-            },
-            "humidity": {
-                "icon": "mdi:water-percent",
-                "unit": "%",
-                "value_mod": "round(2)",
-            },
-            "pressure": {"icon": "mdi:weight", "unit": "hPa", "value_mod": "round(2)"},
-            "gas_ohms": {"icon": "mdi:omega", "unit": "ohms", "value_mod": "round(2)"},
-        }
-
     def read(self):
-        data = self.sensor.data
-
-        for value in data:
-            if value in calibration:
-                data[value] += calibration[value]
-
-        return data
\ No newline at end of file
+        return self.sensor.data
\ No newline at end of file
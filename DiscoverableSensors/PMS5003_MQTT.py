@@ -1,9 +1,36 @@
+import machine
+
 from DiscoverableDevice.Sensor import Sensor
-from sensors.pms5003 import PMS5003
 
 
 class PMS5003_MQTT(Sensor):
-    def __init__(self, uart, pin_enable, pin_reset):
+
+    __slots__ = ("sensor",)
+
+    signature = {
+        "PM1_0": {
+            "icon": "mdi:spray",
+            "unit": "ug/m3",
+            "value_mod": "round(2)",
+            "aggregate": ("max",),
+        },
+        "PM2_5": {
+            "icon": "mdi:bacteria-outline",
+            "unit": "ug/m3",
+            "value_mod": "round(2)",
+            "aggregate": ("max",),
+        },
+        "PM10": {
+            "icon": "mdi:liquid-spot",
+            "unit": "ug/m3",
+            "value_mod": "round(2)",
+            "aggregate": ("max",),
+        },
+    }
+
+    def __init__(self, uart, pin_enable, pin_reset, *args, **kwargs):
+        from sensors.pms5003 import PMS5003
+
         self.sensor = pms5003 = PMS5003(
             uart=uart,
             pin_enable=machine.Pin(pin_enable),
@@ -11,27 +38,8 @@ class PMS5003_MQTT(Sensor):
             mode="active",
         )
 
-        super().__init__("PMS5003")
-
-    @property
-    def signature(self):
-        return {
-            "PM1_0": {
-                "icon": "mdi:spray",
-                "unit": "ug/m3",
-                "value_mod": "round(2)",
-            },
-            "PM2_5": {
-                "icon": "mdi:bacteria-outline",
-                "unit": "ug/m3",
-                "value_mod": "round(2)",
-            },
-            "PM10": {
-                "icon": "mdi:liquid-spot",
-                "unit": "ug/m3",
-                "value_mod": "round(2)",
-            },
-        }
+        # sample with interval=1 and publish with window=60 to get each minute's mean and peak
+        super().__init__("PMS5003", *args, **kwargs)
 
     def read(self):
         raw = self.sensor.read().data
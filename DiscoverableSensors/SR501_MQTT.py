@@ -1,12 +1,21 @@
 from DiscoverableDevice.Trigger import Trigger
 
+import time
+from time import ticks_ms, ticks_add, ticks_diff
+
+CONFIRM_TIME = 2000  # ms the pin has to stay high to count as a detection
+
 
 class SR501_MQTT(Trigger):
+
+    __slots__ = ("_init_time", "_warmup", "_started_high")
+
     def __init__(self, name, pin, debounce=5000, warmup=45):
         super().__init__(name, pin, debounce)
 
         self._init_time = time.time()
         self._warmup = warmup
+        self._started_high = False
         print(f"init SR501 at {self._init_time}")
 
     @property
@@ -20,18 +29,49 @@ class SR501_MQTT(Trigger):
         return self.pin.value() == 1
 
     def read(self):
-        name = f"{self.name}_state"
+        deadline = self.start()
         # If we are still in the warmup period, do nothing
-        if self.warmup:
+        if deadline is None:
             print("SR501 is warming up")
             return
 
-        val = "OFF"
-        if self.triggered:
-            # primitive "debounce"
-            time.sleep(2)
+        # primitive "debounce", the pin has to still be high after CONFIRM_TIME
+        wait = ticks_diff(deadline, ticks_ms())
+        if wait > 0:
+            time.sleep_ms(wait)
+
+        return self.collect()
+
+    def start(self):
+        """
+        Split-phase version of `read`, confirming the detection after CONFIRM_TIME
+        """
+        if self.warmup:
+            return None
+
+        self._started_high = self.triggered
+        if not self._started_high:
+            return ticks_ms()
+
+        return ticks_add(ticks_ms(), CONFIRM_TIME)
+
+    def collect(self):
+        val = "ON" if self._started_high and self.triggered else "OFF"
+        self._queued = False
+
+        return {f"{self.name}_state": val}
+
+    async def aread(self):
+        """As `read`, but awaits the debounce instead of blocking the device"""
+        from DiscoverableDevice.utils.aio import asyncio
+
+        deadline = self.start()
+        if deadline is None:
+            print("SR501 is warming up")
+            return
 
-            if self.triggered:
-                val = "ON"
+        wait = ticks_diff(deadline, ticks_ms())
+        if wait > 0:
+            await asyncio.sleep(wait / 1000)
 
-        return {name: val}
+        return self.collect()
@@ -0,0 +1,12 @@
+"""
+Benchmarks for the read / publish / discover / command hot paths
+
+    python -m benchmarks [--quick] [--out results.jsonl] [name ...]
+
+Devices run on hostsim (virtual clock, in-memory broker), with 1 to 200
+synthetic sensors. Each case prints one JSON object per line, see
+`harness.Bench.result` for the fields.
+
+Only CPython is supported. The harness has MicroPython branches (ticks_us
+timing, gc.mem_alloc), but the suite has never been run on the unix port.
+"""
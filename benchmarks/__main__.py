@@ -0,0 +1,445 @@
+"""
+Run the benchmarks, see the package docstring
+"""
+
+import sys
+
+import hostsim
+
+sim = hostsim.install(seed=0)
+
+from benchmarks.fixtures import Synthetic, make_device, settle
+from benchmarks.harness import Bench, Memory, elapsed_us, mute, now_us, percentile, unmute
+
+SIZES = [1, 10, 50, 100, 200]
+QUICK_SIZES = [1, 10, 50]
+
+
+def close(device):
+    try:
+        device.disconnect()
+    except OSError:
+        pass
+    sim.broker.clear_log()
+
+
+def bench_read_sensors(bench, sizes, repeat):
+    for n in sizes:
+        device = make_device(n, read_ttl=0)  # every call reads the hardware
+        memory = Memory()
+        times = bench.time(device.read_sensors, repeat)
+        memory.measure(device.read_sensors)
+
+        bench.result("read_sensors", {"sensors": n, "fields": 3}, times, memory)
+        close(device)
+
+
+def bench_push_data(bench, sizes, repeat, fields=3, name="push_data"):
+    for n in sizes:
+        device = make_device(n, fields=fields)
+        topics = device.read_sensors()
+
+        bytes_in = sim.broker.bytes_in
+        times = bench.time(lambda: device.push_data(topics), repeat)
+        published = (sim.broker.bytes_in - bytes_in) // repeat
+
+        memory = Memory()
+        memory.measure(lambda: device.push_data(topics))
+
+        bench.result(name, {"sensors": n, "fields": fields}, times, memory,
+                     bytes_per_cycle=published)
+        close(device)
+
+
+def bench_payload(bench, repeat, sizes):
+    for fields in sizes:
+        bench_push_data(bench, [10], repeat, fields=fields, name="push_data_payload")
+
+
+def bench_filters(bench, sizes, repeat, samples=200):
+    """
+    Cost of one sample through each filter stage, and how much of the noise
+    (gaussian, with the odd spike) it takes out
+    """
+    import random
+    from DiscoverableDevice.utils.Filters import ExponentialAverage, Median, MovingAverage, RejectOutliers
+
+    rng = random.Random(0)
+    noisy = [20 + rng.gauss(0, 0.5) + (10 if rng.random() < 0.02 else 0) for _ in range(samples)]
+
+    def spread(values):
+        mean = sum(values) / len(values)
+        return (sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5
+
+    stages = {
+        "moving_average": lambda n: MovingAverage(n),
+        "median": lambda n: Median(n),
+        "ewma": lambda n: ExponentialAverage(2 / (n + 1)),
+        "reject_outliers": lambda n: RejectOutliers(n),
+    }
+
+    for name, make in stages.items():
+        for n in (5, 9):
+            stage = make(n)
+            output = [stage.add(v) for v in noisy]
+
+            values = iter(noisy * (repeat // samples + 1))
+            times = bench.time(lambda: stage.add(next(values)), repeat)
+            memory = Memory()
+            memory.measure(lambda: stage.add(20.0))
+
+            bench.result("filters", {"stage": name, "window": n}, times, memory,
+                         noise_in=round(spread(noisy), 3), noise_out=round(spread(output), 3))
+
+    # a whole read cycle, every field oversampled and filtered
+    for oversample in (1, 9):
+        device = make_device(10, read_ttl=0)
+        for sensor in device.sensors:
+            if isinstance(sensor, Synthetic) and oversample > 1:
+                sensor.oversample = oversample
+                for field in sensor.signature:
+                    sensor.filter(field, Median(oversample))
+        times = bench.time(device.read_sensors, repeat)
+        memory = Memory()
+        memory.measure(device.read_sensors)
+
+        bench.result("filters_read_sensors", {"sensors": 10, "fields": 3, "oversample": oversample}, times, memory)
+        close(device)
+
+
+def bench_calibration(bench, repeat, fields=3):
+    """Compiled calibration of one reading, against the old per-field dict loop"""
+    from DiscoverableDevice.utils.calibration import apply, compile_calibration
+
+    specs = {
+        "offset": {f"f{i}": 0.5 for i in range(fields)},
+        "linear": {f"f{i}": {"offset": 0.5, "gain": 1.02} for i in range(fields)},
+        "poly": {f"f{i}": {"poly": [0.3, 1.01, -0.0004]} for i in range(fields)},
+        "table": {f"f{i}": {"table": [(0, 1), (10, 11), (20, 20.5), (30, 31), (40, 40)]} for i in range(fields)},
+    }
+    reading = {f"f{i}": 20.0 + i for i in range(fields)}
+
+    def loop():
+        data = dict(reading)
+        for key, val in specs["offset"].items():
+            data[key] += val
+
+    times = bench.time(loop, repeat)
+    bench.result("calibration", {"kind": "dict_loop", "fields": fields}, times)
+
+    for kind, spec in specs.items():
+        compiled = compile_calibration(spec)
+        times = bench.time(lambda: apply(compiled, dict(reading)), repeat)
+        memory = Memory()
+        memory.measure(lambda: apply(compiled, dict(reading)))
+
+        bench.result("calibration", {"kind": kind, "fields": fields}, times, memory)
+
+
+def bench_aggregate(bench, repeat, window=60):
+    """A reading into the window's accumulators, and the publish at its end"""
+
+    class Windowed(Synthetic):
+        __slots__ = ()
+
+        @property
+        def signature(self):
+            return {field: dict(Synthetic._FIELD, aggregate=("min", "max", "std", "count")) for field in self._fields}
+
+    sensor = Windowed("agg", fields=3, interval=1, window=window)
+    sensor._read(force=True)  # the first reading publishes straight away
+
+    times = bench.time(lambda: sensor._read(force=True), repeat)
+    memory = Memory()
+    memory.measure(lambda: sensor._read(force=True))
+    bench.result("aggregate", {"fields": 3, "stats": 4, "phase": "sample"}, times, memory)
+
+    def close_window():
+        sim.clock.advance(window * 1000)
+        return sensor._read(force=True)
+
+    times = bench.time(close_window, repeat)
+    memory = Memory()
+    memory.measure(close_window)
+    bench.result("aggregate", {"fields": 3, "stats": 4, "phase": "publish"}, times, memory)
+
+
+def bench_read_cache(bench, repeat, sensors=10, burst=20):
+    """
+    A burst of `burst` commands through `callback`, with and without the TTL cache
+
+    "repeat" sends the same command each time (an automation re-asserting
+    a state), "toggle" alternates, so every command changes the state and
+    has to be read.
+    """
+    for ttl in (0, 500):
+        for pattern in ("repeat", "toggle"):
+            device = make_device(sensors, switch=True, read_ttl=ttl)
+            switch = device._sensors["switch"]
+            topic = switch._command_topic_b
+            messages = [b"ON", b"ON"] if pattern == "repeat" else [b"ON", b"OFF"]
+
+            def commands():
+                for i in range(burst):
+                    device.callback(topic, messages[i % 2])
+
+            before = switch._count
+            times = bench.time(commands, repeat, setup=lambda: sim.clock.advance(1000))
+            reads = switch._count - before
+
+            bench.result("read_cache", {"sensors": sensors, "burst": burst, "commands": pattern, "ttl_ms": ttl},
+                         times, hardware_reads_per_burst=reads / repeat)
+            close(device)
+
+
+def bench_qos(bench, messages, ack_delay=20):
+    """
+    `messages` states in a row against a broker taking `ack_delay` (virtual) ms to
+    PUBACK: QoS 0, QoS 1 one at a time (as umqtt.simple does it), and windowed QoS 1
+    """
+    for qos, inflight in ((0, 0), (1, 1), (1, 8)):
+        sim.broker.ack_delay = ack_delay
+        device = make_device(10, qos=qos, inflight=inflight)
+        topics = device.read_sensors()
+
+        start = sim.now_ms
+        t0 = now_us()
+        for _ in range(messages):
+            device.push_data(topics)
+        wall = elapsed_us(t0)
+        virtual = sim.now_ms - start
+
+        sim.run(device, 1)  # take in the outstanding acks
+        window = device.inflight
+        bench.result("qos", {"qos": qos, "inflight": inflight, "ack_delay_ms": ack_delay}, [],
+                     messages=messages, virtual_ms=round(virtual), wall_us=wall,
+                     acked=0 if window is None else window.acked)
+        close(device)
+
+    # lost acks, everything still arrives once the timeout has passed
+    sim.broker.ack_delay = 0
+    sim.broker.drop_acks = 3
+    device = make_device(10, qos=1)
+    topics = device.read_sensors()
+    for _ in range(messages):
+        device.push_data(topics)
+    sim.run(device, 7)
+
+    bench.result("qos_lost_acks", {"dropped": 3}, [], messages=messages,
+                 retransmits=device.inflight.retransmits, unacked=len(device.inflight),
+                 dup=len([m for m in sim.broker.log if m.dup]))
+    sim.broker.drop_acks = 0
+    close(device)
+
+
+def bench_footprint(bench, sizes):
+    """Heap held by `n` entities once added, and the peak of one read and publish cycle"""
+    for n in sizes:
+        device = make_device(0, connect=False)
+
+        def add():
+            for i in range(n):
+                device.add_entity(Synthetic(f"s{i}"))
+
+        entities = Memory()
+        entities.measure(add)
+        settle(device)
+
+        cycle = Memory()
+        cycle.measure(lambda: device.push_data(device.read_sensors()))
+
+        bench.result("footprint", {"sensors": n, "fields": 3}, [], entities,
+                     cycle_peak_bytes=cycle.peak)
+        close(device)
+
+
+def bench_discover(bench, sizes, repeat):
+    for mode in ("full", "compact", "device"):
+        for n in sizes:
+            device = make_device(n, discovery_mode=mode)
+
+            def discover():
+                device.rediscover(force=True)
+                settle(device)
+
+            bytes_in = sim.broker.bytes_in
+            times = bench.time(discover, repeat)
+            published = (sim.broker.bytes_in - bytes_in) // repeat
+
+            memory = Memory()
+            memory.measure(discover)
+
+            bench.result("discover", {"sensors": n, "mode": mode}, times, memory,
+                         bytes=published, configs=len(device._discovery))
+            close(device)
+
+
+def bench_callback(bench, sizes, repeat):
+    for n in sizes:
+        device = make_device(n, switch=True)
+        switch = device._sensors["switch"]
+        topic = switch._command_topic_b
+
+        messages = [b"ON", b"OFF"]
+        count = [0]
+
+        def command():
+            count[0] += 1
+            device.callback(topic, messages[count[0] % 2])
+
+        times = bench.time(command, repeat)
+        memory = Memory()
+        memory.measure(command)
+
+        bench.result("callback", {"sensors": n}, times, memory)
+        close(device)
+
+
+def bench_command_latency(bench, sizes, repeat):
+    """Host time from a command reaching the broker to the device's state echo"""
+    for n in sizes:
+        device = make_device(n, switch=True)
+        switch = device._sensors["switch"]
+        state = switch._state_topic_b
+
+        times = []
+        for i in range(repeat):
+            seen = len(sim.broker.messages(state))
+            sim.broker.inject(switch.command_topic, "ON" if i % 2 else "OFF")
+
+            t0 = now_us()
+            while len(sim.broker.messages(state)) == seen:
+                device.run(once=True)
+            times.append(elapsed_us(t0))
+
+        bench.result("command_latency", {"sensors": n}, times)
+        close(device)
+
+
+def bench_command_rate(bench, rates, seconds):
+    """Commands arriving at `rate` per (virtual) second while 10 sensors are read every second"""
+    for rate in rates:
+        device = make_device(10, switch=True, interval=1)
+        switch = device._sensors["switch"]
+        start = sim.now_ms
+
+        count = int(rate * seconds)
+        sent = []
+        for i in range(count):
+            at = start + 1000 * i / rate
+            sent.append(at)
+            sim.broker.inject_at(at, switch.command_topic, "ON" if i % 2 else "OFF")
+
+        t0 = now_us()
+        sim.run(device, seconds + 0.5)
+        wall = elapsed_us(t0)
+
+        # virtual ms from each command to the first state echo after it
+        echoes = [m.time for m in sim.broker.messages(switch._state_topic_b)]
+        latency = []
+        j = 0
+        for at in sent:
+            while j < len(echoes) and echoes[j] < at:
+                j += 1
+            if j < len(echoes):
+                latency.append(echoes[j] - at)
+
+        extra = {"handled": len(latency), "wall_us_per_command": wall // max(1, count)}
+        if len(latency) > 0:
+            extra["latency_ms_median"] = percentile(latency, 0.5)
+            extra["latency_ms_p95"] = percentile(latency, 0.95)
+        bench.result("command_rate", {"rate": rate, "seconds": seconds}, [], **extra)
+        close(device)
+
+
+def bench_cold_start(bench, reboots):
+    """
+    Boot to first state publish, on a clean broker and then on reboots (configs retained)
+
+    import_us and setup_us are host time, first_state_ms is virtual time,
+    which counts the waits (conversions, queue pacing) but not the CPU work.
+    """
+    from machine import I2C
+
+    for boot in range(1 + reboots):
+        for name in list(sys.modules):
+            if name.startswith("DiscoverableDevice") or name.startswith("DiscoverableSensors"):
+                del sys.modules[name]
+
+        t0 = now_us()
+        import network
+        from DiscoverableDevice.DiscoverableDevice import DiscoverableDevice
+        from DiscoverableSensors.BH1750_MQTT import BH1750_MQTT
+        from DiscoverableSensors.BME280_MQTT import BME280_MQTT
+        from DiscoverableSensors.SR501_MQTT import SR501_MQTT
+        import_us = elapsed_us(t0)
+
+        t0 = now_us()
+        i2c = I2C(0)
+        device = DiscoverableDevice(network.WLAN(), host="broker", user="", password="")
+        device.add_entity(BH1750_MQTT(i2c))
+        device.add_entity(BME280_MQTT(i2c))
+        device.add_entity(SR501_MQTT("PIR", 15))
+        setup_us = elapsed_us(t0)
+
+        start = sim.now_ms
+        sim.run(device, 5)
+
+        first = None
+        before = 0
+        for message in sim.broker.log:
+            if message.time < start:
+                continue
+            if message.topic.endswith(b"/state"):
+                first = message.time - start
+                break
+            before += 1
+
+        bench.result("cold_start", {"boot": "first" if boot == 0 else "reboot"}, [],
+                     import_us=import_us, setup_us=setup_us, first_state_ms=first,
+                     messages_before_first_state=before)
+
+        # a brownout: the connection just vanishes, retained configs stay
+        sim.broker.go_offline()
+        sim.broker.go_online()
+        sim.broker.clear_log()
+
+
+CASES = {
+    "read_sensors": lambda b, sizes, r: bench_read_sensors(b, sizes, r),
+    "push_data": lambda b, sizes, r: bench_push_data(b, sizes, r),
+    "payload": lambda b, sizes, r: bench_payload(b, r, [1, 4, 16, 64]),
+    "footprint": lambda b, sizes, r: bench_footprint(b, sizes),
+    "discover": lambda b, sizes, r: bench_discover(b, sizes, max(1, r // 10)),
+    "callback": lambda b, sizes, r: bench_callback(b, sizes, r),
+    "command_latency": lambda b, sizes, r: bench_command_latency(b, sizes, r),
+    "cold_start": lambda b, sizes, r: bench_cold_start(b, 2),
+    "qos": lambda b, sizes, r: bench_qos(b, 50),
+    "filters": lambda b, sizes, r: bench_filters(b, sizes, r),
+    "calibration": lambda b, sizes, r: bench_calibration(b, r),
+    "aggregate": lambda b, sizes, r: bench_aggregate(b, r),
+    "read_cache": lambda b, sizes, r: bench_read_cache(b, r),
+    "command_rate": lambda b, sizes, r: bench_command_rate(b, [1, 10, 100], 2 if b.quick else 10),
+}
+
+
+def main(argv):
+    quick = "--quick" in argv
+    out = None
+    if "--out" in argv:
+        out = argv[argv.index("--out") + 1]
+    names = [arg for arg in argv if arg in CASES] or list(CASES)
+
+    bench = Bench(out=out, quick=quick)
+    sizes = QUICK_SIZES if quick else SIZES
+    repeat = 10 if quick else 50
+
+    mute()
+    try:
+        for name in names:
+            CASES[name](bench, sizes, repeat)
+    finally:
+        unmute()
+
+
+main(sys.argv[1:])
@@ -0,0 +1,82 @@
+"""
+Synthetic entities and device setup for the benchmarks
+"""
+
+from DiscoverableDevice.Sensor import Sensor
+from DiscoverableDevice.Switch import Switch
+
+
+class Synthetic(Sensor):
+    """
+    Sensor returning `fields` changing values, like the fake BME280 in
+    examples/MultiTest.py but deterministic
+    """
+
+    __slots__ = ("_fields", "_count")
+
+    _FIELD = {"icon": "mdi:gauge", "unit": "C", "value_mod": "round(2)"}
+
+    def __init__(self, name, fields: int = 3, **kwargs):
+        super().__init__(name, **kwargs)
+        self._fields = [f"{name}_{i}" for i in range(fields)]
+        self._count = 0
+
+    @property
+    def signature(self):
+        return {field: Synthetic._FIELD for field in self._fields}
+
+    def read(self):
+        self._count += 1
+        return {field: 20 + (self._count * (i + 1)) % 17 / 4 for i, field in enumerate(self._fields)}
+
+
+class SyntheticSwitch(Switch):
+    """Switch holding its state in memory, counting its reads like Synthetic"""
+
+    __slots__ = ("_count",)
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._state = False
+        self._count = 0
+
+    @property
+    def signature(self):
+        return {self.name: {"icon": "mdi:toggle-switch"}}
+
+    def callback(self, msg):
+        self._state = msg == "ON"
+
+    def read(self):
+        self._count += 1
+        return {self.name: "ON" if self._state else "OFF"}
+
+
+def make_device(sensors: int, fields: int = 3, switch: bool = False, connect: bool = True, **kwargs):
+    """A DiscoverableDevice with `sensors` Synthetic sensors, connected and discovered"""
+    import network
+
+    from DiscoverableDevice.DiscoverableDevice import DiscoverableDevice
+
+    device = DiscoverableDevice(network.WLAN(), host="broker", user="", password="", **kwargs)
+    for i in range(sensors):
+        device.add_entity(Synthetic(f"s{i}", fields=fields))
+    if switch:
+        device.add_entity(SyntheticSwitch("switch"))
+
+    if connect:
+        settle(device)
+    return device
+
+
+def settle(device, limit: int = 1000):
+    """Step the connection until the device is online with an empty queue"""
+    import time
+
+    for _ in range(limit):
+        device.service()
+        device.drain()
+        if device.online and len(device.queue) == 0:
+            return
+        time.sleep_ms(min(device.time_to_retry(), 100))
+    raise RuntimeError(f"device did not come online (state {device.state})")
@@ -0,0 +1,159 @@
+"""
+Timing, memory and output helpers, for CPython with untested branches for MicroPython
+"""
+
+import builtins
+import gc
+import json
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    ticks_us = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+if hasattr(gc, "mem_alloc"):
+    PLATFORM = "micropython"
+else:
+    PLATFORM = "cpython"
+
+
+def now_us() -> int:
+    """Host (wall) time in us, never the simulated clock"""
+    if PLATFORM == "cpython":
+        import time
+        return time.perf_counter_ns() // 1000
+    return ticks_us()
+
+
+def elapsed_us(t0: int) -> int:
+    if PLATFORM == "cpython":
+        return now_us() - t0
+    return ticks_diff(ticks_us(), t0)
+
+
+_print = builtins.print
+
+
+def mute():
+    """Silence the device's logging, it would dominate the timings"""
+    builtins.print = lambda *args, **kwargs: None
+
+
+def unmute():
+    builtins.print = _print
+
+
+def percentile(values: list, fraction: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Memory:
+    """
+    Heap used by one call of a function
+
+    `peak` is the high water mark above the starting heap, `retained` what is
+    still allocated afterwards. MicroPython runs the call with the GC off, so
+    `peak` is everything it allocated.
+    """
+
+    def __init__(self):
+        self.peak = 0
+        self.retained = 0
+
+    def measure(self, fn):
+        gc.collect()
+
+        if PLATFORM == "micropython":
+            before = gc.mem_alloc()
+            gc.disable()
+            try:
+                output = fn()
+            finally:
+                after = gc.mem_alloc()
+                gc.enable()
+            self.peak = after - before
+            gc.collect()
+            self.retained = gc.mem_alloc() - before
+            return output
+
+        if tracemalloc is None:
+            return fn()
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            output = fn()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.peak = peak - before
+        self.retained = current - before
+        return output
+
+
+class Bench:
+    """
+    Collects the results, writing each as a line of JSON
+
+    Args:
+        out:
+            file to append to, stdout when None
+        quick:
+            fewer repeats and sizes, for CI
+    """
+
+    def __init__(self, out=None, quick=False):
+        self._out = out
+        self.quick = quick
+        self.results = []
+
+    def time(self, fn, repeat: int, setup=None) -> list:
+        """Run `fn` `repeat` times, returning each duration in us"""
+        output = []
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            t0 = now_us()
+            fn()
+            output.append(elapsed_us(t0))
+        return output
+
+    def result(self, name: str, params: dict, times: list, memory=None, **extra):
+        """
+        Record one case
+
+        Fields: name, platform, params, n (samples), min/median/p95/mean in us,
+        peak_bytes/retained_bytes when `memory` is given, and any `extra`
+        metrics (bytes published, latencies, ...).
+        """
+        record = {"name": name, "platform": PLATFORM, "params": params, "n": len(times)}
+
+        if len(times) > 0:
+            record["min_us"] = min(times)
+            record["median_us"] = percentile(times, 0.5)
+            record["p95_us"] = percentile(times, 0.95)
+            record["mean_us"] = sum(times) // len(times)
+
+        if memory is not None:
+            record["peak_bytes"] = memory.peak
+            record["retained_bytes"] = memory.retained
+
+        for key, val in extra.items():
+            record[key] = val
+
+        self.results.append(record)
+
+        line = json.dumps(record)
+        if self._out is None:
+            _print(line)
+        else:
+            with open(self._out, "a") as f:
+                f.write(line + "\n")
+
+        return record
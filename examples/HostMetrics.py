@@ -0,0 +1,84 @@
+"""
+Gateway example: this machine's load, memory and disks, as one HA device per disk
+
+    python -m examples.HostMetrics broker_host [port]
+"""
+
+import os
+import shutil
+import socket
+
+from DiscoverableDevice.Sensor import Sensor
+from DiscoverableDevice.Gateway import Gateway, VirtualDevice
+
+
+class Load(Sensor):
+
+    __slots__ = ()
+
+    signature = {"load": {"icon": "mdi:gauge",
+                          "value_mod": "round(2)",
+                          "deadband": 0.05}
+                 }
+
+    def read(self):
+        return {"load": os.getloadavg()[0]}
+
+
+class Memory(Sensor):
+
+    __slots__ = ()
+
+    signature = {"mem_available": {"icon": "mdi:memory",
+                                   "unit": "MB",
+                                   "value_mod": "round(0)",
+                                   "deadband_rel": 0.01}
+                 }
+
+    def read(self):
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return {"mem_available": int(line.split()[1]) / 1024}
+
+
+class Disk(Sensor):
+    """Free space on the filesystem holding `path`"""
+
+    __slots__ = ("_path",)
+
+    signature = {"free": {"icon": "mdi:harddisk",
+                          "unit": "GB",
+                          "value_mod": "round(1)",
+                          "deadband": 0.1}
+                 }
+
+    def __init__(self, name, path, interval=60):
+        super().__init__(name, interval=interval)
+        self._path = path
+
+    def read(self):
+        return {"free": shutil.disk_usage(self._path).free / 1e9}
+
+
+if __name__ == "__main__":
+    import sys
+
+    host = sys.argv[1]
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 1883
+    hostname = socket.gethostname()
+
+    gateway = Gateway(host=host, port=port)
+
+    machine = VirtualDevice(uid=hostname, name=hostname, interval=10)
+    machine.add_entity(Load("load"))
+    machine.add_entity(Memory("memory"))
+    gateway.add_device(machine)
+
+    for i, path in enumerate(("/", "/home", "/tmp")):
+        if os.path.isdir(path):
+            disk = VirtualDevice(uid=f"{hostname}_disk{i}", name=f"{hostname}_disk{i}", location=hostname)
+            disk.add_entity(Disk("disk", path))
+            gateway.add_device(disk)
+
+    gateway.run_forever()
@@ -1,15 +1,24 @@
 from DiscoverableDevice.Sensor import Sensor
+from DiscoverableDevice.utils.Filters import ExponentialAverage, Median
 
 import machine
 
 class CPUTemp(Sensor):
-    
-    @property
-    def signature(self):
-        return {"cputemp": {"icon": "mdi:thermometer",
-                            "unit": "C",
-                            "value_mod": "round(2)"}
-                }
+
+    __slots__ = ()
+
+    signature = {"cputemp": {"icon": "mdi:thermometer",
+                             "unit": "C",
+                             "value_mod": "round(2)",
+                             "deadband": 0.5}
+                 }
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        # the internal sensor is noisy by a degree or so: take the median
+        # of 9 conversions per reading, then smooth the readings
+        self.oversample = 9
+        self.filter("cputemp", Median(9), ExponentialAverage(0.3))
         
     def read(self):    
         adc = machine.ADC(4)
@@ -0,0 +1,165 @@
+"""
+Host simulation of the MicroPython APIs DiscoverableDevice uses
+
+`install()` registers simulated `machine`, `network`, `umqtt.simple`,
+`ubinascii`, `uselect`, `micropython` and `sensors` modules and adds the
+`time.ticks_*` / `sleep_ms` functions, all backed by a virtual clock, so
+that the device code runs unmodified under CPython:
+
+    import hostsim
+    sim = hostsim.install()
+
+    from DiscoverableDevice.DiscoverableDevice import DiscoverableDevice
+    device = DiscoverableDevice(network.WLAN(), host="broker", user="", password="")
+    sim.run(device, seconds=3600)  # an hour, in however long the work takes
+
+    print(len(sim.broker.messages(b"homeassistant/#")))
+
+`install` has to be called before anything imports `time.ticks_ms` or
+`machine`, since those get bound at import.
+"""
+
+import binascii
+import sys
+import time
+
+from hostsim.clock import VirtualClock, ticks_add, ticks_diff
+
+
+class StopSimulation(BaseException):
+    """Raised from the clock to end `Simulation.run`, not caught by device code"""
+
+
+class Simulation:
+    """
+    Handle on an installed simulation
+
+    Args:
+        clock:
+            the VirtualClock everything runs on
+        broker:
+            the in-memory broker devices connect to
+        environment:
+            what the fake sensor drivers measure
+    """
+
+    def __init__(self, clock, broker, environment):
+        self.clock = clock
+        self.broker = broker
+        self.environment = environment
+
+    @property
+    def now_ms(self) -> int:
+        return self.clock.now_ms()
+
+    def pin(self, id):
+        """Pin `id`, to drive inputs with `drive` / `script`"""
+        import machine
+        return machine.Pin(id)
+
+    def run(self, device, seconds: float, dry_run: bool = False):
+        """Run `device` (its blocking loop) for `seconds` of virtual time"""
+        self.clock.call_later(seconds * 1000, self._stop)
+        try:
+            device.run(dry_run=dry_run)
+        except StopSimulation:
+            pass
+
+    @staticmethod
+    def _stop():
+        raise StopSimulation()
+
+    def advance(self, seconds: float):
+        """Let `seconds` of virtual time pass, running scheduled events"""
+        self.clock.advance(seconds * 1000)
+
+
+_installed = None
+
+
+def _patch_time(clock, realtime):
+    """Give CPython's time module the MicroPython extras, on the virtual clock"""
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    time.ticks_cpu = clock.ticks_cpu
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep = clock.sleep
+    time.sleep_ms = clock.sleep_ms
+    time.sleep_us = clock.sleep_us
+    time.localtime = clock.localtime
+    if not realtime:
+        # asyncio and friends use monotonic, which is left alone
+        time.time = clock.time
+        time.time_ns = clock.time_ns
+
+
+def install(
+    realtime: bool = False,
+    start_ms: int = 0,
+    host: str | None = None,
+    port: int = 1883,
+    seed: int | None = None,
+) -> Simulation:
+    """
+    Register the simulated modules, and return the Simulation
+
+    Calling again returns the existing simulation.
+
+    Args:
+        realtime:
+            follow the host clock, needed for the asyncio run mode
+        start_ms:
+            initial tick count, set near 2**30 to test wrap around
+        host, port:
+            broker address, a host of None accepts any
+        seed:
+            seed for the simulated sensor noise
+    """
+    global _installed
+    if _installed is not None:
+        return _installed
+
+    from hostsim import environment, machine, micropython, network, uselect
+    from hostsim.umqtt import simple
+    from hostsim.broker import Broker
+    from hostsim.sensors import bh1750, bme280, bme680, pms5003, scd4x
+    import hostsim.sensors
+    import hostsim.umqtt
+
+    # under MicroPython `time` is the real thing, and read only (untested)
+    native = hasattr(time, "ticks_ms")
+    if native:
+        realtime = True
+
+    clock = VirtualClock(start_ms=start_ms, realtime=realtime)
+    broker = Broker(clock, host=host, port=port)
+    network.add_broker(broker)
+
+    environment.current = environment.Environment(clock, seed=seed)
+    machine.clock = clock
+    micropython.clock = clock
+    uselect.clock = clock
+
+    if not native:
+        _patch_time(clock, realtime)
+
+    sys.modules.update({
+        "machine": machine,
+        "micropython": micropython,
+        "network": network,
+        "uselect": uselect,
+        "utime": time,
+        "ubinascii": binascii,
+        "umqtt": hostsim.umqtt,
+        "umqtt.simple": simple,
+        "sensors": hostsim.sensors,
+        "sensors.bh1750": bh1750,
+        "sensors.bme280": bme280,
+        "sensors.bme680": bme680,
+        "sensors.pms5003": pms5003,
+        "sensors.scd4x": scd4x,
+    })
+
+    _installed = Simulation(clock, broker, environment.current)
+    return _installed
@@ -0,0 +1,68 @@
+"""
+Soak run of a full device against the simulated broker
+
+    python -m hostsim [hours]
+
+Runs a Pico with a BH1750, a BME280, an SR501 and the onboard LED as a
+switch for `hours` (default 24) of virtual time, with PIR activity, HA
+commands, an HA restart and a broker outage along the way, then reports
+what the broker saw.
+"""
+
+import sys
+import time
+
+import hostsim
+
+sim = hostsim.install(seed=1)
+
+import network
+from machine import I2C, Pin
+
+from DiscoverableDevice.DiscoverableDevice import DiscoverableDevice
+from DiscoverableSensors.BH1750_MQTT import BH1750_MQTT
+from DiscoverableSensors.BME280_MQTT import BME280_MQTT
+from DiscoverableSensors.SR501_MQTT import SR501_MQTT
+from examples.SwitchPicoLED import SwitchLED
+
+hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+HOUR = 3_600_000
+
+i2c = I2C(0, sda=Pin(0), scl=Pin(1))
+
+device = DiscoverableDevice(network.WLAN(), host="broker", user="", password="", interval=60)
+device.add_entity(BH1750_MQTT(i2c, interval=30))
+device.add_entity(BME280_MQTT(i2c))
+device.add_entity(SR501_MQTT("PIR", 15))
+led = SwitchLED("LED")
+device.add_entity(led)
+
+# someone walking past every ten minutes
+pir = sim.pin(15)
+for start in range(HOUR // 12, int(hours * HOUR), HOUR // 6):
+    pir.script([(start, 1), (start + 4_000, 0)])
+
+# the light toggled from HA every hour, HA restarting and the broker going down
+for hour in range(int(hours)):
+    sim.broker.inject_at(hour * HOUR + 1_000, led.command_topic, "ON" if hour % 2 else "OFF")
+sim.broker.inject_at(HOUR * 2.5, "homeassistant/status", "online")
+sim.clock.call_at(HOUR * 3.5, sim.broker.go_offline)
+sim.clock.call_at(HOUR * 3.6, sim.broker.go_online)
+
+t0 = time.perf_counter()
+sim.run(device, seconds=hours * 3600)
+wall = time.perf_counter() - t0
+
+states = sim.broker.messages(b"homeassistant/+/+/state")
+states += sim.broker.messages(b"homeassistant/+/+/+/state")
+configs = sim.broker.messages(b"homeassistant/+/+/+/config")
+
+print()
+print(f"simulated {hours:g}h in {wall:.2f}s ({hours * 3600 / wall:.0f}x real time)")
+print(f"connects:        {sim.broker.connects}")
+print(f"state messages:  {len(states)}")
+print(f"config messages: {len(configs)}")
+print(f"bytes in / out:  {sim.broker.bytes_in} / {sim.broker.bytes_out}")
+print(f"queue dropped:   {device.queue.dropped}")
+print(f"irq dropped:     {device.irq_dropped}, bounced: {device.irq_bounced}")
+print(f"LED is:          {'ON' if Pin('LED').value() else 'OFF'}")
@@ -0,0 +1,398 @@
+"""
+In-memory MQTT 3.1.1 broker, enough of one for the simulated clients
+
+Clients connect through `Broker.connect`, which returns a `FakeSocket`
+speaking the real wire protocol, so the umqtt client (and anything writing
+raw packets) runs unmodified. Everything sent is logged with its virtual
+timestamp for benchmarks and tests.
+"""
+
+import errno
+import struct
+
+
+def topic_matches(pattern: bytes, topic: bytes) -> bool:
+    """MQTT topic filter matching, with + and # wildcards"""
+    if b"+" not in pattern and b"#" not in pattern:
+        return pattern == topic
+
+    pattern = pattern.split(b"/")
+    topic = topic.split(b"/")
+
+    for i, level in enumerate(pattern):
+        if level == b"#":
+            return True
+        if i >= len(topic):
+            return False
+        if level != b"+" and level != topic[i]:
+            return False
+
+    return len(pattern) == len(topic)
+
+
+def encode_length(n: int) -> bytes:
+    output = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            output.append(byte | 0x80)
+        else:
+            output.append(byte)
+            return bytes(output)
+
+
+def publish_packet(topic: bytes, payload: bytes, retain: bool = False) -> bytes:
+    """QoS 0 PUBLISH, as delivered to subscribers"""
+    body = struct.pack("!H", len(topic)) + topic + payload
+    return bytes([0x30 | retain]) + encode_length(len(body)) + body
+
+
+class Message:
+    __slots__ = ("time", "client", "topic", "payload", "qos", "retain", "dup")
+
+    def __init__(self, time, client, topic, payload, qos, retain, dup):
+        self.time = time
+        self.client = client
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.dup = dup
+
+    def __repr__(self):
+        return f"Message({self.time}ms, {self.topic}, {self.payload[:60]})"
+
+
+class FakeSocket:
+    """
+    Client end of a connection, with the MicroPython stream interface
+
+    Writes are parsed by the broker straight away, replies land in the
+    receive buffer.
+    """
+
+    def __init__(self, broker, session):
+        self._broker = broker
+        self._session = session
+        self._rx = bytearray()
+        self._blocking = True
+        self._closed = False
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def readable(self) -> bool:
+        return len(self._rx) > 0 or self._closed
+
+    def _deliver(self, data):
+        self._rx.extend(data)
+
+    def _hangup(self):
+        self._closed = True
+
+    def setblocking(self, flag):
+        self._blocking = flag
+
+    def settimeout(self, timeout):
+        self._blocking = timeout is None or timeout > 0
+
+    def write(self, buf, length=None):
+        if self._closed:
+            raise OSError(errno.ECONNRESET)
+
+        if isinstance(buf, str):
+            buf = buf.encode()
+        if length is not None:
+            buf = buf[:length]
+        buf = bytes(buf)
+
+        self._broker._receive(self._session, buf)
+        return len(buf)
+
+    send = write
+
+    def read(self, n=-1):
+        if n == 0:
+            return b""
+
+        if len(self._rx) == 0:
+            if self._closed:
+                return b""
+            if not self._blocking:
+                return None
+
+            # blocking, let simulated time pass until something arrives
+            clock = self._broker.clock
+            limit = clock.now_ms() + self._broker.read_timeout
+            while len(self._rx) == 0 and not self._closed:
+                if not clock.step(limit):
+                    if len(self._rx) == 0:
+                        raise OSError(errno.ETIMEDOUT)
+
+            if len(self._rx) == 0:
+                return b""
+
+        if n < 0:
+            n = len(self._rx)
+
+        output = bytes(self._rx[:n])
+        del self._rx[:n]
+        return output
+
+    recv = read
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._broker._disconnect(self._session)
+
+
+class Session:
+    def __init__(self, client_id=b""):
+        self.client_id = client_id
+        self.sock = None
+        self.subscriptions = {}  # {filter: qos}
+        self.buffer = bytearray()
+        self.connected = False
+        self.will = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class Broker:
+    """
+    Args:
+        clock:
+            VirtualClock used to timestamp messages
+        host, port:
+            address clients have to use to reach this broker
+    """
+
+    def __init__(self, clock, host=None, port=1883):
+        self.clock = clock
+        self.host = host
+        self.port = port
+
+        self.online = True  # set False to refuse connections
+        self.read_timeout = 5000  # ms a blocking client read waits for data
+        self.ack_delay = 0  # ms before a PUBACK goes out, a stand-in for the round trip
+        self.drop_acks = 0  # number of upcoming PUBACKs to lose
+
+        self.sessions = []
+        self.retained = {}  # {topic: payload}
+        self.log = []  # every PUBLISH received, as Message
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.connects = 0
+
+    # client facing
+
+    def connect(self, host, port) -> FakeSocket:
+        if not self.online:
+            raise OSError(errno.EHOSTUNREACH)
+        if self.host is not None and host != self.host:
+            raise OSError(errno.EHOSTUNREACH)
+        if port != self.port:
+            raise OSError(errno.ECONNREFUSED)
+
+        session = Session()
+        session.sock = FakeSocket(self, session)
+        self.sessions.append(session)
+
+        return session.sock
+
+    # test/HA facing
+
+    def inject(self, topic, payload, retain=False):
+        """Publish `payload` on `topic` as if from another client (e.g. HA)"""
+        topic = topic.encode() if isinstance(topic, str) else bytes(topic)
+        payload = payload.encode() if isinstance(payload, str) else bytes(payload)
+
+        self._route(None, topic, payload, 0, retain, False)
+
+    def inject_at(self, at_ms, topic, payload, retain=False):
+        self.clock.call_at(at_ms, self.inject, topic, payload, retain)
+
+    def go_offline(self):
+        """Drop every connection and refuse new ones"""
+        self.online = False
+        for session in list(self.sessions):
+            session.sock._hangup()
+            self._disconnect(session, will=True)
+
+    def go_online(self):
+        self.online = True
+
+    def messages(self, topic_filter=b"#"):
+        if isinstance(topic_filter, str):
+            topic_filter = topic_filter.encode()
+        return [m for m in self.log if topic_matches(topic_filter, m.topic)]
+
+    def clear_log(self):
+        self.log = []
+
+    # protocol
+
+    def _send(self, session, data):
+        session.bytes_out += len(data)
+        self.bytes_out += len(data)
+        session.sock._deliver(data)
+
+    def _disconnect(self, session, will=False):
+        if session in self.sessions:
+            self.sessions.remove(session)
+
+        if will and session.will is not None:
+            self._route(session, *session.will, False)
+
+    def _receive(self, session, data):
+        session.bytes_in += len(data)
+        self.bytes_in += len(data)
+        session.buffer.extend(data)
+
+        while True:
+            packet = self._next_packet(session.buffer)
+            if packet is None:
+                return
+            self._handle(session, *packet)
+
+    @staticmethod
+    def _next_packet(buffer):
+        """Pop one complete packet off `buffer`, as (header byte, body)"""
+        if len(buffer) < 2:
+            return None
+
+        length = 0
+        shift = 0
+        i = 1
+        while True:
+            if i >= len(buffer):
+                return None
+            byte = buffer[i]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            i += 1
+            if not byte & 0x80:
+                break
+
+        if len(buffer) < i + length:
+            return None
+
+        header = buffer[0]
+        body = bytes(buffer[i:i + length])
+        del buffer[:i + length]
+
+        return header, body
+
+    def _handle(self, session, header, body):
+        kind = header >> 4
+
+        if kind == 1:
+            self._on_connect(session, body)
+        elif kind == 3:
+            self._on_publish(session, header, body)
+        elif kind == 4:
+            pass  # PUBACK for a message we delivered, we only deliver QoS 0
+        elif kind == 8:
+            self._on_subscribe(session, body)
+        elif kind == 12:
+            self._send(session, b"\xd0\x00")
+        elif kind == 14:
+            session.will = None
+            session.sock._hangup()
+            self._disconnect(session)
+
+    def _on_connect(self, session, body):
+        pos = 2 + struct.unpack_from("!H", body, 0)[0]  # protocol name
+        pos += 1  # level
+        flags = body[pos]
+        pos += 3  # flags and keepalive
+
+        def field():
+            nonlocal pos
+            n = struct.unpack_from("!H", body, pos)[0]
+            value = body[pos + 2:pos + 2 + n]
+            pos += 2 + n
+            return value
+
+        session.client_id = field()
+        if flags & 0x04:
+            will_topic = field()
+            will_msg = field()
+            session.will = (will_topic, will_msg, (flags >> 3) & 3, bool(flags & 0x20))
+
+        session.connected = True
+        self.connects += 1
+        self._send(session, b"\x20\x02\x00\x00")
+
+    def _on_publish(self, session, header, body):
+        qos = (header >> 1) & 3
+        retain = bool(header & 1)
+        dup = bool(header & 8)
+
+        n = struct.unpack_from("!H", body, 0)[0]
+        topic = body[2:2 + n]
+        pos = 2 + n
+
+        if qos > 0:
+            pid = body[pos:pos + 2]
+            pos += 2
+            self._ack(session, b"\x40\x02" + pid)
+
+        self._route(session, topic, body[pos:], qos, retain, dup)
+
+    def _ack(self, session, packet):
+        if self.drop_acks > 0:
+            self.drop_acks -= 1
+        elif self.ack_delay > 0:
+            self.clock.call_later(self.ack_delay, self._send, session, packet)
+        else:
+            self._send(session, packet)
+
+    def _route(self, session, topic, payload, qos, retain, dup):
+        client = None if session is None else session.client_id
+        self.log.append(Message(self.clock.now_ms(), client, topic, payload, qos, retain, dup))
+
+        if retain:
+            if len(payload) == 0:
+                self.retained.pop(topic, None)
+            else:
+                self.retained[topic] = payload
+
+        packet = None
+        for other in self.sessions:
+            if not other.connected:
+                continue
+            for pattern in other.subscriptions:
+                if topic_matches(pattern, topic):
+                    if packet is None:
+                        packet = publish_packet(topic, payload)
+                    self._send(other, packet)
+                    break
+
+    def _on_subscribe(self, session, body):
+        pid = body[:2]
+        pos = 2
+        granted = bytearray()
+
+        filters = []
+        while pos < len(body):
+            n = struct.unpack_from("!H", body, pos)[0]
+            pattern = body[pos + 2:pos + 2 + n]
+            qos = body[pos + 2 + n]
+            pos += 3 + n
+
+            session.subscriptions[pattern] = qos
+            filters.append(pattern)
+            granted.append(min(qos, 1))
+
+        self._send(session, b"\x90" + encode_length(2 + len(granted)) + pid + bytes(granted))
+
+        for topic, payload in self.retained.items():
+            for pattern in filters:
+                if topic_matches(pattern, topic):
+                    self._send(session, publish_packet(topic, payload, retain=True))
+                    break
@@ -0,0 +1,182 @@
+"""
+Virtual clock behind the simulated `time.ticks_*` / `time.sleep` functions
+
+In virtual mode time only moves when something sleeps or polls, jumping
+straight to the next scheduled event, so a simulated hour takes as long as
+the work done in it. In realtime mode the clock follows the host clock,
+which is what asyncio based code needs.
+
+Busy-wait loops on ticks_ms (like utils.Status.blink) never see virtual time
+move and so spin forever, use realtime mode for those.
+"""
+
+import heapq
+import time as _time
+
+try:
+    _monotonic = _time.monotonic
+except AttributeError:
+    # MicroPython, untested
+    def _monotonic():
+        return _time.time_ns() / 1_000_000_000
+
+# MicroPython's ticks wrap at 2**30 on every port
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+EPOCH = 1_700_000_000  # time.time() at virtual zero
+
+
+def ticks_diff(end: int, start: int) -> int:
+    return ((end - start + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) & TICKS_MAX
+
+
+def check_int(value):
+    """MicroPython's sleep_ms and poll take whole ms, a float is a TypeError there"""
+    if not isinstance(value, int):
+        raise TypeError(f"can't convert {type(value).__name__} to int")
+
+
+class VirtualClock:
+    """
+    Args:
+        start_ms:
+            initial value, set close to TICKS_PERIOD to exercise wrap around
+        realtime:
+            follow the host clock instead of jumping
+    """
+
+    def __init__(self, start_ms: int = 0, realtime: bool = False):
+        self._us = start_ms * 1000
+        self._realtime = realtime
+        self._t0 = _monotonic()
+
+        self._events = []  # heap of (due us, sequence, fn, args)
+        self._seq = 0
+        self._soft = []  # micropython.schedule queue
+
+    @property
+    def realtime(self) -> bool:
+        return self._realtime
+
+    def now_us(self) -> int:
+        if self._realtime:
+            return self._us + int((_monotonic() - self._t0) * 1_000_000)
+        return self._us
+
+    def now_ms(self) -> int:
+        return self.now_us() // 1000
+
+    # MicroPython time API
+
+    def ticks_ms(self) -> int:
+        return self.now_ms() & TICKS_MAX
+
+    def ticks_us(self) -> int:
+        return self.now_us() & TICKS_MAX
+
+    def ticks_cpu(self) -> int:
+        return self.ticks_us()
+
+    def time(self) -> int:
+        return EPOCH + self.now_ms() // 1000
+
+    def time_ns(self) -> int:
+        return (EPOCH * 1_000_000 + self.now_us()) * 1000
+
+    def localtime(self, secs=None):
+        """8-tuple, as MicroPython returns it"""
+        if secs is None:
+            secs = self.time()
+        return tuple(_time.gmtime(secs))[:8]
+
+    def sleep(self, seconds):
+        self.advance(seconds * 1000)
+
+    def sleep_ms(self, ms):
+        check_int(ms)
+        self.advance(ms)
+
+    def sleep_us(self, us):
+        self.advance(us / 1000)
+
+    # scheduling
+
+    def call_at(self, at_ms, fn, *args):
+        """Run `fn(*args)` once the clock reaches `at_ms` (virtual ms since start)"""
+        self._seq += 1
+        heapq.heappush(self._events, (int(at_ms * 1000), self._seq, fn, args))
+
+    def call_later(self, delay_ms, fn, *args):
+        self.call_at(self.now_us() / 1000 + delay_ms, fn, *args)
+
+    def schedule_soft(self, fn, arg):
+        """micropython.schedule, run at the next opportunity"""
+        if len(self._soft) >= 8:
+            raise RuntimeError("schedule queue full")
+        self._soft.append((fn, arg))
+
+    def next_event_ms(self):
+        if len(self._events) == 0:
+            return None
+        return self._events[0][0] / 1000
+
+    def run_due(self):
+        """Run every event (and scheduled callback) whose time has come"""
+        self._run_soft()
+
+        now = self.now_us()
+        while len(self._events) > 0 and self._events[0][0] <= now:
+            due, _, fn, args = heapq.heappop(self._events)
+            if not self._realtime:
+                self._us = max(self._us, due)
+            fn(*args)
+            self._run_soft()
+
+    def _run_soft(self):
+        while len(self._soft) > 0:
+            fn, arg = self._soft.pop(0)
+            fn(arg)
+
+    def step(self, until_ms) -> bool:
+        """
+        Move to the next event, or to `until_ms` if that comes first
+
+        Returns False once `until_ms` has been reached.
+        """
+        until_us = int(until_ms * 1000)
+
+        if self._realtime:
+            self.run_due()
+            remaining = until_us - self.now_us()
+            if remaining <= 0:
+                return False
+
+            nxt = self.next_event_ms()
+            if nxt is not None:
+                remaining = min(remaining, int(nxt * 1000) - self.now_us())
+            _time.sleep(max(0, remaining) / 1_000_000)
+            self.run_due()
+            return self.now_us() < until_us
+
+        self._run_soft()
+
+        if len(self._events) > 0 and self._events[0][0] <= until_us:
+            self._us = max(self._us, self._events[0][0])
+            self.run_due()
+            return self._us < until_us
+
+        self._us = max(self._us, until_us)
+        self.run_due()
+        return False
+
+    def advance(self, ms):
+        """Sleep for `ms`, running whatever is scheduled in between"""
+        until = self.now_us() / 1000 + ms
+        while self.step(until):
+            pass
@@ -0,0 +1,65 @@
+"""
+Simulated surroundings for the fake sensor drivers
+
+Every quantity is a function of virtual time: a daily cycle plus a little
+noise. Override any of them by assigning a callable taking the virtual time
+in seconds, e.g. `sim.environment.lux = lambda t: 0.0`.
+"""
+
+import math
+import random
+
+DAY = 86_400
+
+
+def gauss(sigma: float) -> float:
+    """Normal noise via Box-Muller, MicroPython's random has no gauss"""
+    u = 1.0 - random.random()
+    return sigma * math.sqrt(-2.0 * math.log(u)) * math.cos(2 * math.pi * random.random())
+
+
+class Environment:
+    """
+    Args:
+        clock:
+            VirtualClock the quantities follow
+        seed:
+            seed for the noise, for repeatable runs
+    """
+
+    def __init__(self, clock, seed: int | None = None):
+        self.clock = clock
+        if seed is not None:
+            random.seed(seed)
+
+        self.lux = self._lux
+        self.temperature = self._cycle(19.0, 3.0, 0.05)
+        self.humidity = self._cycle(55.0, -8.0, 0.3)
+        self.pressure = self._cycle(1013.0, 1.5, 0.05)
+        self.gas = self._cycle(120_000.0, 15_000.0, 500.0)
+        self.co2 = self._cycle(650.0, 150.0, 5.0)
+        self.pm = self._cycle(6.0, 3.0, 0.5)
+
+    def now(self) -> float:
+        return self.clock.now_ms() / 1000
+
+    def noise(self, sigma: float) -> float:
+        return gauss(sigma)
+
+    def _cycle(self, mean, amplitude, sigma):
+        """Sine over a day, peaking mid afternoon"""
+        def value(t):
+            phase = 2 * math.pi * ((t % DAY) / DAY - 0.375)
+            return mean + amplitude * math.sin(phase) + self.noise(sigma)
+        return value
+
+    def _lux(self, t):
+        daylight = math.sin(math.pi * ((t % DAY) / DAY - 0.25) * 2)
+        return max(0.0, 800 * daylight) + abs(self.noise(2.0))
+
+    def sample(self, quantity: str) -> float:
+        """Current value of `quantity`"""
+        return getattr(self, quantity)(self.now())
+
+
+current = None  # Environment, set by hostsim.install
@@ -0,0 +1,358 @@
+"""
+Simulated `machine` module
+
+Pins with the same id share state, like on the board, and inputs can be
+driven (or scripted against the virtual clock) with `drive` / `script`,
+firing any IRQ handler registered on them.
+"""
+
+from hostsim.environment import gauss
+
+clock = None  # VirtualClock, set by hostsim.install
+
+_unique_id = {"value": b"\xe6\x61\x41\x04\x03\x1b\x2a\x21"}
+
+
+def unique_id() -> bytes:
+    return _unique_id["value"]
+
+
+def set_unique_id(value: bytes):
+    """Change what unique_id() returns, e.g. to build several devices"""
+    _unique_id["value"] = value
+
+
+def freq(hz=None):
+    return 125_000_000
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def soft_reset():
+    raise SystemExit("machine.soft_reset()")
+
+
+def idle():
+    pass
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
+
+
+class _PinState:
+    def __init__(self):
+        self.mode = None
+        self.pull = None
+        self.value = 0
+        self.driven = None  # value forced from outside (the "wiring")
+        self.handler = None
+        self.trigger = 0
+        self.hard = False
+        self.edges = 0
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    _states = {}
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self._id = id
+        self._state = Pin._states.setdefault(id, _PinState())
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        state = self._state
+        if mode != -1:
+            state.mode = mode
+        if pull != -1:
+            state.pull = pull
+            if state.driven is None:
+                state.value = 1 if pull == Pin.PULL_UP else 0
+        if value is not None:
+            state.value = 1 if value else 0
+
+    @property
+    def id(self):
+        return self._id
+
+    def __str__(self):
+        mode = {0: "IN", 1: "OUT", 2: "OPEN_DRAIN", 3: "ALT"}.get(self._state.mode, "IN")
+        if isinstance(self._id, int):
+            name = f"GPIO{self._id}"
+        else:
+            name = "EXT_GPIO0"
+        if self._state.pull is None:
+            return f"Pin({name}, mode={mode})"
+        pull = "PULL_UP" if self._state.pull == Pin.PULL_UP else "PULL_DOWN"
+        return f"Pin({name}, mode={mode}, pull={pull})"
+
+    __repr__ = __str__
+
+    def value(self, value=None):
+        if value is None:
+            if self._state.driven is not None:
+                return self._state.driven
+            return self._state.value
+        self._set(1 if value else 0)
+
+    __call__ = value
+
+    def on(self):
+        self._set(1)
+
+    def off(self):
+        self._set(0)
+
+    high = on
+    low = off
+
+    def toggle(self):
+        self._set(1 - self._state.value)
+
+    def _set(self, value):
+        self._state.value = value
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self._state.handler = handler
+        self._state.trigger = trigger
+        self._state.hard = hard
+
+    # simulation side
+
+    def drive(self, value):
+        """Force the level on this pin from the outside, firing IRQs on an edge"""
+        state = self._state
+        old = self.value()
+        state.driven = 1 if value else 0
+
+        if state.driven == old or state.handler is None:
+            return
+
+        edge = Pin.IRQ_RISING if state.driven else Pin.IRQ_FALLING
+        if state.trigger & edge:
+            state.edges += 1
+            state.handler(self)
+
+    def release(self):
+        """Stop driving this pin"""
+        self._state.driven = None
+
+    def script(self, events):
+        """Drive this pin at virtual times, `events` is [(at_ms, value)]"""
+        for at_ms, value in events:
+            clock.call_at(at_ms, self.drive, value)
+
+    @classmethod
+    def reset_all(cls):
+        cls._states = {}
+
+
+class Signal:
+    def __init__(self, pin, invert=False):
+        self._pin = pin
+        self._invert = invert
+
+    def value(self, value=None):
+        if value is None:
+            return self._pin.value() ^ self._invert
+        self._pin.value(bool(value) ^ self._invert)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+
+class PWM:
+    def __init__(self, pin, freq=1000, duty_u16=0):
+        self._pin = pin
+        self._freq = freq
+        self._duty = duty_u16
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = int(value) & 0xFFFF
+
+    def duty_ns(self, value=None):
+        period = 1_000_000_000 // self._freq
+        if value is None:
+            return self._duty * period // 65535
+        self._duty = int(value * 65535 // period)
+
+    def deinit(self):
+        self._duty = 0
+
+
+class ADC:
+    """
+    read_u16 comes from `ADC.sources[id]` if set, otherwise channel 4 behaves
+    like the RP2040 temperature sensor (around 27C) and the rest read mid scale.
+    Both with a little noise.
+    """
+
+    CORE_TEMP = 4
+    sources = {}  # {channel: callable returning u16}
+
+    def __init__(self, id):
+        if isinstance(id, Pin):
+            id = id.id
+        self._id = id
+
+    def read_u16(self) -> int:
+        source = ADC.sources.get(self._id, None)
+        if source is not None:
+            return int(source()) & 0xFFFF
+
+        if self._id == ADC.CORE_TEMP:
+            base = 0.706 / 3.3 * 65536
+        else:
+            base = 32768
+        return int(base + gauss(60)) & 0xFFFF
+
+
+class I2C:
+    """
+    I2C bus, devices are simulated by objects attached with `attach`
+
+    Attached devices implement `readfrom(nbytes)` and `writeto(buf)`, and
+    optionally `readfrom_mem(reg, nbytes)` / `writeto_mem(reg, buf)`.
+    """
+
+    _devices = {}  # {(bus id, address): device}
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400_000, timeout=50_000):
+        self._id = id
+
+    def attach(self, addr, device):
+        I2C._devices[(self._id, addr)] = device
+
+    def _device(self, addr):
+        try:
+            return I2C._devices[(self._id, addr)]
+        except KeyError:
+            raise OSError(5)  # EIO, as for a missing ack
+
+    def scan(self):
+        return sorted(addr for bus, addr in I2C._devices if bus == self._id)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return bytes(self._device(addr).readfrom(nbytes))
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self.readfrom(addr, len(buf))
+
+    def writeto(self, addr, buf, stop=True):
+        self._device(addr).writeto(bytes(buf))
+        return len(buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        return bytes(self._device(addr).readfrom_mem(memaddr, nbytes))
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        buf[:] = self.readfrom_mem(addr, memaddr, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self._device(addr).writeto_mem(memaddr, bytes(buf))
+
+
+SoftI2C = I2C
+
+
+class UART:
+    def __init__(self, id=0, baudrate=9600, **kwargs):
+        self._id = id
+        self._rx = bytearray()
+        self._tx = bytearray()
+
+    def init(self, baudrate=9600, **kwargs):
+        pass
+
+    def feed(self, data):
+        """Simulation side, make `data` available to read"""
+        self._rx.extend(data)
+
+    def any(self):
+        return len(self._rx)
+
+    def read(self, nbytes=None):
+        if len(self._rx) == 0:
+            return None
+        if nbytes is None:
+            nbytes = len(self._rx)
+        output = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return output
+
+    def readinto(self, buf, nbytes=None):
+        data = self.read(nbytes or len(buf))
+        if data is None:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def write(self, buf):
+        self._tx.extend(buf)
+        return len(buf)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, mode=PERIODIC, period=-1, freq=-1, callback=None):
+        self._generation = 0
+        self._period = None
+        if callback is not None:
+            self.init(mode=mode, period=period, freq=freq, callback=callback)
+
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None, tick_hz=1000):
+        self.deinit()
+
+        if freq > 0:
+            period = 1000 / freq
+        self._period = period
+        self._mode = mode
+        self._callback = callback
+
+        clock.call_later(period, self._fire, self._generation)
+
+    def _fire(self, generation):
+        if generation != self._generation:
+            return  # deinit (or re-init) since this was scheduled
+
+        if self._mode == Timer.PERIODIC:
+            clock.call_later(self._period, self._fire, generation)
+        self._callback(self)
+
+    def deinit(self):
+        self._generation += 1
+
+
+class WDT:
+    def __init__(self, id=0, timeout=5000):
+        self._timeout = timeout
+
+    def feed(self):
+        pass
@@ -0,0 +1,33 @@
+"""
+Simulated `micropython` module
+"""
+
+clock = None  # VirtualClock, set by hostsim.install
+
+
+def const(value):
+    return value
+
+
+def schedule(fn, arg):
+    """Queue `fn(arg)` to run outside of the (simulated) interrupt"""
+    clock.schedule_soft(fn, arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=False):
+    pass
+
+
+def opt_level(level=None):
+    return 0
+
+
+def native(fn):
+    return fn
+
+
+viper = native
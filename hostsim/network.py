@@ -0,0 +1,82 @@
+"""
+Simulated `network` module, plus the routing from client sockets to brokers
+"""
+
+import errno
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 3
+
+_brokers = {}  # {(host, port): Broker}, host None matches any host
+_link = {"up": True}
+
+
+def add_broker(broker):
+    _brokers[(broker.host, broker.port)] = broker
+
+
+def remove_broker(broker):
+    _brokers.pop((broker.host, broker.port), None)
+
+
+def set_link(up: bool):
+    """Simulate the Wi-Fi link dropping (False) and coming back (True)"""
+    _link["up"] = up
+    if not up:
+        for broker in _brokers.values():
+            for session in list(broker.sessions):
+                session.sock._hangup()
+                broker._disconnect(session, will=True)
+
+
+def connect(host, port):
+    """Open a client socket to the broker at `host`:`port`"""
+    if not _link["up"]:
+        raise OSError(errno.ENETUNREACH)
+
+    broker = _brokers.get((host, port), None) or _brokers.get((None, port), None)
+    if broker is None:
+        raise OSError(errno.EHOSTUNREACH)
+
+    return broker.connect(host, port)
+
+
+class WLAN:
+    _count = 0
+
+    def __init__(self, interface=STA_IF):
+        WLAN._count += 1
+        self._interface = interface
+        self._active = False
+        self._ip = f"192.168.0.{100 + WLAN._count % 150}"
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = bool(state)
+
+    def connect(self, ssid=None, key=None):
+        self._active = True
+
+    def disconnect(self):
+        pass
+
+    def isconnected(self) -> bool:
+        return self._active and _link["up"]
+
+    def status(self, param=None):
+        if param == "rssi":
+            return -55
+        return STAT_GOT_IP if self.isconnected() else STAT_IDLE
+
+    def ifconfig(self, config=None):
+        return (self._ip, "255.255.255.0", "192.168.0.1", "192.168.0.1")
+
+    def config(self, *args, **kwargs):
+        if "mac" in args:
+            return b"\x28\xcd\xc1\x00\x00\x01"
+        return None
@@ -0,0 +1,6 @@
+"""
+Fake drivers standing in for the `sensors` package used by DiscoverableSensors
+
+They keep the real drivers' interfaces and conversion times (sleeping on the
+virtual clock), with readings taken from `hostsim.environment.current`.
+"""
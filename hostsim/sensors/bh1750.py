@@ -0,0 +1,80 @@
+"""
+BH1750 driver, talking to a simulated chip on the machine.I2C bus
+"""
+
+import time
+
+from hostsim import environment
+
+ADDRESS = 0x23
+
+
+class BH1750Chip:
+    """I2C side of a BH1750, the result register holds lux * 1.2"""
+
+    POWER_ON = 0x01
+    RESET = 0x07
+
+    def __init__(self):
+        self._mode = None
+        self._result = 0
+
+    def writeto(self, buf):
+        opcode = buf[0]
+        if opcode in (self.POWER_ON, self.RESET, 0x00):
+            return
+        self._mode = opcode
+        # the conversion is instantaneous here, the driver does the waiting
+        lux = environment.current.sample("lux")
+        self._result = max(0, min(0xFFFF, int(lux * 1.2)))
+
+    def readfrom(self, nbytes):
+        return bytes((self._result >> 8, self._result & 0xFF))[:nbytes]
+
+
+class BH1750:
+    PWR_OFF = 0x00
+    PWR_ON = 0x01
+    RESET = 0x07
+
+    CONT_LOWRES = 0x13
+    CONT_HIRES_1 = 0x10
+    CONT_HIRES_2 = 0x11
+    ONCE_HIRES_1 = 0x20
+    ONCE_HIRES_2 = 0x21
+    ONCE_LOWRES = 0x23
+
+    def __init__(self, bus, addr=ADDRESS):
+        self.bus = bus
+        self.addr = addr
+        self.mode = None
+
+        if addr not in bus.scan():
+            bus.attach(addr, BH1750Chip())
+
+        self.reset()
+
+    def off(self):
+        self.set_mode(self.PWR_OFF)
+
+    def on(self):
+        self.set_mode(self.PWR_ON)
+
+    def reset(self):
+        self.on()
+        self.set_mode(self.RESET)
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self.bus.writeto(self.addr, bytes([self.mode]))
+
+    def luminance(self, mode):
+        if mode & 0x10 and mode != self.mode:
+            self.set_mode(mode)
+        if mode & 0x20:
+            self.set_mode(mode)
+
+        time.sleep_ms(24 if mode in (0x13, 0x23) else 180)
+        data = self.bus.readfrom(self.addr, 2)
+        factor = 2.0 if mode in (0x11, 0x21) else 1.0
+        return (data[0] << 8 | data[1]) / (1.2 * factor)
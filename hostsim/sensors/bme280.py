@@ -0,0 +1,40 @@
+"""
+BME280 driver, a forced mode measurement takes about 10ms
+"""
+
+import time
+
+from hostsim import environment
+
+ADDRESS = 0x76
+
+
+class BME280_I2C:
+    def __init__(self, address=ADDRESS, i2c=None):
+        self.address = address
+        self._i2c = i2c
+
+    def _measure(self) -> dict:
+        time.sleep_ms(10)
+        env = environment.current
+        return {
+            "temperature": env.sample("temperature"),
+            "humidity": env.sample("humidity"),
+            "pressure": env.sample("pressure"),
+        }
+
+    @property
+    def temperature(self):
+        return self._measure()["temperature"]
+
+    @property
+    def humidity(self):
+        return self._measure()["humidity"]
+
+    @property
+    def pressure(self):
+        return self._measure()["pressure"]
+
+    @property
+    def data(self) -> dict:
+        return self._measure()
@@ -0,0 +1,45 @@
+"""
+BME680 driver, including the gas heater a measurement takes about 190ms
+"""
+
+import time
+
+from hostsim import environment
+
+ADDRESS = 0x77
+
+
+class BME680_I2C:
+    def __init__(self, i2c, address=ADDRESS, debug=False, *, refresh_rate=10):
+        self._i2c = i2c
+        self._address = address
+
+    def _measure(self) -> dict:
+        time.sleep_ms(190)
+        env = environment.current
+        return {
+            "temperature": env.sample("temperature"),
+            "humidity": env.sample("humidity"),
+            "pressure": env.sample("pressure"),
+            "gas_ohms": env.sample("gas"),
+        }
+
+    @property
+    def temperature(self):
+        return self._measure()["temperature"]
+
+    @property
+    def humidity(self):
+        return self._measure()["humidity"]
+
+    @property
+    def pressure(self):
+        return self._measure()["pressure"]
+
+    @property
+    def gas(self):
+        return self._measure()["gas_ohms"]
+
+    @property
+    def data(self) -> dict:
+        return self._measure()
@@ -0,0 +1,41 @@
+"""
+PMS5003 driver, in active mode the sensor sends a frame every second
+"""
+
+import time
+
+from hostsim import environment
+
+PERIOD = 1000
+
+
+class PMS5003Data:
+    def __init__(self, pm1_0, pm2_5, pm10):
+        self.data = (pm1_0, pm2_5, pm10)
+
+    def pm_ug_per_m3(self, size):
+        return self.data[{1.0: 0, 2.5: 1, 10: 2}[size]]
+
+
+class PMS5003:
+    def __init__(self, uart, pin_enable, pin_reset, mode="active"):
+        self._uart = uart
+        self._pin_enable = pin_enable
+        self._pin_reset = pin_reset
+        self._mode = mode
+        self._last = None
+
+        pin_enable.init(pin_enable.OUT, value=1)
+        pin_reset.init(pin_reset.OUT, value=1)
+
+    def read(self) -> PMS5003Data:
+        """Wait for the next frame"""
+        now = time.ticks_ms()
+        if self._last is not None:
+            wait = PERIOD - time.ticks_diff(now, self._last)
+            if wait > 0:
+                time.sleep_ms(wait)
+        self._last = time.ticks_ms()
+
+        pm2_5 = max(0, round(environment.current.sample("pm")))
+        return PMS5003Data(max(0, pm2_5 - 2), pm2_5, pm2_5 + 3)
@@ -0,0 +1,48 @@
+"""
+SCD4x driver, in periodic mode a new measurement is ready every 5s
+"""
+
+import time
+
+from hostsim import environment
+
+ADDRESS = 0x62
+PERIOD = 5000
+
+
+class SCD4X:
+    def __init__(self, i2c, address=ADDRESS):
+        self._i2c = i2c
+        self._address = address
+        self._started = None
+
+    def start_periodic_measurement(self):
+        time.sleep_ms(1)
+        self._started = time.ticks_ms()
+
+    def stop_periodic_measurement(self):
+        time.sleep_ms(500)
+        self._started = None
+
+    @property
+    def data_ready(self) -> bool:
+        if self._started is None:
+            return False
+        return time.ticks_diff(time.ticks_ms(), self._started) >= PERIOD
+
+    def read(self) -> dict:
+        """Blocks until the first measurement is available"""
+        if self._started is None:
+            raise OSError(5)
+
+        wait = PERIOD - time.ticks_diff(time.ticks_ms(), self._started)
+        if wait > 0:
+            time.sleep_ms(wait)
+
+        time.sleep_ms(1)
+        env = environment.current
+        return {
+            "temperature": env.sample("temperature"),
+            "humidity": env.sample("humidity"),
+            "CO2": round(env.sample("co2")),
+        }
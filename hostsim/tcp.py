@@ -0,0 +1,99 @@
+"""
+The in-memory broker on a real TCP port, for clients which are not simulated
+
+    python -m hostsim.tcp [port]
+
+The CPython Gateway (and anything else speaking MQTT) can connect to it,
+and the broker's log and counters are there to inspect afterwards. The
+clock follows the host clock.
+"""
+
+import asyncio
+
+from hostsim.broker import Broker
+from hostsim.clock import VirtualClock
+
+
+class TCPBroker:
+    """
+    Serve `broker` on a TCP port
+
+    Args:
+        broker:
+            the Broker, by default a new one on a realtime clock
+    """
+
+    def __init__(self, broker=None, port: int = 1883):
+        if broker is None:
+            broker = Broker(VirtualClock(realtime=True), port=port)
+
+        self.broker = broker
+        self._writers = {}  # {FakeSocket: StreamWriter}
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1"):
+        self._server = await asyncio.start_server(self._client, host, self.broker.port)
+        return self._server
+
+    async def stop(self):
+        # hang up on the clients first, so their handlers end rather than get cancelled
+        for writer in list(self._writers.values()):
+            writer.close()
+        while len(self._writers) > 0:
+            await asyncio.sleep(0.01)
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _client(self, reader, writer):
+        sock = self.broker.connect(self.broker.host, self.broker.port)
+        self._writers[sock] = writer
+
+        try:
+            while not sock.closed:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                sock.write(data)
+                self._flush()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            del self._writers[sock]
+            if not sock.closed:
+                # dropped without a DISCONNECT, the will goes out
+                sock._hangup()
+                self.broker._disconnect(sock._session, will=True)
+            writer.close()
+
+    def inject(self, topic, payload, retain=False):
+        """`Broker.inject`, passed on to the connected clients straight away"""
+        self.broker.inject(topic, payload, retain)
+        self._flush()
+
+    def _flush(self):
+        """Pass whatever the broker queued for each client on to its connection"""
+        for sock, writer in self._writers.items():
+            if len(sock._rx) > 0:
+                writer.write(bytes(sock._rx))
+                del sock._rx[:]
+
+
+if __name__ == "__main__":
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1883
+
+    async def main():
+        server = TCPBroker(port=port)
+        await server.start()
+        print(f"broker listening on 127.0.0.1:{port}")
+
+        while True:
+            await asyncio.sleep(10)
+            broker = server.broker
+            print(f"{len(broker.sessions)} clients, {len(broker.log)} messages, "
+                  f"{broker.bytes_in} bytes in / {broker.bytes_out} out")
+
+    asyncio.run(main())
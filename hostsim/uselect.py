@@ -0,0 +1,57 @@
+"""
+Simulated `select` module, polling moves the virtual clock
+"""
+
+from hostsim.clock import check_int
+
+clock = None  # VirtualClock, set by hostsim.install
+
+POLLIN = 0x0001
+POLLOUT = 0x0004
+POLLERR = 0x0008
+POLLHUP = 0x0010
+
+FOREVER_MS = 3_600_000  # what a timeout of -1 waits for at most, so nothing hangs
+
+
+class _Poll:
+    def __init__(self):
+        self._objects = {}
+
+    def register(self, obj, eventmask=POLLIN | POLLOUT):
+        self._objects[id(obj)] = (obj, eventmask)
+
+    def modify(self, obj, eventmask):
+        self._objects[id(obj)] = (obj, eventmask)
+
+    def unregister(self, obj):
+        self._objects.pop(id(obj), None)
+
+    def _ready(self) -> list:
+        output = []
+        for obj, mask in self._objects.values():
+            if obj.closed:
+                output.append((obj, POLLHUP))
+            elif mask & POLLIN and obj.readable():
+                output.append((obj, POLLIN))
+            elif mask & POLLOUT:
+                output.append((obj, POLLOUT))
+        return output
+
+    def poll(self, timeout=-1) -> list:
+        if timeout is not None:
+            check_int(timeout)
+        if timeout is None or timeout < 0:
+            timeout = FOREVER_MS
+
+        until = clock.now_us() / 1000 + timeout
+        while True:
+            ready = self._ready()
+            if len(ready) > 0 or not clock.step(until):
+                return ready or self._ready()
+
+    ipoll = poll
+
+
+def poll() -> _Poll:
+    return _Poll()
@@ -0,0 +1,18 @@
+"""
+The tests run the device code under hostsim, which has to be installed
+before anything imports `machine` or `time.ticks_ms`
+
+Test entities and devices come from benchmarks.fixtures, shared with the benchmarks.
+"""
+
+import pytest
+
+import hostsim
+
+_sim = hostsim.install(seed=0)
+
+
+@pytest.fixture
+def sim():
+    yield _sim
+    _sim.broker.clear_log()
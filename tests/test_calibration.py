@@ -0,0 +1,59 @@
+import pytest
+
+from DiscoverableDevice.utils.calibration import apply, compile_calibration
+
+SPEC = {
+    "offset": -0.8,
+    "linear": {"offset": 1.5, "gain": 0.98},
+    "gain": {"gain": 1.1},
+    "poly": {"poly": [0.3, 1.01, -0.0004, 2e-6]},
+    "table": {"table": [(100, 95.0), (0, 1.0), (50, 49.0), (75, 74.5)]},
+}
+
+
+def reference(cal, raw):
+    """The calibrated value of `raw`, worked out directly from a single field's spec"""
+    if isinstance(cal, (int, float)):
+        return raw + cal
+    if "poly" in cal:
+        return sum(c * raw**i for i, c in enumerate(cal["poly"]))
+    if "table" in cal:
+        points = sorted(cal["table"])
+        for i in range(1, len(points)):
+            (x0, y0), (x1, y1) = points[i - 1], points[i]
+            if raw < x1 or i == len(points) - 1:
+                return y0 + (y1 - y0) * (raw - x0) / (x1 - x0)
+    return raw * cal.get("gain", 1) + cal.get("offset", 0)
+
+
+def test_compiled_matches_reference_over_a_sweep():
+    compiled = compile_calibration(SPEC)
+
+    for i in range(-200, 1400):
+        raw = i / 10
+        data = {field: raw for field in SPEC}
+        data["label"] = "not calibrated"
+        apply(compiled, data)
+
+        assert data["label"] == "not calibrated"
+        for field, cal in SPEC.items():
+            expected = reference(cal, raw)
+            assert data[field] == pytest.approx(expected, rel=1e-9, abs=1e-9), (field, raw)
+
+
+def test_missing_fields_are_left_alone():
+    data = {"other": 1}
+    apply(compile_calibration(SPEC), data)
+    assert data == {"other": 1}
+
+
+@pytest.mark.parametrize("spec", [
+    {"x": {"gian": 2}},
+    {"x": {"poly": []}},
+    {"x": {"table": [(0, 0)]}},
+    {"x": {"table": [(0, 0), (0, 1)]}},
+    {"x": "2"},
+])
+def test_bad_specs_fail_when_compiled(spec):
+    with pytest.raises(ValueError):
+        compile_calibration(spec)
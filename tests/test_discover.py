@@ -0,0 +1,27 @@
+from benchmarks.fixtures import make_device
+
+
+def test_discover_keeps_the_inflight_window_draining(sim):
+    device = make_device(3, switch=True, connect=False)  # more configs than the in-flight window holds
+
+    device.bring_up()
+    device.discover()
+    sim.run(device, 30)
+
+    assert len(device.inflight) == 0
+    assert device.stats.counters["failures"] == 0
+    assert not any(m.dup for m in sim.broker.messages(b"homeassistant/#"))
+
+
+def test_discover_then_run_sends_each_config_once(sim):
+    device = make_device(3, switch=True, connect=False)
+    device.build_discovery()
+    configs = len(device._discovery)
+
+    device.bring_up()
+    device.discover()
+    assert device.online and device.discovered
+
+    sim.run(device, 30)
+
+    assert len(sim.broker.messages(b"homeassistant/+/+/+/config")) == configs
@@ -0,0 +1,39 @@
+from DiscoverableDevice.Sensor import Sensor
+from DiscoverableDevice.utils.Filters import ExponentialAverage, Median
+
+
+class Step(Sensor):
+    """Reads `level`, which the test sets"""
+
+    __slots__ = ("level",)
+
+    signature = {"value": {"value_mod": "round(2)"}}
+
+    def __init__(self):
+        super().__init__("step")
+        self.level = 0.0
+
+    def read(self):
+        return {"value": self.level}
+
+
+def test_oversampled_step_advances_later_stages_once():
+    sensor = Step()
+    sensor.oversample = 9
+    sensor.filter("value", Median(9), ExponentialAverage(0.3))
+
+    assert sensor._read(force=True)["value"] == 0.0
+
+    sensor.level = 10.0
+    # the median of the 9 new samples is 10, the average moves 0.3 of the way there once
+    assert abs(sensor._read(force=True)["value"] - 3.0) < 1e-6
+    assert abs(sensor._read(force=True)["value"] - 5.1) < 1e-6
+
+
+def test_without_oversampling_every_stage_sees_each_reading():
+    sensor = Step()
+    sensor.filter("value", ExponentialAverage(0.5))
+
+    sensor._read(force=True)
+    sensor.level = 8.0
+    assert sensor._read(force=True)["value"] == 4.0
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from benchmarks.fixtures import Synthetic, SyntheticSwitch
+from DiscoverableDevice.Gateway import Gateway, VirtualDevice, STATUS_TOPIC
+
+
+class FakeMQTT:
+    """Stands in for the gateway's AsyncMQTTClient, each publish yields to the other tasks"""
+
+    connected = True
+
+    def __init__(self):
+        self.sent = []
+        self.hooks = []  # called one per publish, in the middle of it
+        self.active = 0
+        self.most_active = 0
+
+    async def publish(self, topic, msg, retain=False, qos=0):
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        if len(self.hooks) > 0:
+            self.hooks.pop(0)()
+        await asyncio.sleep(0)
+
+        self.sent.append((topic, msg))
+        self.active -= 1
+
+
+def make_gateway(*entities):
+    device = VirtualDevice(uid="gw0", name="GW0", interval=60)
+    for entity in entities:
+        device.add_entity(entity)
+
+    gateway = Gateway(host="broker")
+    gateway.add_device(device)
+    gateway._mqtt = FakeMQTT()
+
+    return gateway
+
+
+def test_command_during_a_publish_is_not_left_for_the_next_deadline(sim):
+    switch = SyntheticSwitch("switch")
+    gateway = make_gateway(switch)
+    mqtt = gateway.mqtt
+    # one command while the scheduled state goes out, another while its echo does
+    mqtt.hooks = [
+        lambda: gateway.callback(switch._command_topic_b, b"ON"),
+        lambda: gateway.callback(switch._command_topic_b, b"OFF"),
+    ]
+
+    async def scenario():
+        poll = asyncio.ensure_future(gateway._poll())
+        await asyncio.sleep(0.2)  # the next read is due in 60 s
+        poll.cancel()
+        await asyncio.gather(poll, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    states = [json.loads(msg)["switch"] for topic, msg in mqtt.sent if topic == switch._state_topic_b]
+    assert states == ["OFF", "ON", "OFF"]
+
+
+def test_ha_restarts_during_discovery_do_not_overlap(sim):
+    gateway = make_gateway(*[Synthetic(f"s{i}", fields=3) for i in range(3)])
+    mqtt = gateway.mqtt
+
+    def nothing():
+        pass
+
+    def restart():
+        gateway.callback(STATUS_TOPIC, b"online")
+
+    # HA comes back twice while the first discovery is still going
+    mqtt.hooks = [nothing] * 4 + [restart] * 2
+
+    async def scenario():
+        await gateway.discover()
+
+    asyncio.run(scenario())
+
+    configs = [topic for topic, _ in mqtt.sent if topic.endswith(b"/config")]
+    assert mqtt.most_active == 1
+    # the second pass sends again what went out before HA restarted
+    assert len(configs) == 9 + 5
+    assert len(set(configs)) == 9
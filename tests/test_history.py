@@ -0,0 +1,35 @@
+import time
+
+from DiscoverableDevice.utils import ticks
+from DiscoverableDevice.utils.History import History, unpack
+
+
+def test_cpython_ticks_fit_the_history_after_long_uptime(monkeypatch):
+    # 60 days of host uptime, past the 2**32 ms an array("I") holds
+    monkeypatch.setattr(time, "monotonic_ns", lambda: 60 * 86_400 * 10**9, raising=False)
+
+    now = ticks._ticks_ms()
+    assert 0 <= now <= ticks.TICKS_MAX
+
+    history = History(4)
+    history.add(now, 1.0)  # raised OverflowError with unmasked ticks
+    assert len(history) == 1
+
+
+def test_history_ages_across_the_tick_wrap():
+    history = History(8)
+    start = ticks.TICKS_MAX - 2500
+    for i in range(6):
+        history.add((start + i * 1000) & ticks.TICKS_MAX, float(i))
+
+    now = (start + 5000) & ticks.TICKS_MAX
+    assert now < start  # wrapped
+
+    (message,) = list(history.pack(now, since=3000, until=0))
+    _, _, samples = unpack(message)
+    assert samples == [(3000, 2.0), (2000, 3.0), (1000, 4.0), (0, 5.0)]
+
+
+def test_fallback_diff_wraps_like_micropython():
+    assert ticks._ticks_diff(5, ticks.TICKS_MAX - 4) == 10
+    assert ticks._ticks_diff(ticks.TICKS_MAX - 4, 5) == -10
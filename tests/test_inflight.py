@@ -0,0 +1,33 @@
+import json
+
+from benchmarks.fixtures import make_device
+from DiscoverableDevice.utils.InFlight import InFlight
+
+
+def test_expired_right_after_boot_are_resent_straight_away():
+    window = InFlight(2)
+    window.add(1, b"a", b"1", False, now=100)  # sent just after boot
+
+    window.expire(now=150, timeout=5000)
+
+    assert window.expired(now=150, timeout=5000) == [0]
+    assert window.next_expiry(5000) == 150
+
+
+def test_command_while_waiting_for_a_puback(sim):
+    device = make_device(1, switch=True, inflight=1, qos=1)
+    switch = device._sensors["switch"]
+    sim.broker.ack_delay = 3000
+    try:
+        # arrives while the second publish waits on the first one's PUBACK
+        sim.broker.inject_at(sim.clock.now_ms() + 100, switch._command_topic_b, b"ON")
+        assert device.publish(b"test/a", b"1", qos=1)
+        assert device.publish(b"test/b", b"2", qos=1)
+
+        sim.run(device, 10)
+    finally:
+        sim.broker.ack_delay = 0
+
+    assert device.stats.counters["failures"] == 0
+    states = sim.broker.messages(switch._state_topic_b)
+    assert json.loads(states[-1].payload)["switch"] == "ON"
@@ -0,0 +1,57 @@
+import json
+
+import network
+
+from benchmarks.fixtures import Synthetic
+from DiscoverableDevice.DiscoverableDevice import DiscoverableDevice
+from DiscoverableDevice.utils.OfflineQueue import OfflineQueue, LATEST_PER_TOPIC
+
+
+def test_latest_per_topic_merges_fields():
+    queue = OfflineQueue(4, LATEST_PER_TOPIC)
+    queue.push(b"state", '{"a": 1, "b": 1}')
+    queue.push(b"state", b'{"b": 2}')
+    queue.push(b"other", "plain")
+    queue.push(b"other", "newer")
+
+    assert len(queue) == 2
+    assert queue.replaced == 2
+    assert json.loads(queue.pop()[1]) == {"a": 1, "b": 2}
+    assert queue.pop()[1] == "newer"
+
+
+def test_outage_keeps_every_sensors_last_reading(sim):
+    sim.broker.go_offline()
+    try:
+        device = DiscoverableDevice(
+            network.WLAN(), host="broker", user="", password="", queue_policy=LATEST_PER_TOPIC
+        )
+        a = Synthetic("a", fields=1, interval=10)
+        b = Synthetic("b", fields=1, interval=7)
+        device.add_entity(a)
+        device.add_entity(b)
+
+        sim.run(device, 59)
+    finally:
+        sim.broker.go_online()
+
+    queued = {}
+    while len(device.queue) > 0:
+        topic, payload = device.queue.pop()
+        if topic == a._state_topic_b:
+            queued = json.loads(payload)
+
+    assert queued["a_0"] == a.data["a_0"]
+    assert queued["b_0"] == b.data["b_0"]
+
+
+def test_queue_drains_after_an_outage(sim):
+    device = DiscoverableDevice(network.WLAN(), host="broker", user="", password="")
+    device.add_entity(Synthetic("a", fields=1, interval=1))
+
+    sim.broker.go_offline()
+    sim.clock.call_later(20_000, sim.broker.go_online)
+    sim.run(device, 120)  # a float timeout from the drain rate raised TypeError here
+
+    assert len(device.queue) == 0
+    assert device.online
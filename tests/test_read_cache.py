@@ -0,0 +1,48 @@
+import json
+
+from benchmarks.fixtures import make_device
+
+
+def echoes(sim, switch):
+    return [json.loads(m.payload)[switch.name] for m in sim.broker.messages(switch._state_topic_b)]
+
+
+def test_a_burst_of_the_same_command_is_one_read(sim):
+    device = make_device(2, switch=True)
+    switch = device._sensors["switch"]
+    topic = switch._command_topic_b
+    sim.broker.clear_log()
+
+    before = switch._count
+    for _ in range(10):
+        device.callback(topic, b"ON")
+
+    assert switch._count - before == 1
+    assert echoes(sim, switch) == ["ON"] * 10
+
+
+def test_a_command_that_changes_the_state_is_read_fresh(sim):
+    device = make_device(2, switch=True)
+    switch = device._sensors["switch"]
+    topic = switch._command_topic_b
+    sim.broker.clear_log()
+
+    before = switch._count
+    for msg in (b"ON", b"OFF", b"OFF", b"ON"):
+        device.callback(topic, msg)
+
+    assert switch._count - before == 3
+    assert echoes(sim, switch) == ["ON", "OFF", "OFF", "ON"]
+
+
+def test_the_same_command_after_the_ttl_is_read_again(sim):
+    device = make_device(2, switch=True, read_ttl=500)
+    switch = device._sensors["switch"]
+    topic = switch._command_topic_b
+
+    device.callback(topic, b"ON")
+    before = switch._count
+    sim.advance(1)
+    device.callback(topic, b"ON")
+
+    assert switch._count - before == 1
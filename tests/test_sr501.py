@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+from machine import Pin
+
+from DiscoverableSensors.SR501_MQTT import SR501_MQTT, CONFIRM_TIME
+
+PIN = 21
+
+
+@pytest.fixture
+def sensor(sim, monkeypatch):
+    # asyncio keeps the real clock, have its sleeps move the virtual one instead
+    async def sleep(seconds):
+        sim.advance(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+
+    sensor = SR501_MQTT("motion", PIN, warmup=0)
+    sim.advance(1)  # past the warmup
+    yield sensor
+    Pin(PIN).release()
+
+
+def split_phase(sim, sensor):
+    deadline = sensor.start()
+    sim.advance(time.ticks_diff(deadline, time.ticks_ms()) / 1000)
+    return sensor.collect()
+
+
+@pytest.mark.parametrize("read", [
+    lambda sim, sensor: sensor.read(),
+    lambda sim, sensor: asyncio.run(sensor.aread()),
+    split_phase,
+])
+@pytest.mark.parametrize("drop, expected", [(None, "ON"), (CONFIRM_TIME // 2, "OFF")])
+def test_every_read_path_confirms_the_detection(sim, sensor, read, drop, expected):
+    pin = Pin(PIN)
+    pin.drive(1)
+    if drop is not None:
+        pin.script([(sim.clock.now_ms() + drop, 0)])
+
+    assert read(sim, sensor) == {"motion_state": expected}
+
+
+def test_every_read_path_waits_out_the_warmup(sim):
+    sensor = SR501_MQTT("motion", PIN, warmup=45)
+
+    assert sensor.start() is None
+    assert sensor.read() is None
+    assert asyncio.run(sensor.aread()) is None
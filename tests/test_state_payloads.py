@@ -0,0 +1,29 @@
+import json
+
+import network
+
+from benchmarks.fixtures import Synthetic
+from DiscoverableDevice.DiscoverableDevice import DiscoverableDevice
+
+
+def test_entities_on_their_own_interval_publish_every_field(sim):
+    device = DiscoverableDevice(network.WLAN(), host="broker", user="", password="", heartbeat=0)
+    light = Synthetic("light", fields=1, interval=3)
+    temperature = Synthetic("temperature", fields=1, interval=10)
+    device.add_entity(light)
+    device.add_entity(temperature)
+
+    sim.run(device, 60)
+
+    states = sim.broker.messages(light._state_topic_b)
+    assert len(states) > 20  # the light level is published far more often
+
+    for message in states:
+        payload = json.loads(message.payload)
+        # every entity's value_template on the shared topic finds its field
+        for field in ("light_0", "temperature_0", "IP", "UID"):
+            assert field in payload, (field, payload)
+
+    last = json.loads(states[-1].payload)
+    assert last["light_0"] == light.data["light_0"]
+    assert last["temperature_0"] == temperature.data["temperature_0"]
@@ -0,0 +1,20 @@
+from DiscoverableDevice.DiscoverableDevice import diagnostic, STAGES, COUNTERS
+from DiscoverableDevice.utils import Stats as stats_module
+from DiscoverableDevice.utils.Stats import Stats
+
+
+def test_free_heap_and_its_low_water_mark(monkeypatch):
+    stats = Stats()
+    for free in (9000, 4000, 12000, 7000):
+        monkeypatch.setattr(stats_module.gc, "mem_free", lambda: free, raising=False)
+        stats.sample_heap()
+
+    assert stats.mem_free == 7000
+    assert stats.mem_free_min == 4000
+
+
+def test_diagnostics_report_every_field_they_discover():
+    stats = Stats(STAGES, COUNTERS)
+    entity = diagnostic(stats)
+
+    assert set(entity.read()) == set(entity.signature)
@@ -0,0 +1,45 @@
+import json
+
+import network
+import pytest
+from machine import I2C, Pin
+
+from DiscoverableDevice.DiscoverableDevice import DiscoverableDevice
+from DiscoverableDevice.utils.PayloadTemplate import PayloadTemplate
+from DiscoverableSensors.BME280_MQTT import BME280_MQTT
+from DiscoverableSensors.BME680_MQTT import BME680_MQTT
+
+
+def test_overlapping_sensors_are_rendered_through_the_template(sim):
+    i2c = I2C(0, sda=Pin(0), scl=Pin(1))
+    device = DiscoverableDevice(network.WLAN(), host="broker", user="", password="")
+    bme280 = BME280_MQTT(i2c)
+    device.add_entity(bme280)
+    device.add_entity(BME680_MQTT(i2c))  # temperature, humidity and pressure again
+
+    topic = bme280._state_topic_b
+    template = device.template(topic)
+    assert len(template.fields) == len(set(template.fields))
+
+    sim.run(device, 12)
+
+    states = sim.broker.messages(topic)
+    assert len(states) > 0
+    for message in states:
+        payload = json.loads(message.payload)
+        assert template.covers(payload)
+        # json.dumps would have put a space after each colon
+        assert b": " not in message.payload
+
+
+def test_render_opens_with_whichever_field_comes_first():
+    template = PayloadTemplate([("a", 2), ("b", None), ("c", 1)])
+
+    assert bytes(template.render({"a": 1.5, "b": "x", "c": -1.26})) == b'{"a":1.50,"b":"x","c":-1.3}'
+    assert bytes(template.render({"c": 2.25})) == b'{"c":2.2}'
+    assert bytes(template.render({})) == b"{}"
+
+
+def test_repeated_field_names_are_rejected():
+    with pytest.raises(ValueError):
+        PayloadTemplate([("temperature", 2), ("temperature", 1)])
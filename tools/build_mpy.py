@@ -0,0 +1,88 @@
+"""
+Precompile the package to .mpy, for faster imports on the board
+
+    python tools/build_mpy.py [--out build] [--march armv6m] [-O 2]
+
+Writes build/lib/DiscoverableDevice/... and build/lib/DiscoverableSensors/...
+as .mpy files, copy build/lib to the board's /lib (for example with
+`mpremote cp -r build/lib/ :`) and don't copy the .py sources next to them,
+MicroPython imports a .py in preference to the .mpy.
+
+Needs mpy-cross matching the firmware version, either the `mpy_cross`
+package (pip install mpy-cross) or the binary on the PATH.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+PACKAGES = ("DiscoverableDevice", "DiscoverableSensors")
+# CPython only (the Gateway), not shipped to the board
+HOST_ONLY = ("Gateway.py", "AsyncMQTT.py")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def compiler() -> list:
+    """Command to run mpy-cross"""
+    try:
+        import mpy_cross
+    except ImportError:
+        path = shutil.which("mpy-cross")
+        if path is None:
+            raise RuntimeError("mpy-cross not found, pip install mpy-cross")
+        return [path]
+
+    return [sys.executable, "-m", "mpy_cross"]
+
+
+def sources(package: str):
+    for directory, _, files in os.walk(os.path.join(ROOT, package)):
+        if "__pycache__" in directory:
+            continue
+        for name in sorted(files):
+            if name.endswith(".py") and name not in HOST_ONLY:
+                yield os.path.join(directory, name)
+
+
+def build(out: str = "build", march: str = "armv6m", optimise: int = 2) -> int:
+    """
+    Compile every module, returning the number of .mpy files written
+
+    Args:
+        out:
+            output directory, the modules go in `out`/lib
+        march:
+            target architecture, armv6m for the RP2040
+        optimise:
+            mpy-cross -O level, 2 and up drop asserts and line numbers
+    """
+    command = compiler()
+    count = 0
+
+    for package in PACKAGES:
+        for source in sources(package):
+            relative = os.path.relpath(source, ROOT)
+            target = os.path.join(out, "lib", relative[:-3] + ".mpy")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+
+            subprocess.run(
+                command + [f"-march={march}", f"-O{optimise}", "-o", target, "-s", relative, source],
+                check=True,
+            )
+            print(f"{relative} -> {target} ({os.path.getsize(target)} bytes)")
+            count += 1
+
+    return count
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    def option(flag, default):
+        if flag in args:
+            return args[args.index(flag) + 1]
+        return default
+
+    n = build(option("--out", "build"), option("--march", "armv6m"), int(option("-O", 2)))
+    print(f"built {n} modules")
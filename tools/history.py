@@ -0,0 +1,83 @@
+"""
+Fetch a field's on-device history (see Sensor.keep_history), for backfilling gaps
+
+    python -m tools.history broker_host uid field [--since 3600] [--until 0]
+        [--port 1883] [--prefix homeassistant]
+
+Prints a line of "unix time, value" per sample, oldest first. Sample ages
+are relative to when the device handled the request, which is taken to be
+when the first chunk arrived.
+"""
+
+import asyncio
+import json
+import time
+
+from DiscoverableDevice.utils.AsyncMQTT import AsyncMQTTClient
+from DiscoverableDevice.utils.History import unpack
+
+TIMEOUT = 10  # (s) to wait for every chunk
+
+
+async def fetch(host, port, prefix, uid, field, since, until) -> list:
+    """Request the history of `field` and reassemble it, as [(unix time, value)]"""
+    request = f"{prefix}/sensor/{uid}/history".encode()
+    reply = request + b"/" + field.encode()
+
+    chunks = {}
+    count = [None]
+    received = [None]
+    done = asyncio.Event()
+
+    def on_message(topic, msg):
+        if topic != reply:
+            return
+        if received[0] is None:
+            received[0] = time.time()
+
+        index, total, samples = unpack(msg)
+        chunks[index] = samples
+        count[0] = total
+        if len(chunks) == total:
+            done.set()
+
+    mqtt = AsyncMQTTClient(f"history-{uid}", host, port=port, keepalive=0)
+    mqtt.set_callback(on_message)
+    await mqtt.connect()
+    task = asyncio.ensure_future(mqtt.run())
+
+    try:
+        await mqtt.subscribe([reply])
+        await mqtt.publish(request, json.dumps({"field": field, "since": since, "until": until}).encode())
+        await asyncio.wait_for(done.wait(), TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"timed out, {len(chunks)} of {count[0]} chunks received")
+    finally:
+        await mqtt.disconnect()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    output = []
+    for index in sorted(chunks):
+        for age, value in chunks[index]:
+            output.append((received[0] - age / 1000, value))
+
+    return output
+
+
+if __name__ == "__main__":
+    import sys
+
+    argv = sys.argv[1:]
+
+    def option(flag, default):
+        if flag in argv:
+            return type(default)(argv[argv.index(flag) + 1])
+        return default
+
+    host, uid, field = argv[:3]
+    samples = asyncio.run(fetch(host, option("--port", 1883), option("--prefix", "homeassistant"),
+                                uid, field, option("--since", 3600), option("--until", 0)))
+
+    for t, value in samples:
+        print(f"{t:.3f}, {value}")
@@ -0,0 +1,264 @@
+"""
+Fleet load generator: many simulated devices against a local broker
+
+    python -m tools.loadgen [--host 127.0.0.1] [--port 1883] [--local]
+        [--devices 100] [--mix sensor:4,multi:1,switch:1] [--interval 5]
+        [--ramp 0] [--duration 10] [--flips 1] [--commands 100] [--out results.jsonl]
+
+Each simulated device is a Gateway serving a single VirtualDevice, so it has
+its own connection and runs the project's own discovery, state and command
+code. An observer client plays Home Assistant: it subscribes to
+homeassistant/#, flips homeassistant/status and sends commands, timing what
+comes back.
+
+Phases, each reported as a line of JSON (see benchmarks.harness.Bench):
+
+    boot_storm      every device starts at once (or over --ramp seconds),
+                    times are start to first state seen, per device
+    steady          --duration seconds of normal reporting
+    status_flip     HA goes offline and back online, times are the flip to
+                    each device's last config
+    command_burst   --commands switch commands sent back to back, times are
+                    command to state echo
+
+--local runs hostsim.tcp's in-memory broker in this process, which then
+shares the CPU with the fleet, point --host/--port at mosquitto for real numbers.
+
+Entity mixes: "sensor" (one field), "multi" (three fields, like a BME280)
+and "switch", as kind:count per device.
+"""
+
+import asyncio
+import random
+
+from benchmarks.fixtures import Synthetic, SyntheticSwitch
+from benchmarks.harness import Bench, elapsed_us, mute, now_us, unmute
+from DiscoverableDevice.Gateway import Gateway, VirtualDevice, STATUS_TOPIC
+from DiscoverableDevice.utils.AsyncMQTT import AsyncMQTTClient
+
+TIMEOUT = 60  # (s) longest any phase waits for the fleet to settle
+POLL = 0.02  # (s) between checks on the observer's counts
+
+KINDS = ("sensor", "multi", "switch")
+
+
+def parse_mix(mix: str) -> list:
+    """"sensor:4,switch:1" -> [("sensor", 4), ("switch", 1)]"""
+    output = []
+    for part in mix.split(","):
+        kind, _, count = part.partition(":")
+        if kind not in KINDS:
+            raise ValueError(f"unknown entity kind {kind}, expected one of {KINDS}")
+        output.append((kind, int(count or 1)))
+    return output
+
+
+def make_device(uid: str, mix: list, interval: int) -> VirtualDevice:
+    device = VirtualDevice(uid=uid, name=uid, interval=interval)
+    for kind, count in mix:
+        for i in range(count):
+            if kind == "sensor":
+                device.add_entity(Synthetic(f"s{i}", fields=1))
+            elif kind == "multi":
+                device.add_entity(Synthetic(f"m{i}", fields=3))
+            else:
+                device.add_entity(SyntheticSwitch(f"sw{i}"))
+    return device
+
+
+def uid_of(topic: bytes) -> bytes:
+    """homeassistant/<component>/<uid>/... -> uid"""
+    return topic.split(b"/", 3)[2]
+
+
+class Observer:
+    """
+    Plays Home Assistant: watches homeassistant/#, timestamping what each device sends
+    """
+
+    def __init__(self, host, port):
+        self.mqtt = AsyncMQTTClient("loadgen-observer", host, port=port, keepalive=0)
+        self.mqtt.set_callback(self._on_message)
+        self._task = None
+
+        self.configs = 0
+        self.states = 0
+        self.bytes = 0
+        self.last_config = {}  # {uid: us}
+        self.first_state = {}  # {uid: us}
+        self._echoes = {}  # {state topic: [us the command was sent]}
+        self.latencies = []  # us, command to echo
+        self.echoes = 0
+
+    async def start(self):
+        await self.mqtt.connect()
+        self._task = asyncio.ensure_future(self.mqtt.run())
+        await self.mqtt.subscribe([b"homeassistant/#"])
+
+    async def stop(self):
+        await self.mqtt.disconnect()
+        self._task.cancel()
+
+    def _on_message(self, topic, msg):
+        if topic == STATUS_TOPIC:
+            return
+
+        now = now_us()
+        self.bytes += len(topic) + len(msg)
+
+        if topic.endswith(b"/config"):
+            self.configs += 1
+            self.last_config[uid_of(topic)] = now
+            return
+
+        self.states += 1
+        self.first_state.setdefault(uid_of(topic), now)
+
+        # one state answers every command sent to the topic before it,
+        # commands arriving together are coalesced into a single read
+        waiting = self._echoes.get(topic, None)
+        if waiting:
+            for sent in waiting:
+                self.latencies.append(now - sent)
+            waiting.clear()
+            self.echoes += 1
+
+    async def command(self, entity):
+        self._echoes.setdefault(entity._state_topic_b, []).append(now_us())
+        await self.mqtt.publish(entity._command_topic_b, random.choice((b"ON", b"OFF")))
+
+    async def flip(self):
+        await self.mqtt.publish(STATUS_TOPIC, b"offline")
+        await self.mqtt.publish(STATUS_TOPIC, b"online")
+
+    async def wait(self, condition, timeout: float = TIMEOUT) -> bool:
+        """Wait for `condition()`, False on timeout"""
+        t0 = now_us()
+        while not condition():
+            if elapsed_us(t0) > timeout * 1_000_000:
+                return False
+            await asyncio.sleep(POLL)
+        return True
+
+
+async def fleet(options, bench):
+    mix = parse_mix(options["mix"])
+    n = options["devices"]
+    params = {"devices": n, "mix": options["mix"]}
+
+    server = None
+    if options["local"]:
+        from hostsim.tcp import TCPBroker
+
+        server = TCPBroker(port=options["port"])
+        await server.start(options["host"])
+
+    observer = Observer(options["host"], options["port"])
+    await observer.start()
+
+    gateways = []
+    for i in range(n):
+        uid = f"loadgen{i:04d}"
+        gateway = Gateway(options["host"], port=options["port"], client_id=uid)
+        gateway.add_device(make_device(uid, mix, options["interval"]))
+        gateways.append(gateway)
+
+    configs = sum(len(g.devices[0].build_discovery()) for g in gateways)
+    uids = [g.devices[0].uid.encode() for g in gateways]
+
+    # boot storm
+    tasks = []
+    started = {}
+    t0 = now_us()
+    for i, gateway in enumerate(gateways):
+        if options["ramp"] > 0:
+            await asyncio.sleep(options["ramp"] / n)
+        started[uids[i]] = now_us()
+        tasks.append(asyncio.ensure_future(gateway.run()))
+
+    done = await observer.wait(lambda: len(observer.first_state) == n and observer.configs >= configs)
+    storm = elapsed_us(t0)
+
+    times = [observer.first_state[uid] - started[uid] for uid in uids if uid in observer.first_state]
+    bench.result("boot_storm", dict(params, ramp_s=options["ramp"]), times,
+                 complete=done, configs=observer.configs, states=observer.states,
+                 msgs_per_s=round((observer.configs + observer.states) / (storm / 1e6)),
+                 bytes_per_device=sum(g.mqtt.bytes_out for g in gateways) // n)
+
+    # steady state
+    states, received, sent = observer.states, observer.bytes, sum(g.mqtt.bytes_out for g in gateways)
+    await asyncio.sleep(options["duration"])
+    seconds = options["duration"]
+    bench.result("steady", dict(params, interval_s=options["interval"], seconds=seconds), [],
+                 states_per_s=round((observer.states - states) / seconds),
+                 bytes_per_device_per_s=round((sum(g.mqtt.bytes_out for g in gateways) - sent) / n / seconds),
+                 observed_bytes_per_s=round((observer.bytes - received) / seconds))
+
+    # HA restarts: every device resends its configs, then its states
+    for flip in range(options["flips"]):
+        before = observer.configs
+        t0 = now_us()
+        await observer.flip()
+        done = await observer.wait(lambda: observer.configs - before >= configs)
+        flipped = elapsed_us(t0)
+
+        times = [observer.last_config[uid] - t0 for uid in uids if observer.last_config.get(uid, 0) > t0]
+        bench.result("status_flip", dict(params, flip=flip), times, complete=done,
+                     configs=observer.configs - before,
+                     msgs_per_s=round((observer.configs - before) / (flipped / 1e6)))
+
+    # command burst against random switches
+    switches = [e for g in gateways for e in g.devices[0].sensors if e._command_topic_b is not None]
+    if options["commands"] > 0 and len(switches) > 0:
+        observer.latencies = []
+        observer.echoes = 0
+        for _ in range(options["commands"]):
+            await observer.command(random.choice(switches))
+        done = await observer.wait(lambda: len(observer.latencies) >= options["commands"])
+
+        bench.result("command_burst", dict(params, commands=options["commands"]), observer.latencies,
+                     complete=done, echoes=observer.echoes)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await observer.stop()
+    if server is not None:
+        await server.stop()
+
+
+def main(argv):
+    def option(flag, default):
+        if flag in argv:
+            return type(default)(argv[argv.index(flag) + 1])
+        return default
+
+    options = {
+        "host": option("--host", "127.0.0.1"),
+        "port": option("--port", 1883),
+        "local": "--local" in argv,
+        "devices": option("--devices", 100),
+        "mix": option("--mix", "sensor:4,multi:1,switch:1"),
+        "interval": option("--interval", 5),
+        "ramp": option("--ramp", 0.0),
+        "duration": option("--duration", 10),
+        "flips": option("--flips", 1),
+        "commands": option("--commands", 100),
+    }
+
+    out = None
+    if "--out" in argv:
+        out = argv[argv.index("--out") + 1]
+
+    bench = Bench(out=out)
+    mute()
+    try:
+        asyncio.run(fleet(options, bench))
+    finally:
+        unmute()
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(sys.argv[1:])